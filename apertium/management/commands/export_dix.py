@@ -28,11 +28,11 @@ def export_bidix(
     checked = kwargs.get("approved", None)
     sdef_flag = kwargs.get("sdef")
 
-    left_relations = Relation.objects.filter(type=TRANSLATION).filter(
-        Q(lexeme_from__language=left_lang) & Q(lexeme_to__language=right_lang)
+    left_relations = Relation.objects.filter(
+        lang_from=left_lang, lang_to=right_lang, type=TRANSLATION
     )
-    right_relations = Relation.objects.filter(type=TRANSLATION).filter(
-        Q(lexeme_from__language=right_lang) & Q(lexeme_to__language=left_lang)
+    right_relations = Relation.objects.filter(
+        lang_from=right_lang, lang_to=left_lang, type=TRANSLATION
     )
 
     if checked is not None:
@@ -95,6 +95,7 @@ def export_bidix(
     # sdefs
     sdefs = dict()
     symbols = set()
+    lexeme_symbols = {}  # lexeme ID -> symbols
 
     for r in relations:
         r.dir = ""
@@ -108,8 +109,15 @@ def export_bidix(
         alphabet |= set(r.lexeme_from.lexeme)
         alphabet |= set(r.lexeme_to.lexeme)
 
+        # resolved once per lexeme, from the prefetched metadata
+        for _l in (r.lexeme_from, r.lexeme_to):
+            if _l.pk not in lexeme_symbols:
+                lexeme_symbols[_l.pk] = _l.symbols()
+        r.symbols_from = lexeme_symbols[r.lexeme_from.pk]
+        r.symbols_to = lexeme_symbols[r.lexeme_to.pk]
+
         if sdef_flag:
-            symbols |= set(r.lexeme_from.symbols()) | set(r.lexeme_to.symbols())
+            symbols |= set(r.symbols_from) | set(r.symbols_to)
 
     alphabet = "".join(sorted(alphabet))
 
@@ -2,6 +2,7 @@ import os
 import io
 from django.core.management.base import BaseCommand, CommandError
 from manageXML.models import *
+from manageXML.history import add_history_arguments, command_history
 from django.conf import settings
 from ._dix_common import *
 
@@ -15,8 +16,11 @@ def add_attributes_to_relation(r: Relation, attributes: list, language: str):
 
 
 def add_element(e: DixElement, src_lang, tgt_lang, datafile):
+    """
+    Creates the lexemes of an element and returns the (lexeme_from, lexeme_to) pairs of its relations.
+    """
     if not e:
-        return
+        return []
 
     _ll, _ll_homoId, _ll_pos, _ll_pos_g = e.pair.left.lemma_homoId_POS()
     _rr, _rr_homoId, _rr_pos, _rr_pos_g = e.pair.right.lemma_homoId_POS()
@@ -57,15 +61,14 @@ def add_element(e: DixElement, src_lang, tgt_lang, datafile):
             )
         add_metadata_to_lexeme(_r, e.pair.right)
 
+    # the relations are created in bulk by the caller
+    pairs = []
     if _l and (e.direction is None or e.direction == "LR"):
-        r, created = Relation.objects.get_or_create(lexeme_from=_l, lexeme_to=_r)
-        add_attributes_to_relation(r, e.pair.left.symbol, src_lang)
-        add_attributes_to_relation(r, e.pair.right.symbol, tgt_lang)
+        pairs.append((_l, _r))
 
     if _r and (e.direction is None or e.direction == "RL"):
-        r, created = Relation.objects.get_or_create(lexeme_from=_r, lexeme_to=_l)
-        add_attributes_to_relation(r, e.pair.left.symbol, src_lang)
-        add_attributes_to_relation(r, e.pair.right.symbol, tgt_lang)
+        pairs.append((_r, _l))
+    return pairs
 
 
 class Command(BaseCommand):
@@ -94,6 +97,7 @@ class Command(BaseCommand):
             type=str,
             help="Three letter code of source language.",
         )
+        add_history_arguments(parser)
 
     def handle(self, *args, **options):
         file_path = options["file"]  # the directory containing the XML files
@@ -110,17 +114,30 @@ class Command(BaseCommand):
         with io.open(file_path, "r", encoding="utf-8") as fp:
             dix = parse_dix(fp)
 
-        filename = os.path.splitext(os.path.basename(file_path))[0]
-        df = DataFile(lang_source=lang_target, lang_target=lang_source, name=filename)
-        df.save()
+        with command_history("import_dix", options):
+            filename = os.path.splitext(os.path.basename(file_path))[0]
+            df = DataFile(
+                lang_source=lang_target, lang_target=lang_source, name=filename
+            )
+            df.save()
 
-        for sdef, comment in dix.sdefs.items():
-            try:
-                Symbol.objects.get_or_create(name=sdef, comment=comment)
-            except:  # exists but with different comment
-                pass
+            for sdef, comment in dix.sdefs.items():
+                try:
+                    Symbol.objects.get_or_create(name=sdef, comment=comment)
+                except:  # exists but with different comment
+                    pass
 
-        for e in dix.sections["main"].elements:
-            add_element(e, lang_source, lang_target, df)
+            element_pairs = []
+            for e in dix.sections["main"].elements:
+                for pair in add_element(e, lang_source, lang_target, df):
+                    element_pairs.append((e, pair))
+
+            relations = Relation.objects.bulk_upsert(
+                (pair for _, pair in element_pairs), history=True
+            )
+            for e, (_from, _to) in element_pairs:
+                r = relations[(_from.id, _to.id if _to else None)]
+                add_attributes_to_relation(r, e.pair.left.symbol, lang_source)
+                add_attributes_to_relation(r, e.pair.right.symbol, lang_target)
 
         self.stdout.write(self.style.SUCCESS("Successfully imported the file."))
@@ -1,3 +1,45 @@
+import tempfile
+
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from manageXML.constants import GENERIC_METADATA, LEXEME_TYPE
+from manageXML.models import Language, Lexeme, LexemeMetadata, Relation, Symbol
+from apertium.management.commands.export_dix import export_bidix
+
 
 # Create your tests here.
+class ExportBidixTest(TestCase):
+    def setUp(self):
+        self.sms = Language.objects.create(id="sms", name="Skolt Sami")
+        self.fin = Language.objects.create(id="fin", name="Finnish")
+        Symbol.objects.create(name="np", comment="Proper noun")
+
+    def add_relations(self, n):
+        start = Relation.objects.count()
+        for i in range(start, start + n):
+            _from = Lexeme.objects.create(
+                lexeme="sms%d" % i, pos="N", language=self.sms
+            )
+            _to = Lexeme.objects.create(lexeme="fin%d" % i, pos="N", language=self.fin)
+            LexemeMetadata.objects.create(lexeme=_from, type=LEXEME_TYPE, text="Prop")
+            LexemeMetadata.objects.create(lexeme=_to, type=GENERIC_METADATA, text="sg")
+            Relation.objects.create(lexeme_from=_from, lexeme_to=_to)
+
+    def export(self):
+        with tempfile.TemporaryDirectory() as directory, CaptureQueriesContext(
+            connection
+        ) as queries:
+            export_bidix("sms", "fin", directory, sdef=True)
+        return len(queries)
+
+    def test_constant_queries(self):
+        self.add_relations(1)
+        n_queries = self.export()
+        self.add_relations(5)
+        self.assertEqual(self.export(), n_queries)
+
+    def test_symbols(self):
+        self.add_relations(1)
+        self.assertEqual(Lexeme.objects.get(lexeme="sms0").symbols(), ["np"])
+        self.assertEqual(Lexeme.objects.get(lexeme="fin0").symbols(), ["sg", "n"])
@@ -1,5 +1,7 @@
 import re
 import io
+from manageXML.constants import GENERIC_METADATA, LEXEME_TYPE
+from apertium.constants import POS_tags_rev
 
 
 def gt2ap(gt2ap_file):
@@ -29,3 +31,26 @@ def gt2ap(gt2ap_file):
                 for _l in mappings
             ]
         )
+
+
+def apertium_symbols(pos, metadata):
+    """
+    Returns the Apertium symbols of a lexeme: the texts of its generic metadata followed by its POS tag
+    ("np" for proper nouns). Computed in Python, so the metadata can come from a prefetched set.
+
+    :param pos: The POS of the lexeme.
+    :param metadata: An iterable of the LexemeMetadata objects of the lexeme.
+    :return list: The symbols.
+    """
+    metadata = list(metadata)
+    symbols = [m.text for m in metadata if m.type == GENERIC_METADATA]
+    pos_c = pos.upper()
+    if pos_c in POS_tags_rev:
+        pos = POS_tags_rev[pos_c]
+        if pos == "n" and any(
+            m.type == LEXEME_TYPE and m.text.lower() == "prop" for m in metadata
+        ):
+            symbols.append("np")
+        else:
+            symbols.append(pos)
+    return symbols
@@ -11,6 +11,11 @@ class LexemeAdmin(SimpleHistoryAdmin):
     )
 
 
+class LanguageAdmin(admin.ModelAdmin):
+    list_display = ("id", "name")
+    fields = ("id", "name", "alphabet", "ignored_characters")
+
+
 class RelationAdmin(SimpleHistoryAdmin):
     search_fields = (
         "id",
@@ -20,6 +25,7 @@ class RelationAdmin(SimpleHistoryAdmin):
 
 
 admin.site.register(DataFile)
+admin.site.register(Language, LanguageAdmin)
 admin.site.register(Lexeme, LexemeAdmin)
 admin.site.register(Relation, RelationAdmin)
 admin.site.register(Affiliation)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ManagexmlConfig(AppConfig):
     name = "manageXML"
+
+    def ready(self):
+        from .versions import connect_signals
+
+        connect_signals()
@@ -0,0 +1,375 @@
+import os
+import glob
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.functional import cached_property
+
+logger = logging.getLogger("verdd.manageXML")
+
+# an archive is a directory per historical model with a gzipped JSONL file per month:
+# <model>/<YYYY-MM>.jsonl.gz
+PARTITION_FORMAT = "%Y-%m"
+EXTENSION = ".jsonl.gz"
+
+
+def historical_models():
+    """
+    Returns the historical models of the app, by their lower case name (e.g. "historicallexeme").
+    """
+    return {
+        model._meta.model_name: model
+        for model in apps.get_app_config("manageXML").get_models()
+        if hasattr(model, "instance_type")
+    }
+
+
+def archive_directory(model, directory=None):
+    return os.path.join(
+        directory or settings.HISTORY_ARCHIVE_DIR, model._meta.model_name
+    )
+
+
+def partition_path(model, partition, directory=None):
+    return os.path.join(archive_directory(model, directory), partition + EXTENSION)
+
+
+def partitions(model, directory=None):
+    """
+    Returns the names (YYYY-MM) of the archived partitions of a historical model, oldest first.
+    """
+    paths = glob.glob(
+        os.path.join(archive_directory(model, directory), "*" + EXTENSION)
+    )
+    return sorted(os.path.basename(p)[: -len(EXTENSION)] for p in paths)
+
+
+def _serialize(obj):
+    return json.dumps(
+        {f.attname: f.value_from_object(obj) for f in obj._meta.concrete_fields},
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+    )
+
+
+def _deserialize(model, line):
+    values = json.loads(line)
+    return model(
+        **{
+            f.attname: f.to_python(values[f.attname])
+            for f in model._meta.concrete_fields
+            if f.attname in values
+        }
+    )
+
+
+def archive_history(model, before, directory=None, chunk_size=2000):
+    """
+    Moves the entries of a historical model older than ``before`` to the archive, in primary key order.
+
+    Each chunk is appended to its monthly partitions (a new gzip member per chunk) before it is deleted in
+    its own transaction, so an interrupted run loses no entries; at worst the last chunk is archived twice,
+    which restore_history() ignores.
+
+    :param model: The historical model.
+    :param before: Entries with an earlier history_date are archived.
+    :param directory: The archive directory (default: settings.HISTORY_ARCHIVE_DIR).
+    :param chunk_size: The number of entries read, written and deleted at once.
+    :return: A generator of the number of entries archived by each chunk.
+    """
+    os.makedirs(archive_directory(model, directory), exist_ok=True)
+    queryset = model.objects.filter(history_date__lt=before).order_by("history_id")
+
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(history_id__gt=last_id)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1].history_id
+
+        lines = defaultdict(list)
+        for obj in chunk:
+            lines[obj.history_date.strftime(PARTITION_FORMAT)].append(_serialize(obj))
+        for partition, _lines in lines.items():
+            path = partition_path(model, partition, directory)
+            with open(path, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as f:
+                    f.write(("\n".join(_lines) + "\n").encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+        with transaction.atomic():
+            model.objects.filter(history_id__in=[o.history_id for o in chunk]).delete()
+        yield len(chunk)
+
+
+def read_partition(model, partition, directory=None):
+    """
+    Returns a generator of the (unsaved) entries of an archived partition.
+    """
+    with gzip.open(
+        partition_path(model, partition, directory), "rt", encoding="utf-8"
+    ) as f:
+        for line in f:
+            if line.strip():
+                yield _deserialize(model, line)
+
+
+def read_archive(model, start_date, end_date, directory=None):
+    """
+    Returns a generator of the archived entries of a historical model between two dates (inclusive).
+    """
+    first, last = (
+        start_date.strftime(PARTITION_FORMAT),
+        end_date.strftime(PARTITION_FORMAT),
+    )
+    for partition in partitions(model, directory):
+        if not first <= partition <= last:
+            continue
+        for obj in read_partition(model, partition, directory):
+            if start_date <= obj.history_date <= end_date:
+                yield obj
+
+
+def _history_key(record):
+    return record.history_date, record.history_id
+
+
+def _month_range(partition):
+    # the first moment of the month of a partition and of the next one
+    start = datetime.strptime(partition, PARTITION_FORMAT).replace(
+        tzinfo=dt_timezone.utc
+    )
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+Segment = namedtuple("Segment", ["start", "end", "partition", "count"])
+
+
+class ArchivedHistory:
+    """
+    The entries of a historical model between two dates, from its table and from its archive, newest
+    first. A sequence for Paginator: only the page is read, not the whole date range.
+
+    The date range is cut into the months that have an archived partition and the ranges in between. An
+    archived entry is in the partition of its month, so a page is the merge of the newest entries of the
+    table and of the partition of each month it overlaps. A partition is read as a stream, keeping at most
+    the entries up to the end of the page. The number of archived entries matching the filters is cached
+    per partition file.
+
+    Entries restored with restore_history --keep are both in the table and in the archive, and listed twice.
+    """
+
+    def __init__(self, queryset, start_date, end_date, filters=None, directory=None):
+        """
+        :param queryset: The entries of the table, already filtered by ``filters``.
+        :param start_date: The first moment of the range.
+        :param end_date: The last moment of the range (inclusive).
+        :param filters: The values of the fields of the entries, e.g. {"history_type": "~"}.
+        :param directory: The archive directory (default: settings.HISTORY_ARCHIVE_DIR).
+        """
+        self.model = queryset.model
+        self.queryset = queryset.order_by("-history_date", "-history_id")
+        self.start_date = start_date
+        self.end_date = end_date + timedelta(microseconds=1)  # exclusive
+        self.filters = filters or {}
+        self.directory = directory
+
+    def _matches(self, record, start, end):
+        return start <= record.history_date < end and all(
+            getattr(record, k) == v for k, v in self.filters.items()
+        )
+
+    def _archived(self, segment):
+        return (
+            h
+            for h in read_partition(self.model, segment.partition, self.directory)
+            if self._matches(h, segment.start, segment.end)
+        )
+
+    def _archived_count(self, start, end, partition):
+        path = partition_path(self.model, partition, self.directory)
+        stat = os.stat(path)
+        signature = repr(
+            (
+                path,
+                stat.st_mtime_ns,
+                stat.st_size,
+                start.isoformat(),
+                end.isoformat(),
+                sorted(self.filters.items()),
+            )
+        )
+        key = "history_archive_count:%s" % hashlib.md5(signature.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = sum(1 for _ in self._archived(Segment(start, end, partition, 0)))
+            cache.set(key, count, 24 * 3600)
+        return count
+
+    def _table(self, start, end):
+        return self.queryset.filter(history_date__gte=start, history_date__lt=end)
+
+    @cached_property
+    def segments(self):
+        """
+        Returns the segments of the date range, newest first, with their number of entries.
+        """
+        first, last = (
+            self.start_date.strftime(PARTITION_FORMAT),
+            self.end_date.strftime(PARTITION_FORMAT),
+        )
+        ranges, end = [], self.end_date
+        for partition in reversed(partitions(self.model, self.directory)):
+            if not first <= partition <= last:
+                continue
+            month_start, month_end = _month_range(partition)
+            month_start = max(month_start, self.start_date)
+            month_end = min(month_end, self.end_date)
+            if month_end < end:
+                ranges.append((month_end, end, None))
+            ranges.append((month_start, month_end, partition))
+            end = month_start
+        if self.start_date < end:
+            ranges.append((self.start_date, end, None))
+
+        segments = []
+        for start, end, partition in ranges:
+            count = self._table(start, end).count()
+            if partition is not None:
+                count += self._archived_count(start, end, partition)
+            segments.append(Segment(start, end, partition, count))
+        return segments
+
+    def count(self):
+        return sum(segment.count for segment in self.segments)
+
+    def __len__(self):
+        return self.count()
+
+    def _read(self, segment, start, stop):
+        # the entries start:stop of a segment
+        table = self._table(segment.start, segment.end)
+        if segment.partition is None:
+            return list(table[start:stop])
+        archived = heapq.nlargest(stop, self._archived(segment), key=_history_key)
+        merged = heapq.merge(table[:stop], archived, key=_history_key, reverse=True)
+        return list(islice(merged, start, stop))
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key : key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            stop = self.count()
+
+        records, offset = [], 0
+        for segment in self.segments:
+            if offset >= stop:
+                break
+            if offset + segment.count > start:
+                records.extend(
+                    self._read(
+                        segment,
+                        max(start - offset, 0),
+                        min(stop - offset, segment.count),
+                    )
+                )
+            offset += segment.count
+        return records
+
+
+def archived_previous(model, records, directory=None):
+    """
+    Finds the archived entries preceding history entries of a model, i.e. the latest earlier entry of the
+    same object (the history ID breaking the ties of the dates). The partitions are read newest first,
+    from the month of the newest entry, until the previous entries of all the objects are found.
+
+    :param model: The historical model.
+    :param records: Entries whose previous entry is not in the table.
+    :param directory: The archive directory (default: settings.HISTORY_ARCHIVE_DIR).
+    :return dict: The previous entries by the history_id of the entries they precede.
+    """
+    wanted = defaultdict(list)  # object ID -> entries
+    for record in records:
+        if record.history_type != "+":
+            wanted[record.id].append(record)
+    found = {}
+    if not wanted:
+        return found
+
+    last = max(r.history_date for rs in wanted.values() for r in rs).strftime(
+        PARTITION_FORMAT
+    )
+    for partition in reversed(partitions(model, directory)):
+        if partition > last:
+            continue
+        for h in read_partition(model, partition, directory):
+            for record in wanted.get(h.id, ()):
+                if _history_key(h) >= _history_key(record):
+                    continue
+                previous = found.get(record.history_id)
+                if previous is None or _history_key(h) > _history_key(previous):
+                    found[record.history_id] = h
+        # the older partitions only have older entries
+        for id in [
+            id for id, rs in wanted.items() if all(r.history_id in found for r in rs)
+        ]:
+            del wanted[id]
+        if not wanted:
+            break
+    return found
+
+
+def restore_history(model, partition, directory=None, chunk_size=2000, keep=False):
+    """
+    Loads an archived partition back to the table of a historical model. Entries that are already in the
+    table are skipped. The partition file is removed afterwards, unless ``keep`` is set.
+
+    :return int: The number of restored entries.
+    """
+    restored = 0
+    seen = set()  # an interrupted archiving may have written a chunk twice
+
+    def write(chunk):
+        seen.update(
+            model.objects.filter(
+                history_id__in=[o.history_id for o in chunk]
+            ).values_list("history_id", flat=True)
+        )
+        objs = []
+        for obj in chunk:
+            if obj.history_id not in seen:
+                seen.add(obj.history_id)
+                objs.append(obj)
+        model.objects.bulk_create(objs, batch_size=chunk_size)
+        return len(objs)
+
+    with transaction.atomic():
+        chunk = []
+        for obj in read_partition(model, partition, directory):
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                restored += write(chunk)
+                chunk = []
+        if chunk:
+            restored += write(chunk)
+
+    if not keep:
+        os.remove(partition_path(model, partition, directory))
+    logger.info(
+        "Restored %d entries of %s from %s" % (restored, model.__name__, partition)
+    )
+    return restored
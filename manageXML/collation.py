@@ -0,0 +1,92 @@
+import string
+
+# the default sort orders, used when the alphabet of a language is not set in the database
+DEFAULT_ALPHABETS = {
+    "sms": " !\"#$%&'()*+,-./0123456789:;<=>?@AАÂBCČƷǮDĐEẸFGǦǤHIJKǨLMNŊOÕPQRSŠTUVWXYZŽÅÄÖ[\\]^_`аaâbcčʒǯdđeẹfgǧǥhijkǩlmnŋoõpqrsštuvwxyzžåäöáś¨{|}ʹʼˈ~₋’",
+    "fin": " !\"#$%&'()*+,-./0123456789:;<=>?@AАBCDEFGHIJKLMNOPQRSŠTUVWXYZÅÄÖ[\\]^_₋`аabcdefghijklmnopqrsštuvwxyzåäö¨{|}ʹʼ’ˈÂČƷǮĐẸǦǤǨŊÕŽâáčʒǯđẹǧǥǩŋõśž~",
+}
+
+DEFAULT_IGNORED_CHARACTERS = " -ʹʼˈ" + string.punctuation
+
+# the initial letters of the languages without an alphabet, for the range filter of the lexemes
+DEFAULT_INITIALS = string.ascii_uppercase + "ÄÅÖ"
+
+_SEPARATOR = "\n"
+
+
+class _CollationTable(dict):
+    # str.translate() deletes the characters mapped to None, i.e. those not in the alphabet
+    def __missing__(self, key):
+        return None
+
+
+class Collation:
+    """
+    The sort order of a language, compiled into a str.translate() table.
+
+    The sort key of a string is its upper case form with every character replaced by the character
+    having the same rank in the code point order as the character has in the alphabet; the ignored
+    characters and the characters not in the alphabet are left out. Comparing the keys as binary
+    strings (see BinaryCharField) sorts the strings in the order of the alphabet.
+    """
+
+    def __init__(self, alphabet, ignored_characters=None):
+        if ignored_characters is None:
+            ignored_characters = DEFAULT_IGNORED_CHARACTERS
+        alphabet = "".join(dict.fromkeys(alphabet.replace(_SEPARATOR, "")))
+        self.alphabet = alphabet
+        self.ignored_characters = ignored_characters
+
+        self.table = _CollationTable(
+            (ord(c), k)
+            for c, k in zip(alphabet, sorted(alphabet))
+            if c not in ignored_characters
+        )
+        self.table[ord(_SEPARATOR)] = _SEPARATOR
+
+    def key(self, s):
+        return s.upper().translate(self.table).replace(_SEPARATOR, "")
+
+    def keys(self, strings):
+        """
+        Returns the sort keys of many strings, translating them all at once.
+        """
+        strings = list(strings)
+        if any(_SEPARATOR in s for s in strings):
+            return [self.key(s) for s in strings]
+        if not strings:
+            return []
+        return _SEPARATOR.join(strings).upper().translate(self.table).split(_SEPARATOR)
+
+
+def initial_rank(key, collation=None):
+    """
+    Returns the rank of the initial letter of a string in the alphabet of its language: the code point of
+    the first character of its sort key, which orders the initials like the alphabet and gives the upper
+    and lower case forms of a letter the same rank.
+
+    :param key: The sort key of the string (see Collation.key()), or the string itself for the languages
+        without a collation.
+    :param collation: The collation of the language, if any.
+    :return int: The rank, or None if the string has no sorted character.
+    """
+    if collation is None:
+        key = key.upper().lstrip(DEFAULT_IGNORED_CHARACTERS)
+    return ord(key[0]) if key else None
+
+
+def initials(collation=None):
+    """
+    Returns the initial letters of a language, the upper case letters of its alphabet, in alphabetical
+    order with their ranks (see initial_rank()).
+
+    :param collation: The collation of the language (default: DEFAULT_INITIALS in code point order).
+    :return list: (letter, rank) tuples.
+    """
+    if collation is None:
+        return [(c, initial_rank(c)) for c in DEFAULT_INITIALS]
+    return [
+        (c, initial_rank(collation.key(c), collation))
+        for c in collation.alphabet
+        if c.isalpha() and c.upper() == c and c not in collation.ignored_characters
+    ]
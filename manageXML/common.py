@@ -115,8 +115,19 @@ class Rhyme:
         "щ",
     ]
 
+    # the characters replaced by "C" in the assonance and the consonance keys
+    ASSONANCE_TABLE = str.maketrans(dict.fromkeys(CONSONANTS, "C"))
+    CONSONANCE_TABLE = str.maketrans(dict.fromkeys(VOWELS, "C"))
+
+    KINDS = ("assonance", "consonance")
+
     @staticmethod
     def replace_character(word, characters):
+        if characters is Rhyme.CONSONANTS:
+            return word.translate(Rhyme.ASSONANCE_TABLE)
+        if characters is Rhyme.VOWELS:
+            return word.translate(Rhyme.CONSONANCE_TABLE)
+        characters = set(characters)
         return "".join(["C" if w in characters else w for w in word])
 
     @staticmethod
@@ -136,3 +147,26 @@ class Rhyme:
     @staticmethod
     def consonance_rev(word, characters=None):
         return Rhyme.consonance(word, characters)[::-1]
+
+    @staticmethod
+    def suffix_key(word, kind="assonance", depth=None):
+        """
+        Returns the reversed rhyme key of the last ``depth`` characters of a word, the prefix of the
+        reversed keys (assonance_rev, consonance_rev) of the words rhyming with it.
+
+        :param word: The word to rhyme with.
+        :param kind: "assonance" or "consonance".
+        :param depth: The number of characters from the end that must rhyme (default: all).
+        """
+        key = getattr(Rhyme, "%s_rev" % kind)(word)
+        return key[:depth] if depth else key
+
+    @staticmethod
+    def pattern_key(pattern, depth=None):
+        """
+        Same as suffix_key(), but for a pattern written with the key characters, e.g. "Caa" for a
+        consonant followed by two a's. The letters are lower cased like the words of the keys, except
+        the placeholder "C".
+        """
+        key = "C".join(part.lower() for part in pattern.split("C"))[::-1]
+        return key[:depth] if depth else key
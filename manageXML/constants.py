@@ -906,6 +906,7 @@ DOWNLOAD_TYPE_GIELLA_XML = 2
 DOWNLOAD_TYPE_APERTIUM_BIDIX = 3
 DOWNLOAD_TYPE_TRANSLATION_PREDICTIONS = 4
 DOWNLOAD_TYPE_LATEX = 5
+DOWNLOAD_TYPE_HISTORY = 6
 
 DOWNLOAD_TYPES = (
     (DOWNLOAD_TYPE_LEXC, _("LEXC")),
@@ -913,6 +914,7 @@ DOWNLOAD_TYPES = (
     (DOWNLOAD_TYPE_APERTIUM_BIDIX, _("APERTIUM_BIDIX")),
     (DOWNLOAD_TYPE_TRANSLATION_PREDICTIONS, _("TRANSLATION_PREDICTIONS")),
     (DOWNLOAD_TYPE_LATEX, _("LaTeX")),
+    (DOWNLOAD_TYPE_HISTORY, _("History")),
 )
 
 DOWNLOAD_STATUS_PENDING = "pending"
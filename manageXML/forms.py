@@ -4,6 +4,8 @@ from django.utils.translation import gettext_lazy as _
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Submit, Row, Column, Div, HTML, Button
 from .constants import *
+from .common import Rhyme
+from .history import EXPORT_NDJSON, EXPORT_CSV
 from datetime import timedelta
 from django.utils import timezone
 from django.db.models import Q, Count
@@ -532,6 +534,24 @@ class HistoryForm(forms.Form):
         required=True,
         label=_("Model"),
     )
+    include_archive = forms.BooleanField(
+        required=False,
+        label=_("Search the archive"),
+        help_text=_("Also read the archived entries, slow for long date ranges."),
+    )
+    history_user = forms.ModelChoiceField(
+        queryset=User.objects.order_by("username"), required=False, label=_("User")
+    )
+    history_type = forms.ChoiceField(
+        choices=(
+            ("", _("All")),
+            ("+", _("Created")),
+            ("~", _("Changed")),
+            ("-", _("Deleted")),
+        ),
+        required=False,
+        label=_("Type"),
+    )
 
     def __init__(self, *args, **kwargs):
         super(HistoryForm, self).__init__(*args, **kwargs)
@@ -547,6 +567,59 @@ class HistoryForm(forms.Form):
         )
 
 
+class HistoryExportForm(HistoryForm):
+    format = forms.ChoiceField(
+        choices=((EXPORT_NDJSON, "NDJSON"), (EXPORT_CSV, "CSV")),
+        required=False,
+        label=_("Format"),
+    )
+
+
+class RhymeSearchForm(forms.Form):
+    word = forms.CharField(label=_("Word"), max_length=250, required=False)
+    pattern = forms.CharField(
+        label=_("Pattern"),
+        max_length=250,
+        required=False,
+        help_text=_("The end of the rhyme key, e.g. Caa."),
+    )
+    kind = forms.ChoiceField(
+        choices=(
+            ("assonance", _("Assonance")),
+            ("consonance", _("Consonance")),
+        ),
+        initial="assonance",
+        required=False,
+        label=_("Rhyme"),
+    )
+    depth = forms.IntegerField(
+        min_value=1,
+        max_value=50,
+        initial=3,
+        required=False,
+        label=_("Depth"),
+        help_text=_("The number of characters from the end that must rhyme."),
+    )
+    language = forms.ModelChoiceField(
+        queryset=Language.objects.all(), required=False, label=_("Language")
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        word, pattern = cleaned_data.get("word"), cleaned_data.get("pattern")
+        kind = cleaned_data.get("kind") or "assonance"
+        depth = cleaned_data.get("depth") or self.fields["depth"].initial
+
+        if pattern:
+            cleaned_data["key"] = Rhyme.pattern_key(pattern, depth)
+        elif word:
+            cleaned_data["key"] = Rhyme.suffix_key(word, kind, depth)
+        else:
+            raise forms.ValidationError(_("Give a word or a pattern."))
+        cleaned_data["kind"] = kind
+        return cleaned_data
+
+
 class ApprovalMultipleChoiceForm(forms.Form):
     choices = forms.ModelMultipleChoiceField(
         queryset=None,
@@ -745,8 +818,9 @@ class FileRequestForm(forms.ModelForm):
         fields = ["lang_source", "lang_target", "type"]
 
     type = forms.ChoiceField(
-        choices=DOWNLOAD_TYPES[1:], label=_("Download Type")
-    )  # remove lexc file
+        choices=[t for t in DOWNLOAD_TYPES[1:] if t[0] != DOWNLOAD_TYPE_HISTORY],
+        label=_("Download Type"),
+    )  # remove lexc file, the history is requested from the history search
     lang_source = LanguageChoiceField(
         queryset=Language.objects.annotate(lexeme_count=Count("lexemes")).filter(
             lexeme_count__gt=0
@@ -0,0 +1,370 @@
+import csv
+import datetime
+import json
+import threading
+import uuid
+import logging
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, prefetch_related_objects
+from django.utils import timezone
+from simple_history import models as simple_history_models
+from .archive import archived_previous
+
+logger = logging.getLogger("verdd.manageXML")
+
+# the history modes of the commands: a history row per save, buffered bulk inserts or no history
+HISTORY_EACH = "each"
+HISTORY_BULK = "bulk"
+HISTORY_OFF = "off"
+HISTORY_MODES = (HISTORY_EACH, HISTORY_BULK, HISTORY_OFF)
+
+# the formats of the history exports
+EXPORT_NDJSON = "ndjson"
+EXPORT_CSV = "csv"
+EXPORT_FORMATS = (EXPORT_NDJSON, EXPORT_CSV)
+
+# derived fields left out of the changes shown to the users
+DIFF_EXCLUDED_FIELDS = (
+    "changed_by",
+    "assonance",
+    "assonance_rev",
+    "consonance",
+    "consonance_rev",
+    "lexeme_lang",
+    "homonyms",
+    "lang_from",
+    "lang_to",
+)
+
+_state = threading.local()
+
+
+class HistoryBatch:
+    """
+    The history entries buffered by bulk_history(), written with one multi-row INSERT per historical model
+    and ``batch_size`` entries.
+    """
+
+    def __init__(self, name, user=None, batch_size=1000):
+        self.name = name
+        self.user = user
+        self.batch_size = batch_size
+        self.closed = False
+        self.written = 0
+        self._rows = defaultdict(list)  # historical model -> unsaved entries
+        self._size = 0
+
+    def add(self, row):
+        if transaction.get_connection().in_atomic_block:
+            # keep the entry only if the transaction saving the object commits
+            transaction.on_commit(lambda: self._append(row))
+        else:
+            self._append(row)
+
+    def _append(self, row):
+        self._rows[type(row)].append(row)
+        self._size += 1
+        if self.closed or self._size >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model, rows in self._rows.items():
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
+            self.written += len(rows)
+        self._rows.clear()
+        self._size = 0
+
+
+def current_batch():
+    """
+    Returns the HistoryBatch of the running bulk_history() block, if any.
+    """
+    return getattr(_state, "batch", None)
+
+
+def history_disabled():
+    return getattr(_state, "disabled", False)
+
+
+@contextmanager
+def bulk_history(name=None, user=None, batch_size=1000):
+    """
+    Buffers the history entries of the objects saved or deleted in the block and writes them in bulk.
+
+    The entries are tagged with the name of the batch (as their change reason) and, unless the object
+    sets its own, with ``user``. Entries of objects saved in a transaction are only kept if it commits.
+    Nested blocks join the outer batch.
+
+    :param name: The name of the batch (default: a random one).
+    :param user: The user of the entries.
+    :param batch_size: The number of entries inserted at once.
+    :return HistoryBatch: The batch.
+    """
+    if current_batch() is not None:
+        yield current_batch()
+        return
+
+    batch = HistoryBatch(name or "batch:%s" % uuid.uuid4().hex[:12], user, batch_size)
+    _state.batch = batch
+    try:
+        yield batch
+    finally:
+        _state.batch = None
+        # entries of transactions committing after the block are written right away
+        batch.closed = True
+        batch.flush()
+        logger.info("Wrote %d history entries of %s" % (batch.written, batch.name))
+
+
+@contextmanager
+def no_history():
+    """
+    Saves the objects in the block without history entries, e.g. for recomputing derived fields.
+    """
+    disabled = history_disabled()
+    _state.disabled = True
+    try:
+        yield
+    finally:
+        _state.disabled = disabled
+
+
+class HistoricalRecords(simple_history_models.HistoricalRecords):
+    """
+    HistoricalRecords whose entries can be buffered (see bulk_history()) or skipped (see no_history()).
+    """
+
+    def create_historical_record(self, instance, history_type, using=None):
+        if history_disabled():
+            return
+        batch = current_batch()
+        manager = getattr(instance, self.manager_name)
+        if batch is None or getattr(manager.model, "_history_m2m_fields", None):
+            return super().create_historical_record(instance, history_type, using)
+
+        attrs = {
+            field.attname: getattr(instance, field.attname)
+            for field in self.fields_included(instance)
+        }
+        if getattr(manager.model, "history_relation", None) is not None:
+            attrs["history_relation"] = instance
+
+        batch.add(
+            manager.model(
+                history_date=getattr(instance, "_history_date", timezone.now()),
+                history_type=history_type,
+                history_user=self.get_history_user(instance) or batch.user,
+                history_change_reason=self.get_change_reason_for_object(
+                    instance, history_type, using
+                )
+                or batch.name,
+                **attrs,
+            )
+        )
+
+
+def diff_history(record, prev_record):
+    """
+    Returns the changes of a history entry against the previous one (none for the first entry).
+    """
+    if prev_record is None:
+        return []
+    return record.diff_against(
+        prev_record, excluded_fields=DIFF_EXCLUDED_FIELDS
+    ).changes
+
+
+def prefetch_history_diffs(records, include_archive=False):
+    """
+    Computes the changes of a page of history entries at once, like diff_history(record, record.prev_record)
+    but with a bounded number of queries: one finding the previous entries of the page and one loading them
+    per historical model, plus one per foreign key of the recorded objects.
+
+    Sets ``changes`` and ``recorded_instance`` (the object as it was recorded) on every entry.
+
+    :param records: History entries, possibly of different models.
+    :param include_archive: Look for the previous entries missing from the table in the archive (see
+        archive_history), e.g. those of archived entries or of the first entry after the archived ones.
+    :return list: The entries.
+    """
+    records = list(records)
+    by_model = defaultdict(list)
+    for record in records:
+        by_model[type(record)].append(record)
+
+    for model, _records in by_model.items():
+        previous = model.objects.filter(
+            id=OuterRef("id"), history_date__lt=OuterRef("history_date")
+        ).order_by("-history_date", "-history_id")
+        prev_ids = dict(
+            model.objects.filter(history_id__in=[r.history_id for r in _records])
+            .annotate(prev_history_id=Subquery(previous.values("history_id")[:1]))
+            .values_list("history_id", "prev_history_id")
+        )
+        prev_records = model.objects.in_bulk(
+            [id for id in prev_ids.values() if id is not None]
+        )
+        archived = {}
+        if include_archive:
+            archived = archived_previous(
+                model,
+                [r for r in _records if prev_ids.get(r.history_id) is None],
+            )
+        for record in _records:
+            prev_record = prev_records.get(
+                prev_ids.get(record.history_id)
+            ) or archived.get(record.history_id)
+            record.changes = diff_history(record, prev_record)
+            record.recorded_instance = record.instance
+
+        instances = [r.recorded_instance for r in _records]
+        prefetch_related_objects(
+            instances,
+            *(
+                f.name
+                for f in model.instance_type._meta.concrete_fields
+                if f.many_to_one
+            ),
+        )
+    return records
+
+
+def date_range(start_date, end_date):
+    """
+    Returns the aware datetimes from the beginning of the first date to the end of the last one.
+    """
+    return (
+        timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min)),
+        timezone.make_aware(datetime.datetime.combine(end_date, datetime.time.max)),
+    )
+
+
+def iter_history(
+    model, start_date, end_date, user=None, history_type=None, chunk_size=2000
+):
+    """
+    Returns a generator of the entries of a historical model between two dates (inclusive), oldest first.
+
+    The entries are read in chunks with keyset pagination over (history_date, history_id), so the memory
+    use does not grow with the date range and the last chunk is as fast to read as the first one.
+
+    :param model: The historical model.
+    :param start_date: The first date.
+    :param end_date: The last date.
+    :param user: Only the entries of this user.
+    :param history_type: Only the entries of this type (+, ~ or -).
+    :param chunk_size: The number of entries read at once.
+    """
+    queryset = model.objects.filter(
+        history_date__gte=start_date, history_date__lte=end_date
+    )
+    if user is not None:
+        queryset = queryset.filter(history_user=user)
+    if history_type:
+        queryset = queryset.filter(history_type=history_type)
+    queryset = queryset.select_related("history_user").order_by(
+        "history_date", "history_id"
+    )
+
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(
+                Q(history_date__gt=last.history_date)
+                | Q(history_date=last.history_date, history_id__gt=last.history_id)
+            )
+        chunk = list(chunk[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            break
+        last = chunk[-1]
+
+
+def history_row(record):
+    """
+    Returns the fields of a history entry by their column names, with the username of the entry.
+    """
+    row = {f.attname: f.value_from_object(record) for f in record._meta.concrete_fields}
+    row["history_username"] = (
+        record.history_user.username if record.history_user_id else None
+    )
+    return row
+
+
+class _Echo:
+    # a file-like object returning what is written, for streaming the csv rows
+    def write(self, value):
+        return value
+
+
+def export_history(model, records, format=EXPORT_NDJSON):
+    """
+    Returns a generator of the lines of an export of history entries, one entry per line.
+
+    :param model: The historical model of the entries.
+    :param records: The entries, e.g. from iter_history().
+    :param format: ndjson (a JSON object per line) or csv (with a header line).
+    """
+    if format == EXPORT_CSV:
+        columns = [f.attname for f in model._meta.concrete_fields]
+        columns.append("history_username")
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for record in records:
+            row = history_row(record)
+            yield writer.writerow([row[c] for c in columns])
+    else:
+        for record in records:
+            yield json.dumps(
+                history_row(record), cls=DjangoJSONEncoder, ensure_ascii=False
+            ) + "\n"
+
+
+def add_history_arguments(parser):
+    """
+    Adds the --history and --history-user options of the commands writing many objects.
+    """
+    parser.add_argument(
+        "--history",
+        type=str,
+        choices=HISTORY_MODES,
+        default=HISTORY_BULK,
+        help="Write a history entry per saved object (each), buffer them and write them in bulk (bulk) "
+        "or write none (off).",
+    )
+    parser.add_argument(
+        "--history-user",
+        type=str,
+        nargs="?",
+        default=None,
+        help="The username of the history entries.",
+    )
+
+
+def command_history(command, options, user=None):
+    """
+    Returns the history context of a command run with the options added by add_history_arguments().
+
+    :param command: The name of the command, used in the name of the batch.
+    :param options: The options of the command.
+    :param user: The user of the history entries, if --history-user is not given.
+    """
+    if options.get("history_user"):
+        try:
+            user = User.objects.get(username=options["history_user"])
+        except User.DoesNotExist:
+            raise CommandError('User "%s" does not exist.' % options["history_user"])
+
+    mode = options.get("history", HISTORY_BULK)
+    if mode == HISTORY_OFF:
+        return no_history()
+    if mode == HISTORY_BULK:
+        return bulk_history("%s:%s" % (command, uuid.uuid4().hex[:12]), user)
+    return nullcontext()
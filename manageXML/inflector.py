@@ -1,54 +1,39 @@
+import os
+import re
+import logging
 import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 
 from uralicNLP import uralicApi
-from manageXML.models import Lexeme
-from django.core.cache import cache  # Cache mini paradigms per language
+from manageXML.models import Lexeme, Language, GeneratedParadigm
+from manageXML.registry import language_registry
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.core.cache import cache
+
+logger = logging.getLogger("verdd.manageXML")
 
 
 def uralicNLP_language_supported(language):
-    cache_key = f"language_supported_{language}"
-    supported = cache.get(cache_key)
-    if supported is None:
-        supported = uralicApi.supported_languages().get(language) is not None
-        cache.set(cache_key, supported)
-    return supported
+    return language_registry.is_supported(language)
 
 
 # Ensure the uralicNLP model is installed
 def ensure_model_is_installed(language):
-    if not uralicApi.is_language_installed(
-        language
-    ):  # uralicNLP_language_supported(language)
+    if not language_registry.is_installed(language):
         uralicApi.download(language)
+        language_registry.set_installed(language)
 
 
-def load_mini_paradigms(language):
-    cache_key = f"language_paradigms_{language}"
-    paradigms = cache.get(cache_key)
-    if paradigms is None:
-        paradigms = language.paradigms.filter(mini=True).all()
-        cache.set(cache_key, paradigms, timeout=3600)  # Cache for 1 hour
-    return paradigms
+def load_mini_paradigms(language, pos=None):
+    return language_registry.mini_paradigms(language, pos)
 
 
 def language_has_dictionary_forms(query, language):
-    cache_key = f"language_has_dictionary_forms_{language}"
-    language_has_dictionary_forms = cache.get(cache_key)
-    if language_has_dictionary_forms is None:
-        try:
-            # Attempt to generate with dictionary_forms=True
-            uralicApi.generate(query, language, dictionary_forms=True)
-            language_has_dictionary_forms = True
-        except Exception:
-            # If generating with dictionary_forms=True fails, assume it is not supported
-            language_has_dictionary_forms = False
-        cache.set(
-            cache_key, language_has_dictionary_forms, timeout=3600 * 24
-        )  # Cache for a day
-        print(
-            f"Language {language} has dictionary forms: {language_has_dictionary_forms}"
-        )
-    return language_has_dictionary_forms
+    return language_registry.has_dictionary_forms(language, query)
 
 
 def generate_using_uralicNLP(query, language):
@@ -65,56 +50,455 @@ def generate_using_uralicNLP(query, language):
     return []
 
 
-def _thread_wrapper(result_container, query, language):
+def _model_path(language):
+    return uralicApi.__where_models(language, True)
+
+
+def process_rss():
+    """
+    Returns the resident memory of the current process in bytes (0 if unknown).
+    """
     try:
-        result = generate_using_uralicNLP(query, language)
-        result_container.append(result)
-    except Exception:
-        result_container.append([])
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
 
 
-def _call_uralicNLP_with_timeout(query, language, timeout=1):
-    result_container = []
-    thread = threading.Thread(
-        target=_thread_wrapper, args=(result_container, query, language)
-    )
-    thread.start()
-    thread.join(timeout=timeout)
-
-    if thread.is_alive():
-        print(
-            "Timeout occurred while generating forms for query:",
-            query,
-            "language:",
-            language,
+class GeneratorEngine:
+    """
+    Generates word forms in batches using one loaded generator transducer per language.
+
+    Transducers are loaded once per process and kept in memory. The lookups of a batch run on a
+    long-lived worker thread, so the caller waits at most ``timeout`` seconds for the whole batch and
+    gets back whatever was generated before the deadline. A batch that misses its deadline may be stuck
+    in a lookup, so its pool is left to finish on its own and later batches run on a new one.
+    """
+
+    SYMBOLS_RE = re.compile(r"@[^@]*@")
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._transducers = {}  # language -> list of transducers (None if unavailable)
+        self._versions = {}  # language -> version of the installed models
+        self._memory = {}  # language -> memory taken by loading the transducers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # threads do not survive a fork, start a new pool in every (child) process
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="verdd-generator"
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def _recycle_executor(self, executor):
+        """
+        Replaces the pool of a batch that missed its deadline, unless that was already done.
+        """
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False)
+
+    def _read_model_version(self, language):
+        path = _model_path(language)
+        if not path:
+            return ""
+        mtimes = [
+            os.path.getmtime(os.path.join(path, name))
+            for name in ("generator", "generator-norm")
+            if os.path.exists(os.path.join(path, name))
+        ]
+        return "%d" % max(mtimes) if mtimes else ""
+
+    def model_version(self, language):
+        """
+        Returns the version of the generator models of a language, without loading them.
+        """
+        if language not in self._versions:
+            self._versions[language] = self._read_model_version(language)
+        return self._versions[language]
+
+    def _load_transducer(self, language):
+        ensure_model_is_installed(language)
+        self._versions[language] = self._read_model_version(language)
+
+        # prefer the dictionary forms generator, fall back to the normative one
+        for dictionary_forms in (True, False):
+            try:
+                transducer = uralicApi.get_transducer(
+                    language,
+                    analyzer=False,
+                    descriptive=False,
+                    dictionary_forms=dictionary_forms,
+                    force_no_list=False,
+                )
+            except Exception:
+                continue
+            return transducer if isinstance(transducer, list) else [transducer]
+
+        logger.warning("No generator transducer could be loaded for %s." % language)
+        return None
+
+    def transducer(self, language):
+        """
+        Returns the loaded transducers of a language, loading them on first use.
+        """
+        if language not in self._transducers:
+            with self._lock:
+                if language not in self._transducers:
+                    rss = process_rss()
+                    self._transducers[language] = self._load_transducer(language)
+                    self._memory[language] = max(process_rss() - rss, 0)
+        return self._transducers[language]
+
+    def is_loaded(self, language):
+        return self._transducers.get(language) is not None
+
+    def loaded_languages(self):
+        return [l for l, t in self._transducers.items() if t is not None]
+
+    def status(self, languages=()):
+        """
+        Returns the state of the transducers of the given and all already loaded languages.
+        """
+        return {
+            language: {
+                "loaded": self.is_loaded(language),
+                "model_version": self._versions.get(language, ""),
+                "memory": self._memory.get(language, 0),
+            }
+            for language in sorted(set(languages) | set(self._transducers))
+        }
+
+    def _lookup(self, transducers, query):
+        forms = []
+        for transducer in transducers:
+            for form in transducer.lookup(query):
+                forms.append(self.SYMBOLS_RE.sub("", form[0]))
+        return forms
+
+    def _lookup_all(self, transducers, queries, results, cancelled):
+        for query in queries:
+            if cancelled.is_set():
+                break
+            try:
+                results[query] = self._lookup(transducers, query)
+            except Exception as e:
+                logger.error("Error generating forms for %s: %s" % (query, e))
+                results[query] = []
+
+    def lookup_batch(self, queries, language, timeout=None):
+        """
+        Generates the forms of many ``lemma+tags`` queries of the same language in one call.
+
+        :param queries: An iterable of queries (e.g. "vuõʹjj+N+Sg+Gen").
+        :param language: Three letter code of the language.
+        :param timeout: Deadline in seconds for the whole batch (default: settings.PARADIGM_GENERATION_TIMEOUT).
+        :return dict: Query -> list of generated forms, only for the queries processed before the deadline.
+        """
+        queries = list(dict.fromkeys(queries))  # unique, keeps the order
+        results = {}
+        if not queries:
+            return results
+
+        transducers = self.transducer(language)
+        if not transducers:
+            return {q: [] for q in queries}
+
+        if timeout is None:
+            timeout = settings.PARADIGM_GENERATION_TIMEOUT
+
+        cancelled = threading.Event()
+        executor = self._get_executor()
+        future = executor.submit(
+            self._lookup_all, transducers, queries, results, cancelled
         )
-        thread.join()
-        return []
-    else:
-        return result_container[0] if result_container else []
+        try:
+            future.result(timeout=timeout)
+        except TimeoutError:
+            cancelled.set()  # let the worker stop after its current lookup
+            self._recycle_executor(executor)  # don't queue later batches behind it
+            results = dict(results)
+            logger.warning(
+                "Timeout occurred while generating %d forms for language %s, %d queries dropped."
+                % (len(queries), language, len(queries) - len(results))
+            )
+        return dict(results)
 
+    def generate_batch(self, queries, language, timeout=None):
+        """
+        Same as lookup_batch(), but queries not processed before the deadline map to [].
+        """
+        queries = list(queries)
+        results = self.lookup_batch(queries, language, timeout=timeout)
+        return {q: results.get(q, []) for q in queries}
 
-def generate_inflections(lexeme: Lexeme) -> dict:
-    paradigms = load_mini_paradigms(lexeme.language)
 
-    if not paradigms:
-        return {}
+generator_engine = GeneratorEngine()
+
 
-    ensure_model_is_installed(lexeme.language.id)
+def preload_transducers(languages=None):
+    """
+    Loads the generator transducers of the configured languages (settings.PRELOAD_TRANSDUCERS).
 
+    Called in the uWSGI master and the Celery main process before they fork their workers, so the
+    workers share the loaded transducers instead of loading them on their first request.
+    """
+    languages = settings.PRELOAD_TRANSDUCERS if languages is None else languages
+    for language in languages:
+        try:
+            generator_engine.transducer(language)
+        except Exception as e:
+            logger.error("Couldn't preload the transducer of %s: %s" % (language, e))
+    return generator_engine.status(languages)
+
+
+def lexeme_query(lexeme: Lexeme) -> str:
     query = lexeme.lexeme
 
     if lexeme.homonyms_count > 1:
         query += f"+Hom{lexeme.homoId + 1}"
+    return query
 
-    generated_forms = {}
-    for paradigm in paradigms:
-        if lexeme.pos == paradigm.pos:
-            query_with_paradigm = f"{query}+{paradigm.form}"
-            _generation_forms = _call_uralicNLP_with_timeout(
-                query_with_paradigm, lexeme.language.id
-            )
-            generated_forms[paradigm.form] = [
-                _generated_form[0] for _generated_form in _generation_forms
-            ]
-    return generated_forms
+
+def paradigms_versions(language_ids):
+    return dict(
+        Language.objects.filter(id__in=set(language_ids)).values_list(
+            "id", "paradigms_version"
+        )
+    )
+
+
+def load_generated_paradigms(lexemes):
+    """
+    Returns the stored generated forms of the lexemes that are still valid, using a single query.
+
+    :return dict: Lexeme ID -> {paradigm form: [generated forms]}.
+    """
+    lexemes = {l.id: l for l in lexemes if l.language_id}
+    rows = GeneratedParadigm.objects.filter(lexeme_id__in=lexemes.keys()).values_list(
+        "lexeme_id", "form", "wordforms", "model_version", "paradigms_version"
+    )
+
+    stored = defaultdict(dict)
+    stale = set()
+    versions = None
+    for lexeme_id, form, wordforms, model_version, paradigms_version in rows:
+        if versions is None:
+            versions = paradigms_versions(l.language_id for l in lexemes.values())
+        language_id = lexemes[lexeme_id].language_id
+        if paradigms_version != versions.get(
+            language_id
+        ) or model_version != generator_engine.model_version(language_id):
+            stale.add(lexeme_id)
+        stored[lexeme_id][form] = wordforms
+    return {k: v for k, v in stored.items() if k not in stale}
+
+
+def generated_paradigms_versions(lexemes):
+    """
+    Returns the versions of the stored generated forms of the lexemes that are still valid, without loading
+    the forms. Lexemes without mini paradigms have nothing to generate and map to an empty tuple.
+
+    :return dict: Lexeme ID -> (model version, paradigms version, date of the last generation).
+    """
+    lexemes = {l.id: l for l in lexemes if l.language_id}
+    rows = (
+        GeneratedParadigm.objects.filter(lexeme_id__in=lexemes.keys())
+        .values_list("lexeme_id", "model_version", "paradigms_version")
+        .annotate(generated_date=Max("generated_date"))
+        .order_by()
+    )
+
+    nothing_to_generate = {
+        l.id for l in lexemes.values() if not load_mini_paradigms(l.language_id, l.pos)
+    }
+    versions = dict.fromkeys(nothing_to_generate, ())
+    stale = set()
+    current = None
+    for lexeme_id, model_version, paradigms_version, generated_date in rows:
+        if lexeme_id in nothing_to_generate:
+            continue
+        if current is None:
+            current = paradigms_versions(l.language_id for l in lexemes.values())
+        language_id = lexemes[lexeme_id].language_id
+        if (
+            lexeme_id in versions
+            or paradigms_version != current.get(language_id)
+            or model_version != generator_engine.model_version(language_id)
+        ):
+            stale.add(lexeme_id)  # outdated, or stored with more than one version
+        versions[lexeme_id] = (
+            model_version,
+            paradigms_version,
+            generated_date.isoformat(),
+        )
+    return {k: v for k, v in versions.items() if k not in stale}
+
+
+def store_generated_paradigms(generated, language_id):
+    """
+    Replaces the stored generated forms of the lexemes with the newly generated ones.
+
+    :param generated: Lexeme ID -> {paradigm form: [generated forms]}.
+    :param language_id: Three letter code of the language of the lexemes.
+    """
+    model_version = generator_engine.model_version(language_id)
+    paradigms_version = paradigms_versions([language_id]).get(language_id, 0)
+    rows = [
+        GeneratedParadigm(
+            lexeme_id=lexeme_id,
+            form=form,
+            wordforms=wordforms,
+            model_version=model_version,
+            paradigms_version=paradigms_version,
+        )
+        for lexeme_id, forms in generated.items()
+        for form, wordforms in forms.items()
+    ]
+    with transaction.atomic():
+        GeneratedParadigm.objects.filter(lexeme_id__in=generated.keys()).delete()
+        GeneratedParadigm.objects.bulk_create(
+            rows, batch_size=1000, ignore_conflicts=True
+        )
+
+
+def paradigm_queries(lexemes, paradigms) -> dict:
+    """
+    Builds the generator queries of the mini paradigms of lexemes (of the same language).
+
+    :return dict: Lexeme ID -> [(paradigm form, query), ...].
+    """
+    queries = {}
+    for lexeme in lexemes:
+        if lexeme.id in queries:
+            continue
+        _paradigms = [p for p in paradigms if lexeme.pos == p.pos]
+        query = lexeme_query(lexeme) if _paradigms else None
+        queries[lexeme.id] = [(p.form, f"{query}+{p.form}") for p in _paradigms]
+    return queries
+
+
+def collect_generated_forms(queries, forms):
+    """
+    Maps the generated forms back to the lexemes.
+
+    :param queries: Lexeme ID -> [(paradigm form, query), ...], as returned by paradigm_queries().
+    :param forms: Query -> list of generated forms, as returned by GeneratorEngine.lookup_batch().
+    :return tuple: The generated forms of all lexemes and of the lexemes whose queries all finished.
+    """
+    generated, completed = {}, {}
+    for lexeme_id, _queries in queries.items():
+        generated[lexeme_id] = {form: forms.get(q, []) for form, q in _queries}
+        if all(q in forms for _, q in _queries):
+            completed[lexeme_id] = generated[lexeme_id]
+    return generated, completed
+
+
+def generate_inflections_bulk(lexemes, timeout=None, use_stored=True) -> dict:
+    """
+    Generates the mini paradigms of many lexemes, one generator batch per language.
+
+    Valid stored forms are used as they are; the forms of the remaining lexemes are generated and stored
+    if the whole batch was generated before the deadline.
+
+    :param lexemes: An iterable of Lexeme objects.
+    :param timeout: Deadline in seconds for each language batch.
+    :param use_stored: Whether to read the stored generated forms first (they are always written).
+    :return dict: Lexeme ID -> {paradigm form: [generated forms]}.
+    """
+    lexemes = list(lexemes)
+    generated = load_generated_paradigms(lexemes) if use_stored else {}
+
+    lexemes_by_language = defaultdict(list)
+    for lexeme in lexemes:
+        if lexeme.language_id and lexeme.id not in generated:
+            lexemes_by_language[lexeme.language_id].append(lexeme)
+
+    for language_id, _lexemes in lexemes_by_language.items():
+        paradigms = load_mini_paradigms(language_id)
+        queries = paradigm_queries(_lexemes, paradigms)
+
+        batch = [q for _queries in queries.values() for _, q in _queries]
+        forms = generator_engine.lookup_batch(batch, language_id, timeout=timeout)
+
+        _generated, completed = collect_generated_forms(queries, forms)
+        generated.update(_generated)
+        if completed:
+            store_generated_paradigms(completed, language_id)
+    return generated
+
+
+def generate_inflections_coalesced(lexemes, timeout=None) -> dict:
+    """
+    Same as generate_inflections_bulk(), but concurrent calls (in any process sharing the cache) generate
+    the forms of a lexeme only once; the other callers wait for the stored forms until the deadline.
+    """
+    if timeout is None:
+        timeout = settings.PARADIGM_GENERATION_TIMEOUT
+
+    lexemes = list(lexemes)
+    generated = load_generated_paradigms(lexemes)
+
+    owned, waiting = [], []
+    for lexeme in lexemes:
+        if lexeme.id in generated or not lexeme.language_id:
+            continue
+        if not load_mini_paradigms(lexeme.language_id, lexeme.pos):
+            generated[lexeme.id] = {}  # nothing to generate, nothing to wait for
+        elif cache.add(f"generating_paradigms_{lexeme.id}", True, timeout=timeout):
+            owned.append(lexeme)
+        else:
+            waiting.append(lexeme)
+
+    try:
+        generated.update(
+            generate_inflections_bulk(owned, timeout=timeout, use_stored=False)
+        )
+    finally:
+        cache.delete_many([f"generating_paradigms_{l.id}" for l in owned])
+
+    deadline = time.monotonic() + timeout
+    while waiting and time.monotonic() < deadline:
+        time.sleep(0.05)
+        generated.update(load_generated_paradigms(waiting))
+        waiting = [l for l in waiting if l.id not in generated]
+
+    if waiting:  # the other request didn't finish in time, generate them here
+        generated.update(generate_inflections_bulk(waiting, timeout=timeout))
+    return generated
+
+
+def prefetch_inflections(lexemes, timeout=None, chunk_size=None):
+    """
+    Generates the mini paradigms of the lexemes in batches and stores them on the objects, so
+    later calls to generate_inflections() do not hit the transducers again. Stored forms (e.g. by the
+    generate_paradigms command) are read first.
+
+    :param timeout: Deadline in seconds for each language batch of each chunk.
+    :param chunk_size: The number of lexemes generated at once (all of them by default).
+    :return list: The lexemes whose forms were not all generated before the deadline.
+    """
+    lexemes = list(lexemes)
+    chunk_size = chunk_size or max(len(lexemes), 1)
+    incomplete = []
+    for i in range(0, len(lexemes), chunk_size):
+        chunk = lexemes[i : i + chunk_size]
+        generated = generate_inflections_bulk(chunk, timeout=timeout)
+        for lexeme in chunk:
+            lexeme._generated_forms = generated.get(lexeme.id, {})
+
+        # complete forms are stored, the ones cut off by the deadline are not
+        versions = generated_paradigms_versions(chunk)
+        incomplete += [l for l in chunk if l.language_id and l.id not in versions]
+    return incomplete
+
+
+def generate_inflections(lexeme: Lexeme) -> dict:
+    if hasattr(lexeme, "_generated_forms"):
+        return lexeme._generated_forms
+    return generate_inflections_bulk([lexeme]).get(lexeme.id, {})
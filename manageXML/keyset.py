@@ -0,0 +1,113 @@
+import operator
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+
+
+class Keyset:
+    """
+    The ordering of a queryset by columns of its model, ending with the primary key so that every row has
+    a distinct position. Rows are sought by the values of these columns (keyset pagination) instead of
+    being skipped with OFFSET, so that reading the rows after or before any row is an index range scan.
+
+    Used by KeysetPaginator for the pages of the lists and by LexemeDetailView for the lexemes around the
+    current one.
+    """
+
+    def __init__(self, keys):
+        """
+        :param keys: The (field, descending) pairs of the ordering.
+        """
+        self.keys = keys
+
+    @classmethod
+    def of(cls, queryset):
+        """
+        Returns the keyset of the ordering of a queryset, or None if it is not ordered by columns of its
+        model (e.g. by expressions or by the columns of a related model).
+        """
+        opts = queryset.model._meta
+        keys = []
+        for term in queryset.query.order_by or opts.ordering:
+            if not isinstance(term, str) or term == "?":
+                return None
+            name = term.lstrip("-")
+            try:
+                field = opts.pk if name == "pk" else opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if field.is_relation and (
+                not field.many_to_one or field.related_model._meta.ordering
+            ):
+                return None  # ordered by the columns of the related model
+            keys.append((field, term.startswith("-")))
+        if not any(field == opts.pk for field, _ in keys):
+            keys.append((opts.pk, keys[0][1] if keys else False))
+        return cls(keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def attnames(self):
+        return [field.attname for field, _ in self.keys]
+
+    def order_by(self, reverse=False):
+        """
+        Returns the ordering expressions, reversed if ``reverse``.
+        """
+        order_by = []
+        for field, desc in self.keys:
+            expression, desc = F(field.attname), desc != reverse
+            if field.null:  # nulls are the smallest values, as in MySQL and SQLite
+                order_by.append(
+                    expression.desc(nulls_last=True)
+                    if desc
+                    else expression.asc(nulls_first=True)
+                )
+            else:
+                order_by.append(expression.desc() if desc else expression.asc())
+        return order_by
+
+    def values(self, obj):
+        """
+        Returns the key values of an object.
+        """
+        return [getattr(obj, attname) for attname in self.attnames]
+
+    def to_python(self, values):
+        """
+        Converts key values read back from e.g. JSON to the types of their fields.
+        """
+        return [field.to_python(v) for (field, _), v in zip(self.keys, values)]
+
+    def seek(self, values, reverse=False, inclusive=False):
+        """
+        Returns the filter of the rows after (or before, if reverse) the row with the given key values.
+
+        :param values: The key values of the row.
+        :param reverse: The rows before the row.
+        :param inclusive: Include the row itself.
+        """
+        conditions, equal = [], Q()
+        for (field, desc), value in zip(self.keys, values):
+            desc = desc != reverse
+            if value is None:
+                beyond = None if desc else Q(**{field.attname + "__isnull": False})
+            else:
+                beyond = Q(**{field.attname + ("__lt" if desc else "__gt"): value})
+                if desc and field.null:
+                    beyond |= Q(**{field.attname + "__isnull": True})
+            if beyond is not None:
+                conditions.append(equal & beyond)
+            equal &= Q(
+                **(
+                    {field.attname + "__isnull": True}
+                    if value is None
+                    else {field.attname: value}
+                )
+            )
+        if inclusive:
+            conditions.append(equal)
+        return reduce(operator.or_, conditions) if conditions else Q(pk__in=[])
@@ -104,7 +104,7 @@ def create_lexeme(**args):
     data.pop("language", None)
     data.pop("homoId", None)
 
-    l, created = Lexeme.objects.get_or_create(
+    l, created = Lexeme.all_objects.get_or_create(
         lexeme=args["lexeme"],
         pos=args["pos"],
         language=args["language"],
@@ -115,7 +115,7 @@ def create_lexeme(**args):
 
 
 def create_relation(l1, l2, notes, source, source_type="book"):
-    r, created = Relation.objects.get_or_create(
+    r, created = Relation.all_objects.get_or_create(
         lexeme_from=l1, lexeme_to=l2, type=0, defaults={"notes": notes}
     )
     s, created = Source.objects.get_or_create(
@@ -3,6 +3,7 @@ import io, csv, os
 from ._private import *
 import logging
 from manageXML.models import *
+from manageXML import versions
 
 logger = logging.getLogger("verdd")  # Get an instance of a logger
 
@@ -43,6 +44,7 @@ class Command(BaseCommand):
             rows = [r for r in rows if len(r) > 0]
             ids = [r[0] for r in rows]
             Relation.objects.filter(pk__in=ids).update(checked=True)
+            versions.bump(Relation)
 
         self.stdout.write(
             self.style.SUCCESS('Successfully processed the file "%s"' % (file_path,))
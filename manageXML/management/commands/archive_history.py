@@ -0,0 +1,96 @@
+import re
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from manageXML.archive import archive_history, historical_models
+from tqdm import tqdm
+
+AGE_UNITS = {"d": 1, "w": 7, "m": 30, "y": 365}
+
+
+def parse_age(value):
+    """
+    Parses an age such as 365d, 12w, 6m or 1y into a timedelta.
+    """
+    match = re.fullmatch(r"(\d+)([dwmy])", value.strip())
+    if not match:
+        raise CommandError(
+            'Invalid age "%s", expected e.g. 365d, 12w, 6m or 1y.' % value
+        )
+    return timedelta(days=int(match.group(1)) * AGE_UNITS[match.group(2)])
+
+
+class Command(BaseCommand):
+    """
+    Example: python manage.py archive_history --older-than 365d
+    """
+
+    help = (
+        "This command moves the history entries older than the given age to gzipped JSONL files, one per model "
+        "and month, and deletes them from the database. Use restore_history to load them back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-o",
+            "--older-than",
+            type=str,
+            default="365d",
+            help="The age of the archived entries, e.g. 365d, 12w, 6m or 1y.",
+        )
+        parser.add_argument(
+            "-m",
+            "--model",
+            type=str,
+            nargs="*",
+            default=None,
+            help="Only archive the history of these models (e.g. lexeme relation).",
+        )
+        parser.add_argument(
+            "-d",
+            "--dir",
+            type=str,
+            default=None,
+            help="The archive directory (default: settings.HISTORY_ARCHIVE_DIR).",
+        )
+        parser.add_argument(
+            "-c",
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="The number of entries archived and deleted at once.",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - parse_age(options["older_than"])
+        directory = options["dir"] or settings.HISTORY_ARCHIVE_DIR
+
+        models = historical_models()
+        if options["model"]:
+            names = ["historical%s" % m.lower() for m in options["model"]]
+            unknown = [n for n in names if n not in models]
+            if unknown:
+                raise CommandError("Unknown models: %s" % ", ".join(unknown))
+            models = {n: models[n] for n in names}
+
+        started = time.time()
+        total = 0
+        for name, model in models.items():
+            count = model.objects.filter(history_date__lt=before).count()
+            if not count:
+                continue
+            with tqdm(total=count, unit="entry", desc=name) as progress:
+                for n in archive_history(
+                    model, before, directory, options["chunk_size"]
+                ):
+                    total += n
+                    progress.update(n)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Archived %d history entries older than %s to %s in %.1f seconds."
+                % (total, before.date(), directory, time.time() - started)
+            )
+        )
@@ -0,0 +1,110 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from manageXML.models import *
+import random
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    """
+    Example: python manage.py benchmark_lexeme_search --samples 50 --repeat 3
+    """
+
+    help = (
+        "This command compares the time of the lexeme substring searches answered with the trigram index "
+        "with the plain icontains lookup. The queries are given or sampled from the lexemes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-q",
+            "--query",
+            type=str,
+            nargs="*",
+            default=None,
+            help="The searched texts (default: substrings of random lexemes).",
+        )
+        parser.add_argument(
+            "-s",
+            "--samples",
+            type=int,
+            default=20,
+            help="The number of sampled queries.",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            default=3,
+            help="The number of runs of each query, the fastest one is kept.",
+        )
+        parser.add_argument(
+            "--lookup",
+            type=str,
+            choices=TRIGRAM_LOOKUPS,
+            default="icontains",
+            help="The lookup to benchmark.",
+        )
+
+    def sample_queries(self, n):
+        ids = list(Lexeme.objects.values_list("id", flat=True))
+        if not ids:
+            raise CommandError("There are no lexemes to sample the queries from.")
+        queries = []
+        for id in random.sample(ids, min(n, len(ids))):
+            text = Lexeme.objects.get(id=id).lexeme
+            if len(text) >= 3:
+                start = random.randrange(len(text) - 2)
+                queries.append(text[start : start + random.randint(3, 5)])
+        return queries
+
+    def time_query(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            n = len(queryset.values_list("id", flat=True))
+            timings.append(time.perf_counter() - started)
+        return min(timings), n
+
+    def handle(self, *args, **options):
+        queries = options["query"] or self.sample_queries(options["samples"])
+        lookup = options["lookup"]
+        if not queries:
+            raise CommandError("No queries of three or more characters.")
+
+        plain, indexed = [], []
+        for query in queries:
+            lexemes = Lexeme.objects.order_by("lexeme_lang")
+            t_plain, n_plain = self.time_query(
+                lexemes.filter(Q(**{"lexeme__%s" % lookup: query})), options["repeat"]
+            )
+            t_indexed, n_indexed = self.time_query(
+                lexemes.filter(trigram_q("lexeme", query, lookup)), options["repeat"]
+            )
+            if n_plain != n_indexed:
+                self.stdout.write(
+                    self.style.WARNING(
+                        '"%s": %d results, %d with the index (rebuild_trigram_index?)'
+                        % (query, n_plain, n_indexed)
+                    )
+                )
+            plain.append(t_plain)
+            indexed.append(t_indexed)
+            self.stdout.write(
+                '"%s" (%d results): %.1f ms, %.1f ms with the index'
+                % (query, n_plain, t_plain * 1000, t_indexed * 1000)
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "%s of %d queries, median: %.1f ms, %.1f ms with the index (%.1fx)."
+                % (
+                    lookup,
+                    len(queries),
+                    statistics.median(plain) * 1000,
+                    statistics.median(indexed) * 1000,
+                    statistics.median(plain) / max(statistics.median(indexed), 1e-9),
+                )
+            )
+        )
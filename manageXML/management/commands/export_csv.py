@@ -26,7 +26,7 @@ def export(src_lang, directory_path, *args, **kwargs):
     if checked is not None:
         relations = relations.filter(checked=checked)
 
-    relations_data = relations.filter(lexeme_from__language=src_lang).values_list(
+    relations_data = relations.filter(lang_from=src_lang).values_list(
         "id", "lexeme_from", "lexeme_to"
     )
 
@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models.functions import Cast, Substr, Upper
 from django.db.models import Prefetch, F, Value, When, Case
 from manageXML.models import *
 from manageXML.utils import *
+from manageXML.collation import initials
+from manageXML.inflector import prefetch_inflections
 from itertools import groupby
 from distutils.util import strtobool
 from django.template.loader import render_to_string
@@ -11,10 +12,24 @@ from django.conf import settings
 from zipfile import ZipFile
 import uuid
 import time
-from django.db.models.functions import Cast
 
 
-def export(src_lang, tgt_lang, directory_path, approved=None, ignore_file=None):
+def export(
+    src_lang,
+    tgt_lang,
+    directory_path,
+    approved=None,
+    ignore_file=None,
+    timeout=300,
+    chunk_size=500,
+):
+    """
+    Writes the LaTeX export of a language pair to a zip file in the directory.
+
+    :param timeout: Deadline in seconds for generating the mini paradigms of a chunk of translations.
+    :param chunk_size: The number of translations whose mini paradigms are generated at once.
+    :return list: The translations whose mini paradigms are incomplete in the export.
+    """
     main_template = "export/latex.html"
     chapter_template = "export/latex-chapter.html"
 
@@ -40,32 +55,34 @@ def export(src_lang, tgt_lang, directory_path, approved=None, ignore_file=None):
             ),
             Prefetch(
                 "lexeme_to",
-                queryset=Lexeme.objects.prefetch_related("miniparadigm_set").annotate(
-                    _homonyms_count=Count(
-                        "id",
-                        filter=Q(
-                            lexeme=F("lexeme"),
-                            pos=F("pos"),
-                            language=F("language"),
-                        ),
-                    )
-                ),
+                queryset=Lexeme.objects.prefetch_related("miniparadigm_set"),
             ),
             "relationexample_set",
             "relationmetadata_set",
         )
-        .filter(lexeme_from__language=src_lang, lexeme_to__language=tgt_lang)
-        .annotate(
-            lexeme_fc=Upper(
-                Substr(Cast("lexeme_from__lexeme", models.CharField()), 1, 1)
-            ),
-        )
+        .filter(lang_from=src_lang, lang_to=tgt_lang)
         .order_by("lexeme_from__lexeme")
         .all()
     )
 
+    relations = list(relations)
+
+    # group the relations by the initial letter of the source lexeme, in the order of its alphabet
+    collation = language_registry.collation(src_lang)
+    letters = {rank: letter for letter, rank in initials(collation)}
+    for r in relations:
+        r.lexeme_fc = (
+            letters.get(r.lexeme_from.initial_rank) or r.lexeme_from.lexeme[:1].upper()
+        )
+
+    # read or generate the mini paradigms of the translations, a chunk at a time
+    incomplete = prefetch_inflections(
+        (r.lexeme_to for r in relations), timeout=timeout, chunk_size=chunk_size
+    )
+
     grouped_relations = groupby(
-        sorted(relations, key=lambda r: r.lexeme_fc), key=lambda r: r.lexeme_fc
+        sorted(relations, key=lambda r: r.lexeme_from.initial_rank or 0),
+        key=lambda r: r.lexeme_fc,
     )
 
     in_memory = BytesIO()
@@ -117,6 +134,8 @@ def export(src_lang, tgt_lang, directory_path, approved=None, ignore_file=None):
     with open("{}/{}".format(directory_path, _filename), "wb") as f:
         f.write(in_memory.getvalue())
 
+    return incomplete
+
 
 class Command(BaseCommand):
     """
@@ -163,6 +182,18 @@ class Command(BaseCommand):
             const=True,
             default=None,
         )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=300,
+            help="Deadline in seconds for generating the mini paradigms of a chunk of translations.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The number of translations whose mini paradigms are generated at once.",
+        )
 
     def success_info(self, info):
         return self.stdout.write(self.style.SUCCESS(info))
@@ -182,4 +213,23 @@ class Command(BaseCommand):
         elif ignore_file and not os.path.isfile(ignore_file):
             return self.error_info("The ignore file doesn't exist.")
 
-        export(src_lang, tgt_lang, dir_path, approved, ignore_file)
+        incomplete = export(
+            src_lang,
+            tgt_lang,
+            dir_path,
+            approved,
+            ignore_file,
+            timeout=options["timeout"],
+            chunk_size=options["chunk_size"],
+        )
+        if incomplete:
+            self.stderr.write(
+                self.style.WARNING(
+                    "The mini paradigms of %d translations timed out and are incomplete, e.g. %s. "
+                    "Run generate_paradigms for the language and export again."
+                    % (
+                        len(incomplete),
+                        ", ".join(l.lexeme for l in incomplete[:10]),
+                    )
+                )
+            )
@@ -34,10 +34,10 @@ def export(src_lang, tgt_lang, directory_path, ignore_file=None, *args, **kwargs
         ),
         "relationexample_set",
         "relationmetadata_set",
-    ).filter(lexeme_from__language=src_lang)
+    ).filter(lang_from=src_lang)
 
     if tgt_lang:
-        relations = relations.filter(lexeme_to__language=tgt_lang)
+        relations = relations.filter(lang_to=tgt_lang)
     else:
         tgt_lang = "X"
 
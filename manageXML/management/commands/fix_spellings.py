@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand, CommandError
 import io, csv, os
 from ._private import *
 from manageXML.models import *
+from manageXML.history import add_history_arguments, command_history
 from datetime import datetime
 import logging
 from .merge_lexemes import merge
@@ -65,6 +66,7 @@ class Command(BaseCommand):
             default=";",
             help="The delimiter to use when reading the CSV file.",
         )
+        add_history_arguments(parser)
 
     def handle(self, *args, **options):
         file_path = options["file"]
@@ -77,8 +79,9 @@ class Command(BaseCommand):
             reader = csv.reader(fp, delimiter=d)
             rows = list(reader)
             rows = [r for r in rows if len(r) > 0]
-            for r in rows:
-                process(r)
+            with command_history("fix_spellings", options):
+                for r in rows:
+                    process(r)
 
         self.stdout.write(
             self.style.SUCCESS('Successfully processed the file "%s"' % (file_path,))
@@ -0,0 +1,188 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from manageXML.models import *
+from manageXML.inflector import (
+    generator_engine,
+    load_mini_paradigms,
+    load_generated_paradigms,
+    paradigm_queries,
+    collect_generated_forms,
+    store_generated_paradigms,
+)
+import multiprocessing
+import logging
+import time
+from collections import deque
+from tqdm import tqdm
+
+logger = logging.getLogger("verdd")  # Get an instance of a logger
+
+
+def generate_chunk(args):
+    """
+    Runs the generator queries of a chunk of lexemes. Executed in the worker processes, without
+    touching the database.
+    """
+    language_id, queries, skipped, timeout = args
+    batch = [q for _queries in queries.values() for _, q in _queries]
+    forms = generator_engine.lookup_batch(batch, language_id, timeout=timeout)
+    return queries, forms, skipped
+
+
+def imap_in_order(pool, func, payloads, in_flight):
+    """
+    Like pool.imap(func, payloads), but the payloads are read in the calling thread, not in the task
+    handler thread of the pool, with at most ``in_flight`` of them submitted and not yet returned. The
+    payloads may then be read from the database: the connection is the one of the calling thread.
+    """
+    pending = deque()
+    for payload in payloads:
+        pending.append(pool.apply_async(func, (payload,)))
+        if len(pending) >= in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+class Command(BaseCommand):
+    """
+    Example: python manage.py generate_paradigms --language sms --pos N --workers 8
+    """
+
+    help = (
+        "This command generates and stores the mini paradigms of all lexemes of a language ahead of time. "
+        "Lexemes whose stored forms are up to date are skipped, so an interrupted run can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-l",
+            "--language",
+            type=str,
+            help="Three letter code of the language.",
+        )
+        parser.add_argument(
+            "-p",
+            "--pos",
+            type=str,
+            nargs="?",
+            default=None,
+            help="Only generate the paradigms of lexemes with this POS.",
+        )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=1,
+            help="The number of processes generating the forms.",
+        )
+        parser.add_argument(
+            "-c",
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The number of lexemes sent to a worker at once.",
+        )
+        parser.add_argument(
+            "-t",
+            "--timeout",
+            type=float,
+            default=300,
+            help="Deadline in seconds for generating the forms of one chunk.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate the forms even if the stored ones are up to date.",
+        )
+
+    def chunks(self, language, lexemes, paradigms, chunk_size, force, timeout):
+        ids = list(lexemes.order_by("id").values_list("id", flat=True))
+
+        for i in range(0, len(ids), chunk_size):
+            _lexemes = list(Lexeme.objects.filter(id__in=ids[i : i + chunk_size]))
+            skipped = 0
+            if not force:  # resume: skip the lexemes with up to date forms
+                stored = load_generated_paradigms(_lexemes)
+                skipped = len(stored)
+                _lexemes = [l for l in _lexemes if l.id not in stored]
+            yield language.id, paradigm_queries(_lexemes, paradigms), skipped, timeout
+
+    def handle(self, *args, **options):
+        language_id = options["language"]
+        pos = options["pos"]
+        workers = max(options["workers"], 1)
+        chunk_size = options["chunk_size"]
+
+        try:
+            language = Language.objects.get(id=language_id)
+        except Language.DoesNotExist:
+            raise CommandError('Language "%s" does not exist.' % language_id)
+
+        paradigms = list(load_mini_paradigms(language, pos))
+        if not paradigms:
+            raise CommandError('No mini paradigms defined for "%s".' % language_id)
+
+        lexemes = Lexeme.objects.filter(
+            language=language, pos__in=set(p.pos for p in paradigms)
+        )
+        total = lexemes.count()
+
+        # load the transducer once, forked workers share it
+        if not generator_engine.transducer(language.id):
+            raise CommandError('No generator available for "%s".' % language_id)
+
+        chunks = self.chunks(
+            language,
+            lexemes,
+            paradigms,
+            chunk_size,
+            options["force"],
+            options["timeout"],
+        )
+
+        started = time.time()
+        n_forms, n_lexemes, n_skipped, n_incomplete = 0, 0, 0, 0
+        pool = None
+        if workers > 1:
+            connections.close_all()  # do not share DB connections with the workers
+            pool = multiprocessing.get_context("fork").Pool(workers)
+            # the chunks are read from the database in this thread, the workers only get plain data
+            results = imap_in_order(pool, generate_chunk, chunks, 2 * workers)
+        else:
+            results = map(generate_chunk, chunks)
+
+        try:
+            with tqdm(total=total, unit="lexeme") as progress:
+                for queries, forms, skipped in results:
+                    _, completed = collect_generated_forms(queries, forms)
+                    if completed:
+                        store_generated_paradigms(completed, language.id)
+
+                    # forms maps the queries to their (possibly several) forms, queries maps the lexemes
+                    n_forms += sum(len(f) for f in forms.values())
+                    n_lexemes += len(completed)
+                    n_skipped += skipped
+                    n_incomplete += len(queries) - len(completed)
+                    progress.update(len(queries) + skipped)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        elapsed = max(time.time() - started, 1e-6)
+        if n_skipped:
+            self.stdout.write("Skipped %d lexemes with up to date forms." % n_skipped)
+        if n_incomplete:
+            self.stdout.write(
+                self.style.WARNING(
+                    "%d lexemes timed out, run the command again to resume."
+                    % n_incomplete
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated %d forms for %d lexemes in %.1f seconds (%.1f forms/second)."
+                % (n_forms, n_lexemes, elapsed, n_forms / elapsed)
+            )
+        )
@@ -73,7 +73,7 @@ def process(rows):
                 "Changed %s to %s" % (old_lexeme, original_lexeme.lexeme),
             )
         except django.db.utils.IntegrityError as e:  # the lexeme already exists
-            l = Lexeme.objects.get(
+            l = Lexeme.all_objects.get(
                 lexeme=row[2], language=language, pos=pos, homoId=homoId
             )
             log_change(
@@ -87,7 +87,7 @@ def process(rows):
 
         for w in row[3:]:
             try:
-                _l = Lexeme.objects.get(
+                _l = Lexeme.all_objects.get(
                     lexeme=w, pos=pos, language=language, homoId=homoId
                 )
                 log_change(_l.id, _l.lexeme, "NA_LEX", "Lexeme already exist")
@@ -107,7 +107,7 @@ def process(rows):
                     _l.id, _l.lexeme, "CREATE_LEX", "Created lexeme %s" % (_l.lexeme)
                 )
 
-            r, created = Relation.objects.get_or_create(
+            r, created = Relation.all_objects.get_or_create(
                 lexeme_from=main_lexeme,
                 lexeme_to=_l,
                 type=VARIATION,
@@ -128,11 +128,11 @@ def process(rows):
             for r in relations:
                 # from Finnish
                 if main_l.language == "fin":
-                    _r, created = Relation.objects.get_or_create(
+                    _r, created = Relation.all_objects.get_or_create(
                         lexeme_from=main_l, lexeme_to=r.lexeme_to, type=TRANSLATION
                     )
                 else:
-                    _r, created = Relation.objects.get_or_create(
+                    _r, created = Relation.all_objects.get_or_create(
                         lexeme_from=r.lexeme_from, lexeme_to=main_l, type=TRANSLATION
                     )
                 if created:
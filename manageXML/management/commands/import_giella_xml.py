@@ -2,6 +2,7 @@ from manageXML.management.commands._giella_xml import GiellaXML
 from django.core.management.base import BaseCommand, CommandError
 import os, glob, sys
 from manageXML.models import *
+from manageXML.history import add_history_arguments, command_history
 from django.conf import settings
 from collections import defaultdict
 
@@ -10,7 +11,7 @@ ignore_affiliations = False
 
 def create_lexeme(ll: GiellaXML.Item, lang: Language, datafile: DataFile = None):
     try:
-        _l = Lexeme.objects.get(
+        _l = Lexeme.all_objects.get(
             lexeme=ll.text.strip(), pos=ll.pos.strip(), homoId=ll.homoId, language=lang
         )
     except:
@@ -53,6 +54,39 @@ def create_lexeme(ll: GiellaXML.Item, lang: Language, datafile: DataFile = None)
     return _l
 
 
+def upsert_relations(meaning_groups):
+    """
+    Creates the relations of the lemmas to their translations at once. If that fails, they are created
+    meaning group by meaning group, so that only the groups causing the error are left without relations.
+
+    :param meaning_groups: (lemma, <mg>, [(language, translation), ...])
+    :return dict: (lemma ID, translation ID) -> Relation.
+    """
+
+    def pairs(groups):
+        return [
+            (_ll, _t) for _ll, mg, translations in groups for _lang, _t in translations
+        ]
+
+    try:
+        return Relation.all_objects.bulk_upsert(pairs(meaning_groups), history=True)
+    except Exception as err:
+        sys.stderr.write(
+            "Error creating the relations at once, creating them one by one: %s\n"
+            % str(err)
+        )
+
+    relations = {}
+    for group in meaning_groups:
+        try:
+            relations.update(
+                Relation.all_objects.bulk_upsert(pairs([group]), history=True)
+            )
+        except Exception as err:
+            sys.stderr.write("Error @ %s: %s\n" % (group[0].lexeme, str(err)))
+    return relations
+
+
 def parseXML(filename, filepos):
     print("processing: " + filename)
     g = GiellaXML.parse_file(filename)
@@ -63,6 +97,8 @@ def parseXML(filename, filepos):
     df = DataFile(lang_source=gl, lang_target=None, name=filename_only)
     df.save()
 
+    meaning_groups = []  # (lemma, <mg>, [(language, translation), ...])
+    complete_groups = set()  # the <mg> read without errors, whose examples are added
     for e in g.elements:
         _ll = None
         _l = None
@@ -91,7 +127,9 @@ def parseXML(filename, filepos):
             ):  # shouldn't happen but if it did, then we shouldn't get it there
                 continue
             for mg in e.get("mg", []):
-                l_relations = defaultdict(list)
+                # filled as the translations are created, an error keeps those created before it
+                translations = []
+                meaning_groups.append((_ll, mg, translations))
                 for tg in mg.get("tg", []):  # translations
                     _lang = tg.attributes.get("xml:lang")
                     if _lang and _lang not in langs:
@@ -102,36 +140,10 @@ def parseXML(filename, filepos):
 
                     for t in tg.get("t", []):
                         _t = create_lexeme(t, langs[_lang], df)
-                        r, created = Relation.objects.get_or_create(
-                            lexeme_from=_ll, lexeme_to=_t
-                        )
-                        l_relations[_lang].append(r)
-
-                for xg in mg.get("xg", []):  # examples
-                    x = xg.get("x", [])
-                    if not x:
-                        continue
-                    x = x[0].text
-                    _xl, created = Example.objects.get_or_create(lexeme=_ll, text=x)
-
-                    for xt in xg.get("xt", []):
-                        _lang = xt.attributes.get("xml:lang")
-
-                        if _lang not in l_relations:
-                            continue
+                        translations.append((_lang, _t))
 
-                        _r = l_relations[_lang].pop(0)
-                        re_src, created = RelationExample.objects.get_or_create(
-                            relation=_r, text=x, language=gl
-                        )
-
-                        xtt = xt.text
-                        re_tgt, created = RelationExample.objects.get_or_create(
-                            relation=_r, text=xtt, language=langs[_lang]
-                        )
-
-                        # add the link between the relations here
-                        # RelationExampleRelation.objects.get_or_create(...)
+                # relations (and their examples) are created once the whole file is read
+                complete_groups.add(id(mg))
 
                 for semantic in mg.get("semantics", []):
                     pass
@@ -152,6 +164,45 @@ def parseXML(filename, filepos):
                 % (str(_l[0].text) if _l and len(_l) > 0 else "", str(err))
             )
 
+    relations = upsert_relations(meaning_groups)
+
+    for _ll, mg, translations in meaning_groups:
+        if id(mg) not in complete_groups:
+            continue
+        try:
+            l_relations = defaultdict(list)
+            for _lang, _t in translations:
+                if (_ll.id, _t.id) in relations:  # otherwise the error was reported
+                    l_relations[_lang].append(relations[(_ll.id, _t.id)])
+
+            for xg in mg.get("xg", []):  # examples
+                x = xg.get("x", [])
+                if not x:
+                    continue
+                x = x[0].text
+                _xl, created = Example.objects.get_or_create(lexeme=_ll, text=x)
+
+                for xt in xg.get("xt", []):
+                    _lang = xt.attributes.get("xml:lang")
+
+                    if _lang not in l_relations:
+                        continue
+
+                    _r = l_relations[_lang].pop(0)
+                    re_src, created = RelationExample.objects.get_or_create(
+                        relation=_r, text=x, language=gl
+                    )
+
+                    xtt = xt.text
+                    re_tgt, created = RelationExample.objects.get_or_create(
+                        relation=_r, text=xtt, language=langs[_lang]
+                    )
+
+                    # add the link between the relations here
+                    # RelationExampleRelation.objects.get_or_create(...)
+        except Exception as err:
+            sys.stderr.write("Error @ %s: %s\n" % (_ll.lexeme, str(err)))
+
 
 class Command(BaseCommand):
     """
@@ -174,6 +225,7 @@ class Command(BaseCommand):
             "--ignore-affiliations", dest="ignore_affiliations", action="store_true"
         )
         parser.set_defaults(ignore_affiliations=False)
+        add_history_arguments(parser)
 
     def handle(self, *args, **options):
         global ignore_affiliations
@@ -184,16 +236,19 @@ class Command(BaseCommand):
         if not os.path.isdir(xml_dir):
             raise CommandError('Directory "%s" does not exist.' % xml_dir)
 
-        for filename in glob.glob(
-            os.path.join(xml_dir, "*.xml")
-        ):  # read each file and parse it
-            filepos = filename.split("/")[-1].split("_")[:-1]
-            try:
-                parseXML(filename, filepos)
-            except Exception as err:
-                self.stderr.write(
-                    self.style.ERROR("Error processing %s: %s" % (filename, str(err)))
-                )
+        with command_history("import_giella_xml", options):
+            for filename in glob.glob(
+                os.path.join(xml_dir, "*.xml")
+            ):  # read each file and parse it
+                filepos = filename.split("/")[-1].split("_")[:-1]
+                try:
+                    parseXML(filename, filepos)
+                except Exception as err:
+                    self.stderr.write(
+                        self.style.ERROR(
+                            "Error processing %s: %s" % (filename, str(err))
+                        )
+                    )
         self.stdout.write(
             self.style.SUCCESS("Successfully imported the files in %s." % (xml_dir,))
         )
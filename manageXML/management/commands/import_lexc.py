@@ -2,6 +2,7 @@ from manageXML.management.commands._giella_xml import GiellaXML
 from django.core.management.base import BaseCommand, CommandError
 import os, glob, re, io
 from manageXML.models import *
+from manageXML.history import add_history_arguments, command_history
 from django.conf import settings
 from collections import defaultdict
 
@@ -52,7 +53,7 @@ def parse_file(file_path, lang: Language):
                 variation = int(variation) - 1 if variation else 0
 
                 try:
-                    _l = Lexeme.objects.get(
+                    _l = Lexeme.all_objects.get(
                         lexeme=lemma, pos=pos, homoId=homoId, language=lang
                     )
                 except:
@@ -113,6 +114,7 @@ class Command(BaseCommand):
             "--ignore-affiliations", dest="ignore_affiliations", action="store_true"
         )
         parser.set_defaults(ignore_affiliations=False)
+        add_history_arguments(parser)
 
     def handle(self, *args, **options):
         global ignore_affiliations
@@ -124,9 +126,10 @@ class Command(BaseCommand):
         if not os.path.isdir(_dir):
             raise CommandError('Directory "%s" does not exist.' % _dir)
 
-        for filename in glob.glob(
-            os.path.join(_dir, "*.lexc")
-        ):  # read each file and parse it
-            parse_file(filename, lang)
+        with command_history("import_lexc", options):
+            for filename in glob.glob(
+                os.path.join(_dir, "*.lexc")
+            ):  # read each file and parse it
+                parse_file(filename, lang)
 
         self.stdout.write(self.style.SUCCESS("Successfully imported the files."))
@@ -39,26 +39,12 @@ class Command(BaseCommand):
 
         with io.open(file_path, "r", encoding="utf-8") as fp:
             reader = csv.reader(fp, delimiter="\t")
-            for row in reader:
-                if not row:
-                    continue
-                lexeme_from_id = int(row[0])
-                lexeme_to_id = int(row[5])
-                try:
-                    r = Relation.objects.create(
-                        lexeme_from_id=lexeme_from_id,
-                        lexeme_to_id=lexeme_to_id,
-                        type=TRANSLATION,
-                        checked=approve,
-                    )
-                except Exception as e:
-                    r = Relation.objects.get(
-                        lexeme_from_id=lexeme_from_id,
-                        lexeme_to_id=lexeme_to_id,
-                        type=TRANSLATION,
-                    )
-                    r.checked = approve
-                    r.save()
+            pairs = [(int(row[0]), int(row[5])) for row in reader if row]
+
+        # existing relations are only (un)approved
+        Relation.all_objects.bulk_upsert(
+            pairs, type=TRANSLATION, checked=approve, update_checked=True, history=True
+        )
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -5,6 +5,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.contrib.auth.models import User
 from manageXML.models import *
+from manageXML.history import add_history_arguments, command_history
 import logging
 from tqdm import tqdm
 
@@ -78,7 +79,7 @@ class DataImporter:
 
     def delete_all_lexemes(self, language):
         """Delete all lexemes of a given language."""
-        Lexeme.objects.filter(language=language).delete()
+        Lexeme.all_objects.filter(language=language).delete()
         logger.info(f"Deleted all Lexemes for Language: {language}")
 
     def import_data(self):
@@ -115,7 +116,7 @@ class DataImporter:
 
         created_count = 0
         for pk, fields in self.data["lexeme"].items():
-            lexeme, created = Lexeme.objects.get_or_create(
+            lexeme, created = Lexeme.all_objects.get_or_create(
                 lexeme=fields["lexeme"],
                 pos=fields["pos"],
                 homoId=fields["homoId"],
@@ -152,7 +153,7 @@ class DataImporter:
         """Create or update Relation entries from provided data."""
 
         for pk, fields in self.data["relation"].items():
-            relation, created = Relation.objects.update_or_create(
+            relation, created = Relation.all_objects.update_or_create(
                 lexeme_from_id=self.pk_mapping["lexeme"].get(fields["lexeme_from"]),
                 lexeme_to_id=self.pk_mapping["lexeme"].get(fields["lexeme_to"]),
                 type=fields["type"],
@@ -296,6 +297,7 @@ class Command(BaseCommand):
             type=int,
             help="ID of the User who is importing the data.",
         )
+        add_history_arguments(parser)
 
     def handle(self, *args, **options):
         # try:
@@ -305,8 +307,9 @@ class Command(BaseCommand):
         importer = DataImporter(
             json_file=options["json_file"], xml_file=options["xml_file"], user=user
         )
-        importer.delete_all_lexemes("sms")
-        importer.import_data()
+        with command_history("import_verdd_sms", options, user):
+            importer.delete_all_lexemes("sms")
+            importer.import_data()
         self.stdout.write(self.style.SUCCESS("Successfully imported all data."))
 
         # except User.DoesNotExist:
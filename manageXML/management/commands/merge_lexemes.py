@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand, CommandError
 import io, csv, os
 from ._private import *
 from manageXML.models import *
+from manageXML.history import add_history_arguments, command_history
 from manageXML.utils import row_to_objects
 from datetime import datetime
 import logging
@@ -194,6 +195,7 @@ class Command(BaseCommand):
             default=4,
             help="The number of fields each lexeme has in the file.",
         )
+        add_history_arguments(parser)
 
     def handle(self, *args, **options):
         file_path = options["file"]
@@ -207,8 +209,9 @@ class Command(BaseCommand):
             reader = csv.reader(fp, delimiter=d)
             rows = list(reader)
             rows = [r for r in rows if len(r) > 0]
-            for r in rows:
-                process(r, fields_length)
+            with command_history("merge_lexemes", options):
+                for r in rows:
+                    process(r, fields_length)
 
         self.stdout.write(
             self.style.SUCCESS('Successfully processed the file "%s"' % (file_path,))
@@ -38,7 +38,7 @@ def add_deriv(json_file):
                     rel_type = 3
                 print(l1)
                 print(l2)
-                r, c = Relation.objects.get_or_create(
+                r, c = Relation.all_objects.get_or_create(
                     type=rel_type,
                     lexeme_from_id=l2.id,
                     lexeme_to_id=l1.id,
@@ -26,10 +26,7 @@ def predict(src_lang, tgt_lang, approved=None):
         )
         .filter(type=TRANSLATION)
         .filter(
-            Q(lexeme_from__language=src_lang)
-            | Q(lexeme_from__language=tgt_lang)
-            | Q(lexeme_to__language=src_lang)
-            | Q(lexeme_to__language=tgt_lang)
+            Q(lang_from__in=[src_lang, tgt_lang]) | Q(lang_to__in=[src_lang, tgt_lang])
         )
     )
     if approved is not None:
@@ -39,7 +36,7 @@ def predict(src_lang, tgt_lang, approved=None):
 
     existing_relations = (
         Relation.objects.filter(type=TRANSLATION)
-        .filter(lexeme_from__language=src_lang, lexeme_to__language=tgt_lang)
+        .filter(lang_from=src_lang, lang_to=tgt_lang)
         .values_list("lexeme_from__id", "lexeme_to__id")
     )
     existing_relations = [
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from manageXML.models import *
+import time
+from tqdm import tqdm
+
+
+class Command(BaseCommand):
+    """
+    Example: python manage.py rebuild_trigram_index --language sms
+    """
+
+    help = (
+        "This command rebuilds the trigram index answering the contains and icontains searches of the lexemes, "
+        "e.g. after lexemes were written without Lexeme.save()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-l",
+            "--language",
+            type=str,
+            nargs="?",
+            default=None,
+            help="Only rebuild the index of the lexemes of this language.",
+        )
+        parser.add_argument(
+            "-c",
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="The number of lexemes indexed at once.",
+        )
+
+    def handle(self, *args, **options):
+        lexemes = Lexeme.all_objects.order_by("id").only("id", "lexeme")
+        if options["language"]:
+            lexemes = lexemes.filter(language_id=options["language"])
+        chunk_size = options["chunk_size"]
+
+        started = time.time()
+        n_trigrams, chunk = 0, []
+        with tqdm(total=lexemes.count(), unit="lexeme") as progress:
+            for lexeme in lexemes.iterator(chunk_size=chunk_size):
+                chunk.append(lexeme)
+                if len(chunk) >= chunk_size:
+                    n_trigrams += LexemeTrigram.objects.index(chunk, chunk_size)
+                    progress.update(len(chunk))
+                    chunk = []
+            n_trigrams += LexemeTrigram.objects.index(chunk, chunk_size)
+            progress.update(len(chunk))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Indexed %d trigrams in %.1f seconds."
+                % (n_trigrams, time.time() - started)
+            )
+        )
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from manageXML.models import *
+from manageXML.utils import recompute_lexeme_keys
+import time
+from tqdm import tqdm
+
+
+class Command(BaseCommand):
+    """
+    Example: python manage.py recompute_lexeme_keys --language sms --workers 8
+    """
+
+    help = (
+        "This command recomputes the derived fields of the lexemes (rhyming features, sort key, inflexType and "
+        "homonym counts) and updates only the lexemes whose values changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-l",
+            "--language",
+            type=str,
+            nargs="?",
+            default=None,
+            help="Only recompute the lexemes of this language.",
+        )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=1,
+            help="The number of processes computing the fields.",
+        )
+        parser.add_argument(
+            "-c",
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="The number of lexemes read, computed and written at once.",
+        )
+        parser.add_argument(
+            "--history",
+            action="store_true",
+            help="Record a history entry for every changed lexeme.",
+        )
+        parser.add_argument(
+            "-u",
+            "--user",
+            type=str,
+            nargs="?",
+            default=None,
+            help="The username of the history entries.",
+        )
+
+    def handle(self, *args, **options):
+        lexemes = Lexeme.all_objects.all()
+        if options["language"]:
+            lexemes = lexemes.filter(language_id=options["language"])
+
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError('User "%s" does not exist.' % options["user"])
+
+        started = time.time()
+        n_lexemes, n_changed = 0, 0
+        with tqdm(total=lexemes.count(), unit="lexeme") as progress:
+            for processed, changed in recompute_lexeme_keys(
+                lexemes,
+                workers=max(options["workers"], 1),
+                chunk_size=options["chunk_size"],
+                history=options["history"],
+                history_user=user,
+            ):
+                n_lexemes += processed
+                n_changed += changed
+                progress.update(processed)
+
+        n_homonyms = lexemes.refresh_homonyms(chunk_size=options["chunk_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Updated %d of %d lexemes (%d homonym counts) in %.1f seconds."
+                % (n_changed, n_lexemes, n_homonyms, time.time() - started)
+            )
+        )
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from manageXML.archive import historical_models, partitions, restore_history
+
+
+class Command(BaseCommand):
+    """
+    Example: python manage.py restore_history --model lexeme --partition 2023-01 2023-02
+    """
+
+    help = (
+        "This command loads archived history entries (see archive_history) back to the database. "
+        "A partition is a month (YYYY-MM); a year (YYYY) restores all its months."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-m",
+            "--model",
+            type=str,
+            help="The model whose history is restored (e.g. lexeme).",
+        )
+        parser.add_argument(
+            "-p",
+            "--partition",
+            type=str,
+            nargs="+",
+            help="The partitions to restore, e.g. 2023-01 or 2023.",
+        )
+        parser.add_argument(
+            "-d",
+            "--dir",
+            type=str,
+            default=None,
+            help="The archive directory (default: settings.HISTORY_ARCHIVE_DIR).",
+        )
+        parser.add_argument(
+            "-c",
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="The number of entries inserted at once.",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the partition files after restoring them.",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["dir"] or settings.HISTORY_ARCHIVE_DIR
+        name = "historical%s" % (options["model"] or "").lower()
+        model = historical_models().get(name)
+        if model is None:
+            raise CommandError('Unknown model "%s".' % options["model"])
+
+        archived = partitions(model, directory)
+        selected = [
+            p
+            for p in archived
+            if any(p.startswith(prefix) for prefix in options["partition"] or [])
+        ]
+        if not selected:
+            raise CommandError(
+                "No matching partitions, the archived ones are: %s"
+                % (", ".join(archived) or "none")
+            )
+
+        total = 0
+        for partition in selected:
+            n = restore_history(
+                model,
+                partition,
+                directory,
+                chunk_size=options["chunk_size"],
+                keep=options["keep"],
+            )
+            self.stdout.write("%s: %d entries" % (partition, n))
+            total += n
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Restored %d history entries of %s." % (total, model.__name__)
+            )
+        )
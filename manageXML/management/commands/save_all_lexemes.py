@@ -1,6 +1,6 @@
-from django.core.management.base import BaseCommand, CommandError
-from manageXML.models import *
-from tqdm import tqdm
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from manageXML.history import HISTORY_OFF, add_history_arguments, command_history
 
 
 class Command(BaseCommand):
@@ -8,13 +8,19 @@ class Command(BaseCommand):
     Example: python manage.py save_all_lexemes
     """
 
-    help = "This command calls the save function to update all lexemes. Used when a new field is added to the database."
+    help = (
+        "This command updates the derived fields of all lexemes. Used when a new field is added to the database. "
+        "Kept for compatibility, use recompute_lexeme_keys instead."
+    )
 
-    def handle(self, *args, **options):
-        all_l = Lexeme.objects.all()
-        for l in tqdm(all_l):
-            l.save()
+    def add_arguments(self, parser):
+        add_history_arguments(parser)
 
-        self.stdout.write(
-            self.style.SUCCESS("Successfully saved %d lexemes" % (len(all_l),))
-        )
+    def handle(self, *args, **options):
+        with command_history("save_all_lexemes", options):
+            call_command(
+                "recompute_lexeme_keys",
+                history=options["history"] != HISTORY_OFF,
+                user=options["history_user"],
+                stdout=self.stdout,
+            )
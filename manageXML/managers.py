@@ -1 +1,534 @@
-from django.db import models
+import re
+import warnings
+from collections import defaultdict, namedtuple
+from django.apps import apps
+from django.db import connection, models, transaction
+from django.db.models import Count
+from django.db.models.constants import LOOKUP_SEP
+from .collation import initial_rank
+from .common import Rhyme
+from .constants import REVERSE_RELATION_MAPPING, TRANSLATION
+from .history import current_batch, history_disabled
+from .registry import language_registry
+from . import versions
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+class LiveManager(models.Manager):
+    """
+    Manager of the rows that are not (soft) deleted. The models keep an unfiltered ``all_objects``
+    manager as their default manager, for the admin, uniqueness checks and maintenance commands.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted=False)
+
+
+# the lookups answered with the trigram index of the lexemes
+TRIGRAM_LOOKUPS = ("contains", "icontains")
+# the lookups narrowed down by the literals of the regex before the database runs it
+REGEX_LOOKUPS = ("regex", "iregex")
+
+RegexLiterals = namedtuple("RegexLiterals", ["prefix", "suffix", "literals"])
+_BEGIN, _END = object(), object()
+_BEGINNINGS = (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING)
+_ENDS = (sre_parse.AT_END, sre_parse.AT_END_STRING)
+# the POSIX character classes, collating elements and equivalence classes
+_POSIX_BRACKETS = ("[[:", "[[.", "[[=")
+
+
+def trigrams(text):
+    """
+    Returns the trigrams of the lower case text, the keys of the substring index of the lexemes.
+    """
+    text = text.lower()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def regex_literals(pattern):
+    """
+    Returns the literal texts every match of a regex contains: the text the match starts with if the regex
+    is anchored at the beginning (^abc), the one it ends with if it is anchored at the end (abc$) and all
+    the runs of literal characters outside of alternations, repetitions and character classes.
+
+    Groups are looked into, alternatives are not, so ``(ab|cd)ef$`` gives only the suffix ``ef``.
+
+    :param pattern: The regex, in the syntax shared by Python and the databases.
+    :return RegexLiterals: The literals, or None if the regex cannot be parsed, sets flags changing its
+        meaning, e.g. (?i) or (?m), or may mean something else to the database, e.g. the POSIX classes
+        ([[:alpha:]]) that Python reads as a set followed by literals.
+    """
+    if any(bracket in pattern for bracket in _POSIX_BRACKETS):
+        return None
+    try:
+        with warnings.catch_warnings():
+            # Python warns about the syntax it may read differently in the future, e.g. nested sets
+            warnings.simplefilter("error", FutureWarning)
+            parsed = sre_parse.parse(pattern)
+    except (re.error, FutureWarning, OverflowError, RecursionError):
+        return None
+    if parsed.state.flags & (re.IGNORECASE | re.MULTILINE | re.VERBOSE):
+        return None
+
+    items = []  # the literal characters, BEGIN, END or None for anything else
+
+    def walk(subpattern):
+        for op, av in subpattern:
+            if op is sre_parse.LITERAL:
+                items.append(chr(av))
+            elif op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+                walk(av[3])  # a group without flags of its own
+            elif op is sre_parse.AT and av in _BEGINNINGS:
+                items.append(_BEGIN)
+            elif op is sre_parse.AT and av in _ENDS:
+                items.append(_END)
+            else:
+                items.append(None)
+
+    walk(parsed)
+
+    runs, run = [], ""  # the runs of literal characters between the other items
+    for item in items + [None]:
+        if isinstance(item, str):
+            run += item
+            continue
+        if run:
+            runs.append(run)
+        runs.append(item)
+        run = ""
+
+    prefix = runs[1] if runs[0] is _BEGIN and isinstance(runs[1], str) else ""
+    suffix = (
+        runs[-3]
+        if len(runs) > 2 and runs[-2] is _END and isinstance(runs[-3], str)
+        else ""
+    )
+    return RegexLiterals(prefix, suffix, [r for r in runs if isinstance(r, str)])
+
+
+def _uncased(text):
+    return text.lower() == text.upper()
+
+
+def regex_q(field, pattern, lookup_expr="regex"):
+    """
+    Returns the filter of a regex or iregex lookup, narrowed down by the literals every match contains:
+    startswith and endswith lookups for the anchored texts and, for the text of the lexemes, the trigram
+    index for all of them. The database then runs the regex only on the remaining rows. Regexes without
+    literals are left as they are.
+
+    The anchored texts of iregex lookups are matched with istartswith and iendswith. MySQL compares them
+    with the collation of the column, like the regex, but the other databases may fold the case
+    differently (e.g. SQLite only folds ASCII), so there they are only used if they have no cased
+    characters.
+
+    :param field: The field, e.g. "lexeme" or "stem__contlex".
+    :param pattern: The regex.
+    :param lookup_expr: regex or iregex.
+    """
+    q = models.Q(**{"%s__%s" % (field, lookup_expr): pattern})
+    literals = regex_literals(pattern)
+    if literals is None:
+        return q
+
+    # the cheap filters first, for the databases checking the conditions in order
+    narrowed = _candidates_q(field, *literals.literals)
+    case_sensitive = lookup_expr == "regex"
+    same_folding = case_sensitive or connection.vendor == "mysql"
+    i = "" if case_sensitive else "i"
+    if literals.prefix and (same_folding or _uncased(literals.prefix)):
+        narrowed &= models.Q(**{"%s__%sstartswith" % (field, i): literals.prefix})
+    if literals.suffix and (same_folding or _uncased(literals.suffix)):
+        narrowed &= models.Q(**{"%s__%sendswith" % (field, i): literals.suffix})
+    return narrowed & q
+
+
+def _candidates_q(field, *texts):
+    # the lexemes having all the trigrams of the texts, if the field is the text of the lexemes
+    path = field.split(LOOKUP_SEP)
+    if path[-1] != "lexeme" or not any(trigrams(t) for t in texts):
+        return models.Q()
+    path = path[:-1] + ["id__in"]
+    LexemeTrigram = apps.get_model("manageXML", "LexemeTrigram")
+    return models.Q(**{LOOKUP_SEP.join(path): LexemeTrigram.objects.candidates(*texts)})
+
+
+def trigram_q(field, query, lookup_expr="icontains"):
+    """
+    Returns the filter of a lookup on the text of the lexemes. The contains and icontains lookups are
+    narrowed down to the lexemes having all the trigrams of the query, so the database checks only those
+    rows instead of scanning the table; the regex lookups are narrowed down by regex_q(). Shorter queries
+    and other lookups are left as they are.
+
+    :param field: The field, e.g. "lexeme" or "lexeme_from__lexeme" (other fields are left as they are).
+    :param query: The searched text.
+    :param lookup_expr: The lookup, e.g. icontains.
+    """
+    if lookup_expr in REGEX_LOOKUPS:
+        return regex_q(field, query, lookup_expr)
+    q = models.Q(**{"%s__%s" % (field, lookup_expr): query})
+    if lookup_expr not in TRIGRAM_LOOKUPS:
+        return q
+    return q & _candidates_q(field, query)
+
+
+class LexemeTrigramQuerySet(models.QuerySet):
+    def candidates(self, *texts):
+        """
+        Returns the IDs of the lexemes having all the trigrams of texts, as a subquery: the intersection
+        of the posting lists of the trigrams, by one GROUP BY over the (trigram, lexeme) index.
+        """
+        _trigrams = set().union(*(trigrams(t) for t in texts))
+        return (
+            self.filter(trigram__in=_trigrams)
+            .values("lexeme_id")
+            .annotate(n=Count("trigram"))
+            .filter(n=len(_trigrams))
+            .values("lexeme_id")
+        )
+
+    def index(self, lexemes, batch_size=2000):
+        """
+        Rewrites the trigrams of lexemes.
+
+        :param lexemes: Lexeme objects.
+        :return int: The number of written trigrams.
+        """
+        rows, ids = [], []
+        for lexeme in lexemes:
+            ids.append(lexeme.id)
+            rows.extend(
+                self.model(trigram=t, lexeme_id=lexeme.id)
+                for t in trigrams(lexeme.lexeme)
+            )
+        with transaction.atomic():
+            for i in range(0, len(ids), batch_size):
+                self.filter(lexeme_id__in=ids[i : i + batch_size]).delete()
+            self.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
+
+
+class LexemeQuerySet(models.QuerySet):
+    def rhymes(self, key, kind="assonance"):
+        """
+        Returns the lexemes whose reversed rhyme key starts with ``key`` (see Rhyme.suffix_key()).
+
+        The prefix is searched as a range on the indexed reversed key, so the database scans only the
+        matching part of the index; the startswith filter keeps the result exact for collations in which
+        the range is wider than the prefix.
+
+        :param key: The reversed key of the rhyming suffix.
+        :param kind: "assonance" or "consonance".
+        """
+        if kind not in Rhyme.KINDS:
+            raise ValueError("Unknown rhyme kind: %s" % kind)
+        if not key:
+            return self.none()
+
+        field = "%s_rev" % kind
+        upper = key[:-1] + chr(ord(key[-1]) + 1)
+        return self.filter(
+            **{
+                "%s__gte" % field: key,
+                "%s__lt" % field: upper,
+                "%s__startswith" % field: key,
+            }
+        ).order_by(field, "id")
+
+    def initials_between(self, first, last, language=None):
+        """
+        Returns the lexemes whose initial letter is between two letters (inclusive) in the alphabet of their
+        language, with one range condition on the indexed initial_rank per language. Languages missing one
+        of the letters from their alphabet are left out.
+
+        :param first: The first letter.
+        :param last: The last letter.
+        :param language: Only the lexemes of this language (ID).
+        """
+        collations = language_registry.collations()
+
+        def ranks(collation):
+            key = collation.key if collation else str
+            return (
+                initial_rank(key(first), collation),
+                initial_rank(key(last), collation),
+            )
+
+        if language is not None:
+            bounds = {language: ranks(collations.get(language))}
+        else:
+            bounds = {l: ranks(c) for l, c in collations.items()}
+
+        filters = models.Q()
+        for language_id, (_first, _last) in bounds.items():
+            if _first is not None and _last is not None:
+                filters |= models.Q(
+                    language_id=language_id, initial_rank__range=(_first, _last)
+                )
+        if language is None:  # the languages without an alphabet
+            _first, _last = ranks(None)
+            filters |= models.Q(initial_rank__range=(_first, _last)) & ~models.Q(
+                language_id__in=collations
+            )
+        return self.filter(filters) if filters else self.none()
+
+    def with_source(self, query):
+        """
+        Returns the lexemes of the live relations having a source whose name contains ``query`` (case
+        insensitive), on either side. The names are searched in the interned names and the relations
+        found by their IDs (see SourceName).
+        """
+        Relation = apps.get_model("manageXML", "Relation")
+        relations = Relation.objects.with_source(query)
+        return self.filter(
+            models.Q(id__in=relations.values("lexeme_from_id"))
+            | models.Q(id__in=relations.values("lexeme_to_id"))
+        )
+
+    def homonym_counts(self):
+        """
+        Returns the (lexeme, pos, language ID) groups having more than one lexeme, with their sizes.
+        """
+        return {
+            (lexeme, pos, language_id): n
+            for lexeme, pos, language_id, n in self.order_by()
+            .values("lexeme", "pos", "language")
+            .annotate(n=Count("id"))
+            .filter(n__gt=1)
+            .values_list("lexeme", "pos", "language", "n")
+        }
+
+    def update_homonyms(self, keys):
+        """
+        Updates the homonyms column of the lexemes of the given groups, deleted lexemes included (they
+        still take their homoId).
+
+        :param keys: An iterable of (lexeme, pos, language ID).
+        :return dict: (lexeme, pos, language ID) -> the size of the group.
+        """
+        counts = {}
+        for lexeme, pos, language_id in set(keys):
+            group = self.model.all_objects.filter(
+                lexeme=lexeme, pos=pos, language_id=language_id
+            )
+            counts[(lexeme, pos, language_id)] = n = group.count()
+            if n and group.exclude(homonyms=n).update(homonyms=n):
+                versions.bump(self.model)
+        return counts
+
+    def refresh_homonyms(self, chunk_size=2000):
+        """
+        Recomputes the homonyms column of all lexemes in the queryset, with one scan of the rows and one
+        UPDATE per chunk of changed rows. Used after bulk writes that bypass Lexeme.save()/delete(); the
+        queryset must contain whole groups (e.g. all lexemes of a language).
+
+        :return int: The number of updated lexemes.
+        """
+        counts = self.homonym_counts()
+
+        changed = defaultdict(list)
+        for id, lexeme, pos, language_id, homonyms in (
+            self.order_by()
+            .values_list("id", "lexeme", "pos", "language", "homonyms")
+            .iterator(chunk_size=chunk_size)
+        ):
+            n = counts.get((lexeme, pos, language_id), 1)
+            if homonyms != n:
+                changed[n].append(id)
+
+        for n, ids in changed.items():
+            for i in range(0, len(ids), chunk_size):
+                self.model.all_objects.filter(id__in=ids[i : i + chunk_size]).update(
+                    homonyms=n
+                )
+        if changed:
+            versions.bump(self.model)
+        return sum(len(ids) for ids in changed.values())
+
+
+def _object_id(obj):
+    return getattr(obj, "pk", obj)
+
+
+class RelationQuerySet(models.QuerySet):
+    def with_source(self, query):
+        """
+        Returns the relations having a source whose name contains ``query`` (case insensitive), with a
+        semi-join on the sources of the matching interned names.
+        """
+        Source = apps.get_model("manageXML", "Source")
+        SourceName = apps.get_model("manageXML", "SourceName")
+        sources = Source.objects.filter(
+            source_name_id__in=SourceName.objects.ids(query)
+        )
+        return self.filter(id__in=sources.values("relation_id"))
+
+    def _existing(self, keys, batch_size):
+        """
+        Returns (lexeme_from ID, lexeme_to ID, type) -> Relation for the given keys that exist, with one
+        query per chunk of keys.
+        """
+        keys = set(keys)
+        existing = {}
+        ordered = sorted(keys, key=lambda k: (k[2], k[0], k[1] or 0))
+        for i in range(0, len(ordered), batch_size):
+            chunk = ordered[i : i + batch_size]
+            filters = models.Q()
+            for type in set(k[2] for k in chunk):
+                lexemes_from = set(k[0] for k in chunk if k[2] == type)
+                lexemes_to = set(k[1] for k in chunk if k[2] == type)
+                to_filter = models.Q(lexeme_to_id__in=lexemes_to - {None})
+                if None in lexemes_to:
+                    to_filter |= models.Q(lexeme_to__isnull=True)
+                filters |= (
+                    models.Q(type=type, lexeme_from_id__in=lexemes_from) & to_filter
+                )
+            for relation in self.model.all_objects.filter(filters):
+                key = (relation.lexeme_from_id, relation.lexeme_to_id, relation.type)
+                if key in keys:
+                    existing[key] = relation
+        return existing
+
+    def _load_languages(self, languages, lexeme_ids, batch_size):
+        """
+        Adds the languages of the lexemes missing from ``languages`` (lexeme ID -> language ID).
+        """
+        Lexeme = self.model._meta.get_field("lexeme_from").related_model
+        lexeme_ids = sorted(set(lexeme_ids) - set(languages) - {None})
+        for i in range(0, len(lexeme_ids), batch_size):
+            languages.update(
+                Lexeme.all_objects.filter(
+                    id__in=lexeme_ids[i : i + batch_size]
+                ).values_list("id", "language_id")
+            )
+
+    def bulk_upsert(
+        self,
+        pairs,
+        type=TRANSLATION,
+        checked=False,
+        notes="",
+        update_checked=False,
+        history=False,
+        history_user=None,
+        batch_size=1000,
+    ):
+        """
+        Creates the relations of many (lexeme_from, lexeme_to) pairs at once, together with their reverse
+        relations (see REVERSE_RELATION_MAPPING) like Relation.save() does for a single relation.
+
+        Existing relations (by the unique key) are skipped and the missing ones are inserted with
+        multi-row INSERTs of ``batch_size`` rows.
+
+        :param pairs: An iterable of (lexeme_from, lexeme_to), Lexeme objects or IDs; lexeme_to may be None.
+        :param type: The type of the relations.
+        :param checked: Whether the new relations are approved.
+        :param notes: The notes of the new relations.
+        :param update_checked: Whether to set ``checked`` also on the existing relations of the pairs.
+        :param history: Whether to record a history entry for every created or updated relation.
+        :param history_user: The user of the history entries (and changed_by of the new relations).
+        :param batch_size: The number of rows read or written at once.
+        :return dict: (lexeme_from ID, lexeme_to ID) -> Relation, for all given pairs.
+        """
+        languages = {}  # lexeme ID -> language ID, for the language pair columns
+        _pairs = []
+        for f, t in pairs:
+            if f is None:
+                continue
+            for lexeme in (f, t):
+                if isinstance(lexeme, models.Model):
+                    languages[lexeme.pk] = lexeme.language_id
+            _pairs.append((_object_id(f), _object_id(t)))
+        pairs = list(dict.fromkeys(_pairs))
+        keys = [(f, t, type) for f, t in pairs]
+        reverse_type = REVERSE_RELATION_MAPPING.get(type)
+        if reverse_type is not None:
+            keys += [(t, f, reverse_type) for f, t in pairs if t is not None]
+        keys = list(dict.fromkeys(keys))
+
+        existing = self._existing(keys, batch_size)
+        self._load_languages(
+            languages,
+            set(k[0] for k in keys if k not in existing)
+            | set(k[1] for k in keys if k not in existing),
+            batch_size,
+        )
+        missing = [
+            self.model(
+                lexeme_from_id=f,
+                lexeme_to_id=t,
+                lang_from_id=languages.get(f),
+                lang_to_id=languages.get(t),
+                type=_type,
+                checked=checked,
+                notes=notes,
+                changed_by=history_user,
+            )
+            for f, t, _type in keys
+            if (f, t, _type) not in existing
+        ]
+        outdated = []
+        if update_checked:
+            outdated = [
+                existing[(f, t, type)]
+                for f, t in pairs
+                if (f, t, type) in existing
+                and existing[(f, t, type)].checked != checked
+            ]
+            for relation in outdated:
+                relation.checked = checked
+                if history_user:
+                    relation.changed_by = history_user
+
+        if missing or outdated:
+            with transaction.atomic():
+                self.model.objects.bulk_create(
+                    missing, batch_size=batch_size, ignore_conflicts=True
+                )
+                # read the inserted rows back, not all databases return their IDs with ignore_conflicts
+                created = self._existing(
+                    [(r.lexeme_from_id, r.lexeme_to_id, r.type) for r in missing],
+                    batch_size,
+                )
+                existing.update(created)
+                if outdated:
+                    self.model.objects.bulk_update(
+                        outdated, ["checked", "changed_by"], batch_size=batch_size
+                    )
+                versions.bump(self.model)
+
+                if history and not history_disabled():
+                    batch = current_batch()
+                    tags = {
+                        "batch_size": batch_size,
+                        "default_user": history_user or (batch and batch.user),
+                        "default_change_reason": batch.name if batch else "",
+                    }
+                    self.model.history.bulk_history_create(
+                        list(created.values()), **tags
+                    )
+                    self.model.history.bulk_history_create(
+                        outdated, update=True, **tags
+                    )
+        return {
+            (f, t): existing[(f, t, type)] for f, t in pairs if (f, t, type) in existing
+        }
+
+
+class SourceNameQuerySet(models.QuerySet):
+    def intern(self, name):
+        """
+        Returns the interned name, adding it if it is new.
+        """
+        return self.get_or_create(name=name)[0]
+
+    def ids(self, query):
+        """
+        Returns the IDs of the names containing ``query`` (case insensitive). The table of the distinct
+        names is small, so the search is cheap and its result is a short list of IDs.
+        """
+        return list(self.filter(name__icontains=query).values_list("id", flat=True))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0037_alter_affiliation_id_alter_datafile_id_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="language",
+            name="paradigms_version",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="GeneratedParadigm",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("form", models.CharField(max_length=250)),
+                ("wordforms", models.JSONField(default=list)),
+                ("model_version", models.CharField(blank=True, max_length=50)),
+                ("paradigms_version", models.IntegerField(default=0)),
+                ("generated_date", models.DateTimeField(auto_now=True)),
+                (
+                    "lexeme",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="manageXML.lexeme",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("lexeme", "form")},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0038_generatedparadigm"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="language",
+            name="alphabet",
+            field=models.TextField(
+                blank=True,
+                help_text="The characters of the language in sorting order, upper case letters first.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="language",
+            name="ignored_characters",
+            field=models.CharField(
+                blank=True,
+                help_text="Characters left out when sorting (default: space, punctuation and apostrophes).",
+                max_length=250,
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0039_language_alphabet"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lexeme",
+            index=models.Index(
+                fields=["language", "assonance_rev"], name="language_assonance_rev_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lexeme",
+            index=models.Index(
+                fields=["language", "consonance_rev"],
+                name="language_consonance_rev_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:43
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_homonyms(apps, schema_editor):
+    # only the groups with more than one lexeme differ from the default
+    Lexeme = apps.get_model("manageXML", "Lexeme")
+    groups = (
+        Lexeme.objects.order_by()
+        .values("lexeme", "pos", "language")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+        .values_list("lexeme", "pos", "language", "n")
+    )
+    for lexeme, pos, language_id, n in groups:
+        Lexeme.objects.filter(lexeme=lexeme, pos=pos, language_id=language_id).update(
+            homonyms=n
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0040_lexeme_rhyme_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicallexeme",
+            name="homonyms",
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="lexeme",
+            name="homonyms",
+            field=models.IntegerField(default=1),
+        ),
+        migrations.RunPython(count_homonyms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+CHUNK_SIZE = 5000
+
+
+def copy_languages(apps, schema_editor):
+    # chunks of IDs keep the UPDATEs (and their locks) short on large tables
+    Lexeme = apps.get_model("manageXML", "Lexeme")
+    Relation = apps.get_model("manageXML", "Relation")
+    language = lambda field: Subquery(
+        Lexeme.objects.filter(pk=OuterRef(field)).values("language")[:1]
+    )
+    ids = list(Relation.objects.order_by("id").values_list("id", flat=True))
+    for i in range(0, len(ids), CHUNK_SIZE):
+        Relation.objects.filter(
+            id__gte=ids[i], id__lte=ids[min(i + CHUNK_SIZE, len(ids)) - 1]
+        ).update(lang_from=language("lexeme_from"), lang_to=language("lexeme_to"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0041_lexeme_homonyms"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicalrelation",
+            name="lang_from",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="manageXML.language",
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalrelation",
+            name="lang_to",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="manageXML.language",
+            ),
+        ),
+        migrations.AddField(
+            model_name="relation",
+            name="lang_from",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="manageXML.language",
+            ),
+        ),
+        migrations.AddField(
+            model_name="relation",
+            name="lang_to",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="manageXML.language",
+            ),
+        ),
+        migrations.RunPython(copy_languages, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="relation",
+            index=models.Index(
+                fields=["lang_from", "lang_to", "type", "checked"],
+                name="lang_from_to_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="relation",
+            index=models.Index(
+                fields=["lang_to", "lang_from", "type", "checked"],
+                name="lang_to_from_idx",
+            ),
+        ),
+    ]
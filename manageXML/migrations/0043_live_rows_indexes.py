@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+import django.db.models.manager
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0042_relation_languages"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="lexeme",
+            options={"default_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="relation",
+            options={"default_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelManagers(
+            name="lexeme",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="relation",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="lexeme",
+            name="language_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="relation",
+            name="type_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="relation",
+            name="lang_from_to_idx",
+        ),
+        migrations.AddIndex(
+            model_name="lexeme",
+            index=models.Index(
+                fields=["language", "deleted", "lexeme_lang"],
+                name="language_live_order_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lexeme",
+            index=models.Index(
+                fields=["language", "pos", "deleted", "lexeme_lang"],
+                name="language_pos_live_order_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lexeme",
+            index=models.Index(
+                fields=["language", "checked", "deleted", "lexeme_lang"],
+                name="language_checked_order_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="relation",
+            index=models.Index(
+                fields=["type", "checked", "deleted", "lexeme_from"],
+                name="type_checked_live_from_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="relation",
+            index=models.Index(
+                fields=[
+                    "lang_from",
+                    "lang_to",
+                    "type",
+                    "checked",
+                    "deleted",
+                    "lexeme_from",
+                    "lexeme_to",
+                ],
+                name="lang_from_to_covering_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0043_live_rows_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="filerequest",
+            name="type",
+            field=models.IntegerField(
+                blank=True,
+                choices=[
+                    (1, "LEXC"),
+                    (2, "GIELLA_XML"),
+                    (3, "APERTIUM_BIDIX"),
+                    (4, "TRANSLATION_PREDICTIONS"),
+                    (5, "LaTeX"),
+                    (6, "History"),
+                ],
+                default=None,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:17
+
+import django.db.models.deletion
+import manageXML.fields
+from django.db import migrations, models
+
+CHUNK_SIZE = 5000
+
+
+def index_lexemes(apps, schema_editor):
+    # the same trigrams as managers.trigrams(), written in chunks of lexemes
+    Lexeme = apps.get_model("manageXML", "Lexeme")
+    LexemeTrigram = apps.get_model("manageXML", "LexemeTrigram")
+    rows = Lexeme._default_manager.order_by("id").values_list("id", "lexeme")
+    chunk = []
+    for id, lexeme in rows.iterator(chunk_size=CHUNK_SIZE):
+        text = lexeme.lower()
+        chunk.extend(
+            LexemeTrigram(trigram=t, lexeme_id=id)
+            for t in {text[i : i + 3] for i in range(len(text) - 2)}
+        )
+        if len(chunk) >= CHUNK_SIZE:
+            LexemeTrigram.objects.bulk_create(chunk)
+            chunk = []
+    LexemeTrigram.objects.bulk_create(chunk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0044_filerequest_history_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LexemeTrigram",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("trigram", manageXML.fields.BinaryCharField(max_length=12)),
+                (
+                    "lexeme",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="manageXML.lexeme",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("trigram", "lexeme")},
+            },
+        ),
+        migrations.RunPython(index_lexemes, migrations.RunPython.noop),
+    ]
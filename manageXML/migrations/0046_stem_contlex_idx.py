@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0045_lexeme_trigrams"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stem",
+            index=models.Index(fields=["contlex"], name="stem_contlex_idx"),
+        ),
+    ]
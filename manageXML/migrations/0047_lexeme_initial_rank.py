@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:27
+
+import string
+
+from django.conf import settings
+from django.db import migrations, models
+
+CHUNK_SIZE = 5000
+
+# frozen copies of the sort orders of manageXML/collation.py at the time of this migration, so later
+# changes to the collations don't change what it writes
+DEFAULT_ALPHABETS = {
+    "sms": " !\"#$%&'()*+,-./0123456789:;<=>?@AАÂBCČƷǮDĐEẸFGǦǤHIJKǨLMNŊOÕPQRSŠTUVWXYZŽÅÄÖ[\\]^_`аaâbcčʒǯdđeẹfgǧǥhijkǩlmnŋoõpqrsštuvwxyzžåäöáś¨{|}ʹʼˈ~₋’",
+    "fin": " !\"#$%&'()*+,-./0123456789:;<=>?@AАBCDEFGHIJKLMNOPQRSŠTUVWXYZÅÄÖ[\\]^_₋`аabcdefghijklmnopqrsštuvwxyzåäö¨{|}ʹʼ’ˈÂČƷǮĐẸǦǤǨŊÕŽâáčʒǯđẹǧǥǩŋõśž~",
+}
+
+DEFAULT_IGNORED_CHARACTERS = " -ʹʼˈ" + string.punctuation
+
+
+def collation_table(alphabet, ignored_characters):
+    # the str.translate() table of Collation: characters not in the alphabet are deleted
+    if ignored_characters is None:
+        ignored_characters = DEFAULT_IGNORED_CHARACTERS
+    alphabet = "".join(dict.fromkeys(alphabet.replace("\n", "")))
+    return {
+        ord(c): k
+        for c, k in zip(alphabet, sorted(alphabet))
+        if c not in ignored_characters
+    }
+
+
+def sort_key(lexeme, table):
+    # Collation.key()
+    return "".join(table.get(ord(c), "") for c in lexeme.upper())
+
+
+def initial_rank(key, has_collation):
+    # collation.initial_rank()
+    if not has_collation:
+        key = key.upper().lstrip(DEFAULT_IGNORED_CHARACTERS)
+    return ord(key[0]) if key else None
+
+
+def rank_lexemes(apps, schema_editor):
+    # the sort keys and initial ranks of the lexemes, as set by Lexeme.save(): the stored sort keys were
+    # the lexemes themselves until now
+    Language = apps.get_model("manageXML", "Language")
+    Lexeme = apps.get_model("manageXML", "Lexeme")
+    alphabets = {l: (a, None) for l, a in DEFAULT_ALPHABETS.items()}
+    for id, alphabet, ignored_characters in Language.objects.exclude(
+        alphabet=""
+    ).values_list("id", "alphabet", "ignored_characters"):
+        alphabets[id] = (alphabet, ignored_characters or None)
+    tables = {l: collation_table(*args) for l, args in alphabets.items()}
+
+    rows = Lexeme._default_manager.order_by("id").values_list(
+        "id", "language_id", "lexeme"
+    )
+    chunk = []
+    for id, language_id, lexeme in rows.iterator(chunk_size=CHUNK_SIZE):
+        table = tables.get(language_id)
+        key = sort_key(lexeme, table) if table is not None else lexeme
+        chunk.append(
+            Lexeme(
+                id=id,
+                lexeme_lang=key,
+                initial_rank=initial_rank(key, table is not None),
+            )
+        )
+        if len(chunk) >= CHUNK_SIZE:
+            Lexeme._default_manager.bulk_update(chunk, ["lexeme_lang", "initial_rank"])
+            chunk = []
+    Lexeme._default_manager.bulk_update(chunk, ["lexeme_lang", "initial_rank"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0046_stem_contlex_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicallexeme",
+            name="initial_rank",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="lexeme",
+            name="initial_rank",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="lexeme",
+            index=models.Index(
+                fields=["language", "initial_rank"], name="language_initial_rank_idx"
+            ),
+        ),
+        migrations.RunPython(rank_lexemes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+CHUNK_SIZE = 5000
+
+
+def intern_source_names(apps, schema_editor):
+    SourceName = apps.get_model("manageXML", "SourceName")
+    Source = apps.get_model("manageXML", "Source")
+    # the names that are distinct by the rules of the database (e.g. trailing spaces and case don't
+    # count in the MySQL collations), as SourceName.name is unique by the same rules
+    names = Source.objects.order_by().values_list("name", flat=True).distinct()
+    SourceName.objects.bulk_create(
+        [SourceName(name=name) for name in names],
+        batch_size=CHUNK_SIZE,
+        ignore_conflicts=True,
+    )
+
+    # find the name of each source in the database, like SourceName.objects.intern() does
+    source_name = SourceName.objects.filter(name=OuterRef("name")).values("id")[:1]
+    last_id = Source.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+    for start in range(0, last_id + 1, CHUNK_SIZE):
+        Source.objects.filter(id__gte=start, id__lt=start + CHUNK_SIZE).update(
+            source_name_id=Subquery(source_name)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("manageXML", "0047_lexeme_initial_rank"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SourceName",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=250, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="historicalsource",
+            name="source_name",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="manageXML.sourcename",
+            ),
+        ),
+        migrations.AddField(
+            model_name="source",
+            name="source_name",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="sources",
+                to="manageXML.sourcename",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="source",
+            index=models.Index(
+                fields=["source_name", "relation"], name="source_name_relation_idx"
+            ),
+        ),
+        migrations.RunPython(intern_source_names, migrations.RunPython.noop),
+    ]
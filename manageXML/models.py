@@ -1,16 +1,17 @@
-import string
-
 from django.contrib.auth.models import User
-from django.core.cache import cache
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, F
 from django.urls import reverse
 from django.utils.text import slugify
-from simple_history.models import HistoricalRecords
+from .history import HistoricalRecords
 from django.core.validators import slug_re
 from django.utils import timezone
 from .storage import TemporaryFileStorage
 from wiki.semantic_api import SemanticAPI
+from .collation import initial_rank
 from .common import Rhyme
+from .registry import language_registry
+from . import versions
 from .constants import *
 from .fields import *
 from .managers import *
@@ -21,18 +22,62 @@ class Language(models.Model):
         max_length=3, unique=True, primary_key=True, db_index=True
     )  # ISO 639-3
     name = models.CharField(max_length=250)
+    paradigms_version = models.IntegerField(
+        default=0
+    )  # bumped whenever the language paradigms change
+    alphabet = models.TextField(
+        blank=True,
+        help_text="The characters of the language in sorting order, upper case letters first.",
+    )
+    ignored_characters = models.CharField(
+        max_length=250,
+        blank=True,
+        help_text="Characters left out when sorting (default: space, punctuation and apostrophes).",
+    )
 
     class Meta:
         indexes = [
             models.Index(fields=["id"], name="id_idx"),
         ]
 
+    # fields that affect the sort keys (lexeme_lang) of the lexemes of the language
+    COLLATION_FIELDS = ("alphabet", "ignored_characters")
+
     def __str__(self):
         return self.id
 
     def __repr__(self):
         return self.id
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Language, cls).from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def collation_changed(self):
+        loaded = getattr(self, "_loaded_values", {})
+        return any(
+            f in loaded and loaded[f] != getattr(self, f)
+            for f in Language.COLLATION_FIELDS
+        )
+
+    def save(self, *args, **kwargs):
+        adding, collation_changed = self._state.adding, self.collation_changed()
+        result = super(Language, self).save(*args, **kwargs)
+
+        if adding or collation_changed:
+            language_registry.bump()
+        if collation_changed:
+            from .tasks import recompute_language_keys
+
+            # re-key the lexemes in the background once the new alphabet is committed
+            transaction.on_commit(lambda: recompute_language_keys.delay(self.id))
+        self._loaded_values = {
+            f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields
+        }
+        return result
+
 
 class DataFile(models.Model):
     lang_source = models.ForeignKey(
@@ -65,6 +110,7 @@ class Lexeme(models.Model):
             "homoId",
             "language",
         )
+        default_manager_name = "all_objects"
 
         indexes = [
             models.Index(
@@ -72,21 +118,50 @@ class Lexeme(models.Model):
             ),
             models.Index(fields=["lexeme"], name="lexeme_idx"),
             models.Index(fields=["pos"], name="pos_idx"),
-            models.Index(fields=["language"], name="language_idx"),
             models.Index(fields=["lexeme_lang"], name="lexeme_lang_idx"),
             models.Index(fields=["consonance"], name="consonance_idx"),
             models.Index(fields=["consonance_rev"], name="consonance_rev_idx"),
             models.Index(fields=["assonance"], name="assonance_idx"),
             models.Index(fields=["assonance_rev"], name="assonance_rev_idx"),
+            models.Index(
+                fields=["language", "assonance_rev"], name="language_assonance_rev_idx"
+            ),
+            models.Index(
+                fields=["language", "consonance_rev"],
+                name="language_consonance_rev_idx",
+            ),
+            # the lexeme list: live lexemes of a language, optionally of a POS or status, in sort order
+            models.Index(
+                fields=["language", "deleted", "lexeme_lang"],
+                name="language_live_order_idx",
+            ),
+            models.Index(
+                fields=["language", "pos", "deleted", "lexeme_lang"],
+                name="language_pos_live_order_idx",
+            ),
+            models.Index(
+                fields=["language", "checked", "deleted", "lexeme_lang"],
+                name="language_checked_order_idx",
+            ),
+            # the alphabet range filter: one range of initials per language
+            models.Index(
+                fields=["language", "initial_rank"], name="language_initial_rank_idx"
+            ),
         ]
 
     lexeme = BinaryCharField(max_length=250)
     homoId = models.IntegerField(default=0)
+    homonyms = models.IntegerField(
+        default=1
+    )  # the number of lexemes with the same lexeme, pos and language, kept up to date on save/delete
     assonance = models.CharField(max_length=250, blank=True)
     assonance_rev = models.CharField(max_length=250, blank=True)
     consonance = models.CharField(max_length=250, blank=True)
     consonance_rev = models.CharField(max_length=250, blank=True)
     lexeme_lang = BinaryCharField(max_length=250, blank=True)
+    initial_rank = models.IntegerField(
+        null=True, blank=True
+    )  # the rank of the initial letter in the alphabet of the language, see collation.initial_rank()
     language = models.ForeignKey(
         Language, null=True, on_delete=models.SET_NULL, related_name="lexemes"
     )
@@ -110,6 +185,8 @@ class Lexeme(models.Model):
     changed_by = models.ForeignKey(
         User, null=True, blank=True, on_delete=models.SET_NULL, related_name="lexemes"
     )
+    objects = LiveManager.from_queryset(LexemeQuerySet)()
+    all_objects = LexemeQuerySet.as_manager()
     history = HistoricalRecords()
 
     def __str__(self):
@@ -161,31 +238,82 @@ class Lexeme(models.Model):
         """
         if hasattr(self, "_homonyms_count"):
             return self._homonyms_count
-        return Lexeme.objects.filter(
-            lexeme=self.lexeme, pos=self.pos, language=self.language
-        ).count()
+        return self.homonyms
 
-    def get_lexeme_lang(self):
-        main_str = " !\"#$%&'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~¨ÂÄÅÕÖáâäåõöČčĐđŊŋśŠšŽžƷǤǥǦǧǨǩǮǯʒʹʼˈАаẸẹ’₋"
-        _sms_str = " !\"#$%&'()*+,-./0123456789:;<=>?@AАÂBCČƷǮDĐEẸFGǦǤHIJKǨLMNŊOÕPQRSŠTUVWXYZŽÅÄÖ[\\]^_`аaâbcčʒǯdđeẹfgǧǥhijkǩlmnŋoõpqrsštuvwxyzžåäöáś¨{|}ʹʼˈ~₋’"
-        _fin_str = " !\"#$%&'()*+,-./0123456789:;<=>?@AАBCDEFGHIJKLMNOPQRSŠTUVWXYZÅÄÖ[\\]^_₋`аabcdefghijklmnopqrsštuvwxyzåäö¨{|}ʹʼ’ˈÂČƷǮĐẸǦǤǨŊÕŽâáčʒǯđẹǧǥǩŋõśž~"
-
-        IGNORE_CHARACTERS = " -ʹʼˈ" + string.punctuation
-        LANGUAGE_SORT = {
-            "sms": dict([(x, main_str[_sms_str.index(x)]) for x in _sms_str]),
-            "fin": dict([(x, main_str[_fin_str.index(x)]) for x in _fin_str]),
-        }
-        if self.language in LANGUAGE_SORT:
-            sort_dict = LANGUAGE_SORT[self.language]
-            # return ''.join([sort_dict[c] if c in sort_dict else c for c in self.lexeme.upper()])
-            return "".join(
-                [
-                    sort_dict[c]
-                    for c in self.lexeme.upper()
-                    if c in sort_dict and c not in IGNORE_CHARACTERS
-                ]
+    # fields that affect the forms generated for the lexeme and its homonyms
+    GENERATION_FIELDS = ("lexeme", "pos", "homoId", "language_id")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Lexeme, cls).from_db(db, field_names, values)
+        # keep the loaded values to detect changes when saving
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def _generation_keys(self):
+        """
+        Returns the (lexeme, pos, language) of this lexeme and, if it was changed, the loaded one.
+        """
+        keys = {(self.lexeme, self.pos, self.language_id)}
+        loaded = getattr(self, "_loaded_values", {})
+        if all(f in loaded for f in ("lexeme", "pos", "language_id")):
+            keys.add((loaded["lexeme"], loaded["pos"], loaded["language_id"]))
+        return keys
+
+    def used_values_changed(self):
+        """
+        Whether saving the lexeme may change the languages or POS used by the lexemes.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if not self._state.adding and loaded is not None:
+            return loaded.get("language_id", self.language_id) != self.language_id or (
+                loaded.get("pos", self.pos) != self.pos
             )
-        return self.lexeme
+        return (
+            self.language_id not in language_registry.used_languages()
+            or self.pos not in language_registry.used_pos()
+        )
+
+    def language_changed(self):
+        """
+        Whether the language of a saved lexeme was changed, which changes the languages of its relations.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if self._state.adding:
+            return False
+        if loaded is None or "language_id" not in loaded:
+            return True
+        return loaded["language_id"] != self.language_id
+
+    def generation_changed(self):
+        if self._state.adding:
+            return True
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return True
+        return any(
+            f in loaded and loaded[f] != getattr(self, f)
+            for f in Lexeme.GENERATION_FIELDS
+        )
+
+    def invalidate_generated_paradigms(self):
+        """
+        Deletes the cached generated forms of this lexeme and its homonyms (their +HomN queries may change).
+        """
+        filters = Q(lexeme=self)
+        for lexeme, pos, language_id in self._generation_keys():
+            filters |= Q(
+                lexeme__lexeme=lexeme, lexeme__pos=pos, lexeme__language_id=language_id
+            )
+        GeneratedParadigm.objects.filter(filters).delete()
+
+    def get_lexeme_lang(self):
+        collation = language_registry.collation(self.language_id)
+        return collation.key(self.lexeme) if collation else self.lexeme
+
+    def get_initial_rank(self):
+        collation = language_registry.collation(self.language_id)
+        return initial_rank(self.lexeme_lang, collation)
 
     def find_akusanat_affiliation(self):
         semAPI = SemanticAPI()
@@ -204,13 +332,28 @@ class Lexeme(models.Model):
             return title
         return None
 
-    def save(self, *args, **kwargs):
+    # fields computed from the other fields when saving
+    DERIVED_FIELDS = (
+        "assonance",
+        "assonance_rev",
+        "consonance",
+        "consonance_rev",
+        "lexeme_lang",
+        "initial_rank",
+        "inflexType",
+    )
+
+    def set_derived_fields(self, lexeme_lang=None, initial_rank=None):
         # store rhyming features
         self.assonance = self.get_assonance()
         self.assonance_rev = self.get_assonance_rev()
         self.consonance = self.get_consonance()
         self.consonance_rev = self.get_consonance_rev()
-        self.lexeme_lang = self.get_lexeme_lang()
+        if lexeme_lang is None:
+            self.lexeme_lang = self.get_lexeme_lang()
+            self.initial_rank = self.get_initial_rank()
+        else:  # computed in bulk, see derive_lexeme_keys()
+            self.lexeme_lang, self.initial_rank = lexeme_lang, initial_rank
 
         # automatically get the inflexType
         if (not self.inflexType or self.inflexType == 0) and self.contlex:
@@ -221,7 +364,50 @@ class Lexeme(models.Model):
             else:
                 self.inflexType = INFLEX_TYPE_X
 
-        return super(Lexeme, self).save(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        self.set_derived_fields()
+
+        generation_changed = self.generation_changed()
+        used_values_changed = self.used_values_changed()
+        language_changed = self.language_changed()
+        text_changed = (
+            self._state.adding
+            or getattr(self, "_loaded_values", {}).get("lexeme") != self.lexeme
+        )
+        result = super(Lexeme, self).save(*args, **kwargs)
+
+        if text_changed:  # keep the substring index up to date
+            LexemeTrigram.objects.index([self])
+
+        if language_changed:  # keep the language pairs of the relations in sync
+            Relation.all_objects.filter(lexeme_from=self).update(
+                lang_from=self.language_id
+            )
+            Relation.all_objects.filter(lexeme_to=self).update(lang_to=self.language_id)
+            versions.bump(Relation)
+
+        if generation_changed:
+            self.invalidate_generated_paradigms()
+            counts = Lexeme.objects.update_homonyms(self._generation_keys())
+            self.homonyms = counts[(self.lexeme, self.pos, self.language_id)]
+        if used_values_changed:
+            language_registry.bump()
+        self._loaded_values = {
+            f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields
+        }
+        return result
+
+    def delete(self, *args, **kwargs):
+        self.invalidate_generated_paradigms()
+        keys = self._generation_keys()
+        result = super(Lexeme, self).delete(*args, **kwargs)
+        Lexeme.objects.update_homonyms(keys)
+        if (
+            not Lexeme.objects.filter(language_id=self.language_id).exists()
+            or not Lexeme.objects.filter(pos=self.pos).exists()
+        ):  # the last lexeme of its language or POS is gone
+            language_registry.bump()
+        return result
 
     @property
     def _history_user(self):
@@ -238,35 +424,18 @@ class Lexeme(models.Model):
         return sep.join(_metadata) if _metadata else ""
 
     def symbols(self):
-        from apertium.constants import POS_tags_rev
+        """
+        Returns the Apertium symbols of the lexeme, using the prefetched metadata if there is any.
+        """
+        from apertium.utils import apertium_symbols
 
-        _metadata = list(
-            self.lexememetadata_set.filter(type=GENERIC_METADATA).values_list(
-                "text", flat=True
-            )
-        )
-        pos_c = self.pos.upper()
-        if pos_c in POS_tags_rev:
-            pos = POS_tags_rev[pos_c]
-            if (
-                pos == "n"
-                and self.lexememetadata_set.filter(
-                    type=LEXEME_TYPE, text__iexact="Prop"
-                ).all()
-            ):
-                _metadata += [
-                    "np",
-                ]
-            else:
-                _metadata += [
-                    pos,
-                ]
-        return _metadata
+        return apertium_symbols(self.pos, self.lexememetadata_set.all())
 
 
 class Relation(models.Model):
     class Meta:
         unique_together = ("lexeme_from", "lexeme_to", "type")
+        default_manager_name = "all_objects"
 
         indexes = [
             models.Index(
@@ -275,10 +444,29 @@ class Relation(models.Model):
             models.Index(
                 fields=["lexeme_to"], name="lexeme_to_idx"
             ),  # For faster joins and lookups
-            models.Index(fields=["type"], name="type_idx"),  # For filtering by type
+            models.Index(
+                fields=["type", "checked", "deleted", "lexeme_from"],
+                name="type_checked_live_from_idx",
+            ),  # For filtering by type and status, e.g. the relations of a lexeme
             models.Index(
                 fields=["checked"], name="checked_idx"
             ),  # For filtering by checked status
+            models.Index(
+                fields=[
+                    "lang_from",
+                    "lang_to",
+                    "type",
+                    "checked",
+                    "deleted",
+                    "lexeme_from",
+                    "lexeme_to",
+                ],
+                name="lang_from_to_covering_idx",
+            ),  # For scanning the relations of a language pair, covering the lexeme IDs
+            models.Index(
+                fields=["lang_to", "lang_from", "type", "checked"],
+                name="lang_to_from_idx",
+            ),  # For scanning the relations into a language
         ]
 
     lexeme_from = models.ForeignKey(
@@ -300,6 +488,27 @@ class Relation(models.Model):
     changed_by = models.ForeignKey(
         User, null=True, blank=True, on_delete=models.SET_NULL, related_name="relations"
     )
+    # copies of the languages of the lexemes, so language pairs can be filtered without joins
+    lang_from = models.ForeignKey(
+        Language,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    lang_to = models.ForeignKey(
+        Language,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    objects = LiveManager.from_queryset(RelationQuerySet)()
+    all_objects = RelationQuerySet.as_manager()
     history = HistoricalRecords()
 
     def __str__(self):
@@ -329,24 +538,130 @@ class Relation(models.Model):
     def _history_user(self, value):
         self.changed_by = value
 
+    # the copied language fields and the lexeme fields they are copied from
+    LANGUAGE_FIELDS = {"lang_from": "lexeme_from", "lang_to": "lexeme_to"}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Relation, cls).from_db(db, field_names, values)
+        # keep the loaded values to detect changes of the lexemes when saving
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def outdated_languages(self):
+        """
+        Returns the language fields that have to be copied from the lexemes again: those of the lexemes that
+        were changed, or whose languages were never set.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if self._state.adding or loaded is None:
+            return set(Relation.LANGUAGE_FIELDS)
+        outdated = set()
+        for language_field, lexeme_field in Relation.LANGUAGE_FIELDS.items():
+            lexeme_id = getattr(self, lexeme_field + "_id")
+            if loaded.get(lexeme_field + "_id", -1) != lexeme_id or (
+                lexeme_id is not None and getattr(self, language_field + "_id") is None
+            ):
+                outdated.add(language_field)
+        return outdated
+
+    def _lexeme_language(self, name):
+        """
+        Returns the language of the lexeme in a relation field, from the related lexeme if it is loaded.
+        """
+        field = self._meta.get_field(name)
+        lexeme_id = getattr(self, field.attname)
+        if lexeme_id is None:
+            return None
+        if field.is_cached(self):
+            lexeme = field.get_cached_value(self)
+            if lexeme is not None and lexeme.pk == lexeme_id:
+                return lexeme.language_id
+        return (
+            Lexeme.all_objects.filter(pk=lexeme_id)
+            .values_list("language_id", flat=True)
+            .first()
+        )
+
+    def set_languages(self, fields=None):
+        """
+        Copies the languages of the lexemes to the relation.
+
+        :param fields: The language fields to set, all by default.
+        """
+        if fields is None:
+            fields = Relation.LANGUAGE_FIELDS
+        for language_field in fields:
+            setattr(
+                self,
+                language_field + "_id",
+                self._lexeme_language(Relation.LANGUAGE_FIELDS[language_field]),
+            )
+
     def save(self, *args, **kwargs):
+        outdated = self.outdated_languages()
+        self.set_languages(outdated)
+        # Lexeme.save() keeps the languages up to date, only write the ones copied here
+        update_fields = kwargs.get("update_fields")
+        if outdated != set(Relation.LANGUAGE_FIELDS) and update_fields is None:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in deferred
+            ]
+        if update_fields is not None:
+            kwargs["update_fields"] = (
+                set(update_fields) - set(Relation.LANGUAGE_FIELDS)
+            ) | outdated
         super(Relation, self).save(*args, **kwargs)
+        self._loaded_values = {
+            f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields
+        }
 
         if self.type in REVERSE_RELATION_MAPPING:
-            reverse_relation, created = Relation.objects.get_or_create(
-                lexeme_from=self.lexeme_to,
-                lexeme_to=self.lexeme_from,
+            reverse_relation, created = Relation.all_objects.get_or_create(
+                lexeme_from_id=self.lexeme_to_id,
+                lexeme_to_id=self.lexeme_from_id,
                 type=REVERSE_RELATION_MAPPING[self.type],
                 defaults={"notes": self.notes, "checked": self.checked},
             )
 
 
+class SourceName(models.Model):
+    """
+    The distinct names of the sources (e.g. books), kept in a table of their own so that the source filters
+    search the names once and find the relations by the IDs of the matching names.
+    """
+
+    name = models.CharField(max_length=250, unique=True)
+
+    objects = SourceNameQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+
 class Source(models.Model):
     class Meta:
         unique_together = ("relation", "name")
 
+        indexes = [
+            models.Index(
+                fields=["source_name", "relation"], name="source_name_relation_idx"
+            ),  # For the source filters (see SourceName)
+        ]
+
     relation = models.ForeignKey(Relation, on_delete=models.CASCADE)
     name = models.CharField(max_length=250)
+    source_name = models.ForeignKey(
+        SourceName,
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.PROTECT,
+        related_name="sources",
+    )  # the interned name, set on save
     page = models.CharField(max_length=25, blank=True)
     type = models.CharField(max_length=25)
     notes = models.CharField(max_length=250, blank=True)
@@ -359,6 +674,13 @@ class Source(models.Model):
     def __str__(self):
         return "(%s) %s" % (self.type, self.name)
 
+    def save(self, *args, **kwargs):
+        if self.source_name_id is None or self.source_name.name != self.name:
+            self.source_name = SourceName.objects.intern(self.name)
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "source_name"}
+        return super(Source, self).save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse("relation-detail", kwargs={"pk": self.relation.pk})
 
@@ -609,6 +931,11 @@ class LexemeMetadata(models.Model):
 class Stem(models.Model):
     class Meta:
         unique_together = ("lexeme", "text", "contlex")
+        indexes = [
+            models.Index(
+                fields=["contlex"], name="stem_contlex_idx"
+            ),  # For the anchored contlex regexes (see regex_q())
+        ]
 
     lexeme = models.ForeignKey(Lexeme, on_delete=models.CASCADE)
     text = BinaryCharField(max_length=250)
@@ -708,13 +1035,65 @@ class LanguageParadigm(models.Model):
     def _history_user(self, value):
         self.changed_by = value
 
+    def bump_language_version(self):
+        # stale generated paradigms of the language are detected by the version
+        Language.objects.filter(pk=self.language_id).update(
+            paradigms_version=F("paradigms_version") + 1
+        )
+
     def save(self, *args, **kwargs):
         super(LanguageParadigm, self).save(*args, **kwargs)
-        cache.delete(f"language_paradigms_{self.language.id}")
+        self.bump_language_version()
+        language_registry.bump()
 
     def delete(self, *args, **kwargs):
-        cache.delete(f"language_paradigms_{self.language.id}")
-        super(LanguageParadigm, self).delete(*args, **kwargs)
+        self.bump_language_version()
+        result = super(LanguageParadigm, self).delete(*args, **kwargs)
+        language_registry.bump()
+        return result
+
+
+class GeneratedParadigm(models.Model):
+    """
+    Forms generated by the transducer for one mini paradigm form of a lexeme.
+
+    Rows are valid only for the transducer (model_version) and language paradigms (paradigms_version)
+    they were generated with; they are deleted when the lexeme or one of its homonyms changes.
+    """
+
+    class Meta:
+        unique_together = ("lexeme", "form")
+
+    lexeme = models.ForeignKey(Lexeme, on_delete=models.CASCADE)
+    form = models.CharField(max_length=250)
+    wordforms = models.JSONField(default=list)
+    model_version = models.CharField(max_length=50, blank=True)
+    paradigms_version = models.IntegerField(default=0)
+    generated_date = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "%s: %s" % (self.form, ", ".join(self.wordforms))
+
+
+class LexemeTrigram(models.Model):
+    """
+    A trigram of the lower case text of a lexeme. The rows of a trigram are its posting list in the
+    substring index answering the contains and icontains searches of the lexemes (see trigram_q()).
+    """
+
+    class Meta:
+        unique_together = ("trigram", "lexeme")
+
+    # written in bulk with each lexeme, the lexeme's own data version covers it
+    track_data_version = False
+
+    trigram = BinaryCharField(max_length=12)  # up to 4 bytes per character in MySQL
+    lexeme = models.ForeignKey(Lexeme, on_delete=models.CASCADE, related_name="+")
+
+    objects = LexemeTrigramQuerySet.as_manager()
+
+    def __str__(self):
+        return "%s: %s" % (self.trigram, self.lexeme_id)
 
 
 class FileRequest(models.Model):
@@ -0,0 +1,193 @@
+import threading
+import time
+import logging
+from collections import defaultdict
+
+from uralicNLP import uralicApi
+from django.conf import settings
+from django.core.cache import cache
+from manageXML.collation import Collation, DEFAULT_ALPHABETS
+
+logger = logging.getLogger("verdd.manageXML")
+
+
+def _language_id(language):
+    return getattr(language, "id", language)
+
+
+class LanguageRegistry:
+    """
+    Process-local registry of the language metadata used on every request: the languages supported and
+    installed in uralicNLP, whether a language has a dictionary forms generator, the mini paradigms of
+    each (language, POS), the compiled sort orders of the languages and the languages and POS used by the
+    lexemes.
+
+    Everything is loaded on first use and kept in memory, so lookups are dictionary reads. A version
+    counter in the shared cache is bumped whenever the underlying data changes (see bump()); each
+    process compares it with its own at most every ``check_interval`` seconds and drops the data it
+    loaded from the database when it differs. What comes from uralicNLP (the supported languages, an HTTP
+    request, and the languages with dictionary forms) does not depend on the database and is kept.
+    """
+
+    VERSION_KEY = "language_registry_version"
+
+    def __init__(self, check_interval=None):
+        self._check_interval = check_interval
+        self._lock = threading.RLock()
+        self._version = None
+        self._checked = 0.0
+        self._data = {}
+        self._static = {}  # not dropped when the version changes
+
+    @property
+    def check_interval(self):
+        if self._check_interval is None:
+            return settings.LANGUAGE_REGISTRY_CHECK_INTERVAL
+        return self._check_interval
+
+    def _shared_version(self):
+        return cache.get(self.VERSION_KEY, 0)
+
+    def _current(self):
+        """
+        Returns the loaded data, dropping it first if another process bumped the shared version.
+        """
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            version = self._shared_version()
+            self._checked = now
+            if version != self._version:
+                self._data = {}
+                self._version = version
+        return self._data
+
+    def _get(self, key, load):
+        data = self._current()
+        if key not in data:
+            with self._lock:
+                if key not in data:
+                    data[key] = load()
+        return data[key]
+
+    def _get_static(self, key, load):
+        if key not in self._static:
+            with self._lock:
+                if key not in self._static:
+                    self._static[key] = load()
+        return self._static[key]
+
+    def reset(self):
+        """
+        Drops the data loaded by this process; it is reloaded on next use.
+        """
+        with self._lock:
+            self._data = {}
+            self._static = {}
+            self._checked = 0.0
+
+    def bump(self):
+        """
+        Invalidates the registries of all processes sharing the cache.
+        """
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:  # not in the cache (yet)
+            if not cache.add(self.VERSION_KEY, 1, timeout=None):
+                cache.incr(self.VERSION_KEY)
+        with self._lock:
+            self._data = {}
+            self._checked = 0.0
+
+    def _load_mini_paradigms(self):
+        from manageXML.models import LanguageParadigm
+
+        paradigms = defaultdict(list)
+        for paradigm in LanguageParadigm.objects.filter(mini=True).order_by("id"):
+            paradigms[(paradigm.language_id, None)].append(paradigm)
+            paradigms[(paradigm.language_id, paradigm.pos)].append(paradigm)
+        return {key: tuple(value) for key, value in paradigms.items()}
+
+    def mini_paradigms(self, language, pos=None):
+        """
+        Returns the mini paradigms of a language, optionally only those of a POS.
+
+        :param language: Language object or three letter code.
+        :param pos: Part of speech (default: all).
+        :return tuple: LanguageParadigm objects.
+        """
+        paradigms = self._get("mini_paradigms", self._load_mini_paradigms)
+        return paradigms.get((_language_id(language), pos), ())
+
+    def _load_collations(self):
+        from manageXML.models import Language
+
+        alphabets = {l: (a, None) for l, a in DEFAULT_ALPHABETS.items()}
+        for id, alphabet, ignored_characters in Language.objects.exclude(
+            alphabet=""
+        ).values_list("id", "alphabet", "ignored_characters"):
+            alphabets[id] = (alphabet, ignored_characters or None)
+        return {l: Collation(*args) for l, args in alphabets.items()}
+
+    def collations(self):
+        """
+        Returns the compiled sort orders of all languages that have one.
+        """
+        return self._get("collations", self._load_collations)
+
+    def collation(self, language):
+        return self.collations().get(_language_id(language))
+
+    def _load_used_values(self, field):
+        from manageXML.models import Lexeme
+
+        return list(
+            Lexeme.objects.values_list(field, flat=True).distinct().order_by(field)
+        )
+
+    def used_languages(self):
+        return self._get("used_languages", lambda: self._load_used_values("language"))
+
+    def used_pos(self):
+        return self._get("used_pos", lambda: self._load_used_values("pos"))
+
+    def is_supported(self, language):
+        supported = self._get_static(
+            "supported_languages",
+            lambda: frozenset(
+                l
+                for l, models in uralicApi.supported_languages().items()
+                if models is not None
+            ),
+        )
+        return _language_id(language) in supported
+
+    def is_installed(self, language):
+        installed = self._get("installed_languages", dict)
+        language = _language_id(language)
+        if language not in installed:
+            installed[language] = uralicApi.is_language_installed(language)
+        return installed[language]
+
+    def set_installed(self, language, installed=True):
+        self._get("installed_languages", dict)[_language_id(language)] = installed
+
+    def has_dictionary_forms(self, language, query):
+        """
+        Returns whether the generator of a language supports dictionary forms, trying ``query`` once.
+        """
+        dictionary_forms = self._get_static("dictionary_forms", dict)
+        language = _language_id(language)
+        if language not in dictionary_forms:
+            try:
+                uralicApi.generate(query, language, dictionary_forms=True)
+                dictionary_forms[language] = True
+            except Exception:
+                dictionary_forms[language] = False
+            logger.info(
+                "Language %s has dictionary forms: %s"
+                % (language, dictionary_forms[language])
+            )
+        return dictionary_forms[language]
+
+
+language_registry = LanguageRegistry()
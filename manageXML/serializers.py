@@ -6,3 +6,23 @@ class LexemeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lexeme
         fields = ("id", "lexeme", "pos", "homoId", "language")
+
+
+class RhymeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Lexeme
+        fields = (
+            "id",
+            "lexeme",
+            "pos",
+            "homoId",
+            "language",
+            "assonance",
+            "consonance",
+        )
+
+
+class SourceNameSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SourceName
+        fields = ("id", "name")
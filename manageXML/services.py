@@ -2,7 +2,10 @@ import zipfile
 import os
 import io
 import tempfile
+import datetime
 from django.core.management import call_command
+from .archive import historical_models
+from .history import date_range, export_history, iter_history, EXPORT_NDJSON
 from .constants import (
     DOWNLOAD_TYPE_GIELLA_XML,
     DOWNLOAD_TYPE_LATEX,
@@ -168,3 +171,37 @@ def generate_latex_file(
         zip_result = write_dir_content_to_zip(tmpdir_name)
 
         return zip_result
+
+
+def write_history_export(
+    fileobj,
+    model: str,
+    start_date: str,
+    end_date: str,
+    user: int = None,
+    history_type: str = None,
+    format: str = EXPORT_NDJSON,
+):
+    """
+    Writes a zipped export of the history entries of a model between two dates to a file, entry by entry,
+    so that the memory use does not depend on the size of the export.
+
+    :param fileobj: The (binary) file the zip is written to.
+    :param model: The model of the entries (lexeme, relation or miniparadigm).
+    :param start_date: The first date (YYYY-MM-DD).
+    :param end_date: The last date (YYYY-MM-DD).
+    :param user: Only the entries of the user with this id.
+    :param history_type: Only the entries of this type (+, ~ or -).
+    :param format: ndjson or csv.
+    """
+    history_model = historical_models()["historical%s" % model]
+    start, end = date_range(
+        datetime.date.fromisoformat(start_date), datetime.date.fromisoformat(end_date)
+    )
+    records = iter_history(history_model, start, end, user, history_type)
+
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        name = "history_%s_%s_%s.%s" % (model, start_date, end_date, format)
+        with zip_file.open(name, "w", force_zip64=True) as f:
+            for line in export_history(history_model, records, format):
+                f.write(line.encode("utf-8"))
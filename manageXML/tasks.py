@@ -1,8 +1,11 @@
+import tempfile
 from celery import shared_task
-from django.core.files.base import ContentFile
-from .models import FileRequest
+from django.core.files.base import ContentFile, File
+from .constants import DOWNLOAD_TYPE_HISTORY
+from .models import FileRequest, Lexeme
 
-from .services import generate_file_for_request
+from .services import generate_file_for_request, write_history_export
+from .utils import recompute_lexeme_keys
 from .emails import send_file_ready_email
 
 
@@ -15,17 +18,25 @@ def process_file_request(
     try:
         file_request.mark_processing()
 
-        # Generate the file based on request parameters
-        file_content = generate_file_for_request(
-            download_type,
-            lang1=lang_source,
-            lang2=lang_target,
-            approved=options["use_accepted"],
-        )
-
-        # Securely save the file to the request
         file_name = f"{download_type}_{file_request.user.id}.zip"
-        file_request.file.save(file_name, ContentFile(file_content))
+
+        if download_type == DOWNLOAD_TYPE_HISTORY:
+            # the export goes through a temporary file, it can be larger than the memory
+            with tempfile.TemporaryFile() as f:
+                write_history_export(f, **options)
+                f.seek(0)
+                file_request.file.save(file_name, File(f))
+        else:
+            # Generate the file based on request parameters
+            file_content = generate_file_for_request(
+                download_type,
+                lang1=lang_source,
+                lang2=lang_target,
+                approved=options["use_accepted"],
+            )
+
+            # Securely save the file to the request
+            file_request.file.save(file_name, ContentFile(file_content))
 
         # Mark as completed and send notification
         file_request.mark_completed(file_request.file.name, output="ok")
@@ -38,3 +49,12 @@ def process_file_request(
         send_file_ready_email(file_request)
     except Exception as e:
         pass
+
+
+@shared_task
+def recompute_language_keys(language_id):
+    """
+    Recomputes the sort keys of the lexemes of a language, after its alphabet changed.
+    """
+    for _ in recompute_lexeme_keys(Lexeme.all_objects.filter(language_id=language_id)):
+        pass
@@ -1,25 +1,12 @@
 from django import template
+from manageXML.history import diff_history
 
 register = template.Library()
 
 
 @register.simple_tag(name="history_diff")
 def history_diff(record):
-    curr_record = record
-    prev_record = record.prev_record
-    if prev_record:
-        delta = curr_record.diff_against(prev_record)
-        return [
-            c
-            for c in delta.changes
-            if c.field
-            not in [
-                "changed_by",
-                "assonance",
-                "assonance_rev",
-                "consonance",
-                "consonance_rev",
-                "lexeme_lang",
-            ]
-        ]
-    return []
+    # computed for the whole page by prefetch_history_diffs(), if it was called
+    if hasattr(record, "changes"):
+        return record.changes
+    return diff_history(record, record.prev_record)
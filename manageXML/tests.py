@@ -1,7 +1,61 @@
-from django.test import TestCase
+import io
+import json
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory, TestCase, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import FileRequest
-from .tasks import process_file_request
+from .models import (
+    FileRequest,
+    Language,
+    LanguageParadigm,
+    Lexeme,
+    LexemeTrigram,
+    GeneratedParadigm,
+    MiniParadigm,
+    Relation,
+    Source,
+    SourceName,
+    Stem,
+    regex_literals,
+    regex_q,
+    trigram_q,
+)
+from .constants import DOWNLOAD_TYPE_HISTORY, SYNONYM, TRANSLATION
+from .tasks import process_file_request, recompute_language_keys
+from .collation import Collation, DEFAULT_ALPHABETS, initials
+from .archive import ArchivedHistory, partitions, read_archive
+from .common import Rhyme
+from .history import (
+    bulk_history,
+    date_range,
+    diff_history,
+    iter_history,
+    no_history,
+    prefetch_history_diffs,
+)
+from .registry import LanguageRegistry, language_registry
+from .utils import recompute_lexeme_keys
+from .inflector import (
+    GeneratorEngine,
+    generator_engine,
+    generate_inflections,
+    load_generated_paradigms,
+    prefetch_inflections,
+)
 
 
 # Create your tests here.
@@ -15,3 +69,1188 @@ class FileRequestTest(TestCase):
         self.file_request.refresh_from_db()
         self.assertEqual(self.file_request.status, FileRequest.STATUS_COMPLETED)
         self.assertIsNotNone(self.file_request.file)
+
+
+class SlowTransducer:
+    def __init__(self, delay=0):
+        self.delay = delay
+
+    def lookup(self, query):
+        time.sleep(self.delay)
+        return [("@P.x@" + query.split("+")[0] + "a", 0.0)]
+
+
+class GeneratorEngineTest(SimpleTestCase):
+    def test_generate_batch(self):
+        engine = GeneratorEngine()
+        engine._transducers["sms"] = [SlowTransducer()]
+        forms = engine.generate_batch(["vuõʹjj+N+Sg+Gen", "vuõʹjj+N+Pl+Nom"], "sms")
+        self.assertEqual(
+            forms, {"vuõʹjj+N+Sg+Gen": ["vuõʹjja"], "vuõʹjj+N+Pl+Nom": ["vuõʹjja"]}
+        )
+
+    def test_generate_batch_deadline(self):
+        engine = GeneratorEngine()
+        engine._transducers["sms"] = [SlowTransducer(delay=0.2)]
+        started = time.monotonic()
+        forms = engine.generate_batch(
+            ["a+N+Sg+Gen", "b+N+Sg+Gen", "c+N+Sg+Gen"], "sms", timeout=0.1
+        )
+        self.assertLess(time.monotonic() - started, 0.2)
+        self.assertEqual(set(forms), {"a+N+Sg+Gen", "b+N+Sg+Gen", "c+N+Sg+Gen"})
+        self.assertEqual(forms["c+N+Sg+Gen"], [])
+
+    def test_stuck_batch_does_not_block(self):
+        engine = GeneratorEngine(max_workers=1)
+        engine._transducers["sms"] = [SlowTransducer(delay=0.5)]
+        engine._transducers["fin"] = [SlowTransducer()]
+        with self.assertLogs("verdd", "WARNING") as logs:
+            engine.generate_batch(["a+N+Sg+Gen", "b+N+Sg+Gen"], "sms", timeout=0.05)
+        self.assertIn("2 queries dropped", logs.output[0])
+
+        started = time.monotonic()
+        forms = engine.generate_batch(["kuusi+N+Sg+Gen"], "fin", timeout=1)
+        self.assertLess(time.monotonic() - started, 0.4)  # not behind the stuck lookup
+        self.assertEqual(forms, {"kuusi+N+Sg+Gen": ["kuusia"]})
+
+
+class GeneratedParadigmTest(TestCase):
+    def setUp(self):
+        generator_engine._transducers["sms"] = [SlowTransducer()]
+        generator_engine._versions["sms"] = "1"
+        language_registry.reset()
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        self.paradigm = LanguageParadigm.objects.create(
+            language=self.language, pos="N", form="N+Sg+Gen", mini=True
+        )
+        self.lexeme = Lexeme.objects.create(
+            lexeme="vuõʹjj", pos="N", language=self.language
+        )
+
+    def tearDown(self):
+        generator_engine._transducers.pop("sms", None)
+        generator_engine._versions.pop("sms", None)
+
+    def test_generated_forms_are_stored(self):
+        self.assertEqual(generate_inflections(self.lexeme), {"N+Sg+Gen": ["vuõʹjja"]})
+        self.assertEqual(
+            GeneratedParadigm.objects.filter(lexeme=self.lexeme).count(), 1
+        )
+        self.assertEqual(
+            load_generated_paradigms([self.lexeme]),
+            {self.lexeme.id: {"N+Sg+Gen": ["vuõʹjja"]}},
+        )
+
+    def test_prefetch_reports_incomplete(self):
+        other = Lexeme.objects.create(lexeme="kuä'cc", pos="N", language=self.language)
+        generate_inflections(self.lexeme)  # stored, read back without generating
+
+        generator_engine._transducers["sms"] = [SlowTransducer(delay=0.2)]
+        incomplete = prefetch_inflections(
+            [self.lexeme, other], timeout=0.05, chunk_size=1
+        )
+        self.assertEqual(incomplete, [other])
+        self.assertEqual(self.lexeme._generated_forms, {"N+Sg+Gen": ["vuõʹjja"]})
+        self.assertEqual(other._generated_forms, {"N+Sg+Gen": []})
+
+    def test_lexeme_change_invalidates(self):
+        generate_inflections(self.lexeme)
+        self.lexeme.notes = "note"
+        self.lexeme.save()
+        self.assertTrue(GeneratedParadigm.objects.filter(lexeme=self.lexeme).exists())
+
+        Lexeme.objects.create(
+            lexeme="vuõʹjj", pos="N", homoId=1, language=self.language
+        )
+        self.assertFalse(GeneratedParadigm.objects.filter(lexeme=self.lexeme).exists())
+
+    def test_paradigm_change_invalidates(self):
+        generate_inflections(self.lexeme)
+        LanguageParadigm.objects.create(
+            language=self.language, pos="N", form="N+Pl+Nom", mini=True
+        )
+        self.assertEqual(load_generated_paradigms([self.lexeme]), {})
+
+    def test_generated_paradigms_view(self):
+        response = self.client.get(self.lexeme.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            GeneratedParadigm.objects.exists()
+        )  # rendered from the DB only
+
+        url = reverse("lexeme-generated-paradigms", kwargs={"pk": self.lexeme.pk})
+        response = self.client.get(url)
+        self.assertEqual(
+            response.json(), {str(self.lexeme.pk): {"N+Sg+Gen": ["vuõʹjja"]}}
+        )
+        etag = response["ETag"]
+        with mock.patch(
+            "manageXML.views.generate_inflections_coalesced"
+        ) as generate, self.assertNumQueries(4):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        generate.assert_not_called()  # answered from the stored versions
+
+        MiniParadigm.objects.create(lexeme=self.lexeme, msd="N+Sg+Gen", wordform="x")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse("generated-paradigms"), {"ids": "%d,0" % self.lexeme.pk}
+        )
+        self.assertEqual(response.json(), {str(self.lexeme.pk): {}})
+
+        self.language.paradigms_version += 1
+        self.language.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_generate_paradigms_command(self):
+        Lexeme.objects.create(
+            lexeme="vuõʹjj", pos="N", homoId=1, language=self.language
+        )
+        output = io.StringIO()
+        call_command("generate_paradigms", language="sms", stdout=output)
+        self.assertIn("Generated 2 forms for 2 lexemes", output.getvalue())
+        self.assertEqual(
+            GeneratedParadigm.objects.get(lexeme=self.lexeme).wordforms, ["vuõʹjja"]
+        )
+
+        output = io.StringIO()
+        call_command("generate_paradigms", language="sms", stdout=output)
+        self.assertIn("Skipped 2 lexemes", output.getvalue())
+
+        # the chunks are read in this process, the workers only generate
+        output = io.StringIO()
+        call_command(
+            "generate_paradigms",
+            language="sms",
+            workers=2,
+            chunk_size=1,
+            force=True,
+            stdout=output,
+            stderr=io.StringIO(),
+        )
+        self.assertIn("Generated 2 forms for 2 lexemes", output.getvalue())
+
+
+class LanguageRegistryTest(TestCase):
+    def setUp(self):
+        self.registry = LanguageRegistry(check_interval=0)
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        self.paradigm = LanguageParadigm.objects.create(
+            language=self.language, pos="N", form="N+Sg+Gen", mini=True
+        )
+        Lexeme.objects.create(lexeme="vuõʹjj", pos="N", language=self.language)
+
+    def test_lookups_are_loaded_once(self):
+        self.assertEqual(self.registry.mini_paradigms("sms", "N"), (self.paradigm,))
+        self.assertEqual(self.registry.used_languages(), ["sms"])
+        self.assertEqual(self.registry.used_pos(), ["N"])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.registry.mini_paradigms(self.language), (self.paradigm,)
+            )
+            self.assertEqual(self.registry.mini_paradigms("sms", "V"), ())
+            self.assertEqual(self.registry.used_languages(), ["sms"])
+            self.assertEqual(self.registry.used_pos(), ["N"])
+
+    def test_writes_refresh_the_registry(self):
+        self.assertEqual(self.registry.used_pos(), ["N"])
+        Lexeme.objects.create(lexeme="mannai", pos="V", language=self.language)
+        self.assertEqual(self.registry.used_pos(), ["N", "V"])
+
+        paradigm = LanguageParadigm.objects.create(
+            language=self.language, pos="V", form="V+Inf", mini=True
+        )
+        self.assertEqual(self.registry.mini_paradigms("sms", "V"), (paradigm,))
+        paradigm.delete()
+        self.assertEqual(self.registry.mini_paradigms("sms", "V"), ())
+
+    def test_uralic_data_is_kept(self):
+        with mock.patch(
+            "manageXML.registry.uralicApi.supported_languages",
+            return_value={"sms": ["analyser"]},
+        ) as supported_languages:
+            self.assertTrue(self.registry.is_supported("sms"))
+            self.registry.bump()
+            self.assertTrue(self.registry.is_supported(self.language))
+        self.assertEqual(supported_languages.call_count, 1)
+
+        lexeme = Lexeme.objects.create(lexeme="vuõʹǯǯ", pos="N", language=self.language)
+        with mock.patch.object(language_registry, "bump") as bump:
+            lexeme.delete()  # other lexemes of the language and POS are left
+        bump.assert_not_called()
+
+
+class RecomputeLexemeKeysTest(TestCase):
+    def setUp(self):
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        self.lexemes = [
+            Lexeme.objects.create(lexeme=l, pos="N", language=self.language)
+            for l in ("vuõʹjj", "mââʹnn", "kuâl")
+        ]
+
+    def test_only_changed_lexemes_are_written(self):
+        Lexeme.objects.filter(pk=self.lexemes[0].pk).update(
+            assonance="", lexeme_lang="", initial_rank=None
+        )
+        history = Lexeme.history.count()
+
+        self.assertEqual(list(recompute_lexeme_keys(chunk_size=2)), [(2, 1), (1, 0)])
+        self.assertEqual(Lexeme.history.count(), history)
+        lexeme = Lexeme.objects.get(pk=self.lexemes[0].pk)
+        self.assertEqual(lexeme.assonance, self.lexemes[0].assonance)
+        self.assertEqual(lexeme.lexeme_lang, self.lexemes[0].lexeme_lang)
+        self.assertEqual(lexeme.initial_rank, self.lexemes[0].initial_rank)
+
+    def test_history_is_optional(self):
+        Lexeme.objects.update(consonance="")
+        history = Lexeme.history.count()
+
+        self.assertEqual(list(recompute_lexeme_keys(history=True)), [(3, 3)])
+        self.assertEqual(Lexeme.history.count(), history + 3)
+        self.assertEqual(list(recompute_lexeme_keys(history=True)), [(3, 0)])
+
+
+class CollationTest(TestCase):
+    def test_sort_keys(self):
+        collation = Collation(DEFAULT_ALPHABETS["sms"])
+        words = ["vuõʹjj", "äijj", "Âʹnn-Mââʹnn", "šâdd", "abc"]
+        self.assertEqual(collation.keys(words), [collation.key(w) for w in words])
+        self.assertEqual(
+            sorted(words, key=collation.key),
+            ["abc", "Âʹnn-Mââʹnn", "šâdd", "vuõʹjj", "äijj"],
+        )
+        self.assertEqual(collation.key("a-b c'"), collation.key("abc"))
+
+    def test_initials_between(self):
+        language = Language.objects.create(id="sms", name="Skolt Sami")
+        for l in ("kaala", "ǩiõl", "ʹLââʹtt", "mââʹnn", "äijj"):
+            Lexeme.objects.create(lexeme=l, pos="N", language=language)
+        letters = [l for l, _ in initials(language_registry.collation("sms"))]
+        self.assertLess(letters.index("K"), letters.index("Ǩ"))
+        self.assertLess(letters.index("Ǩ"), letters.index("L"))
+
+        self.assertEqual(
+            sorted(
+                Lexeme.objects.initials_between("Ǩ", "L", "sms").values_list(
+                    "lexeme", flat=True
+                )
+            ),
+            ["ǩiõl", "ʹLââʹtt"],
+        )
+
+        response = self.client.get(
+            reverse("lexeme-filter"),
+            {
+                "language": "sms",
+                "range_from": letters.index("K"),
+                "range_to": letters.index("Ǩ"),
+            },
+        )
+        self.assertEqual(
+            sorted(l.lexeme for l in response.context["object_list"]),
+            ["kaala", "ǩiõl"],
+        )
+
+    def test_alphabet_change_rekeys_lexemes(self):
+        language = Language.objects.create(id="sms", name="Skolt Sami")
+        a = Lexeme.objects.create(lexeme="ab", pos="N", language=language)
+        b = Lexeme.objects.create(lexeme="ba", pos="N", language=language)
+        self.assertEqual(
+            list(Lexeme.objects.order_by("lexeme_lang").values_list("pk", flat=True)),
+            [a.pk, b.pk],
+        )
+
+        language.alphabet = "BAba"
+        with self.captureOnCommitCallbacks() as callbacks:
+            language.save()
+        self.assertEqual(len(callbacks), 2)  # the rekeying task and the data version
+        recompute_language_keys(language.id)
+        self.assertEqual(
+            list(Lexeme.objects.order_by("lexeme_lang").values_list("pk", flat=True)),
+            [b.pk, a.pk],
+        )
+
+
+class RhymeSearchTest(TestCase):
+    def setUp(self):
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        for l in ("vuõʹjj", "kuõʹjj", "mââʹnn", "kaala", "taala"):
+            Lexeme.objects.create(lexeme=l, pos="N", language=self.language)
+
+    def test_rhyme_keys(self):
+        self.assertEqual(Rhyme.assonance("Kaala"), "CaaCa")
+        self.assertEqual(Rhyme.consonance("kaala"), "kCClC")
+        self.assertEqual(Rhyme.suffix_key("kaala", "assonance", 3), "aCa")
+        self.assertEqual(Rhyme.pattern_key("Caa"), "aaC")
+        self.assertEqual(Rhyme.pattern_key("CAa"), "aaC")
+
+    def test_rhymes(self):
+        key = Rhyme.suffix_key("kaala", "assonance", 4)
+        self.assertEqual(
+            list(Lexeme.objects.rhymes(key).values_list("lexeme", flat=True)),
+            ["kaala", "taala"],
+        )
+        key = Rhyme.suffix_key("vuõʹjj", "consonance", 4)
+        self.assertEqual(
+            list(
+                Lexeme.objects.rhymes(key, "consonance").values_list(
+                    "lexeme", flat=True
+                )
+            ),
+            ["kuõʹjj", "vuõʹjj"],
+        )
+
+    def test_rhyme_search_api(self):
+        response = self.client.get(
+            reverse("rhyme-search-api"), {"word": "vuõʹjj", "depth": 4}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([l["lexeme"] for l in response.json()], ["kuõʹjj"])
+
+        response = self.client.get(reverse("rhyme-search-api"), {"depth": 4})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse("rhyme-search"), {"pattern": "aCa"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [l.lexeme for l in response.context["object_list"]], ["kaala", "taala"]
+        )
+
+
+class HomonymsTest(TestCase):
+    def setUp(self):
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        self.a = Lexeme.objects.create(lexeme="kuä'cc", pos="N", language=self.language)
+        self.b = Lexeme.objects.create(
+            lexeme="kuä'cc", pos="N", homoId=1, language=self.language
+        )
+
+    def counts(self):
+        return dict(Lexeme.objects.values_list("id", "homonyms"))
+
+    def test_homonyms_are_maintained(self):
+        self.assertEqual(self.counts(), {self.a.id: 2, self.b.id: 2})
+        self.assertEqual(self.b.homonyms_count, 2)
+
+        self.b.pos = "V"
+        self.b.save()
+        self.assertEqual(self.counts(), {self.a.id: 1, self.b.id: 1})
+
+        c = Lexeme.objects.create(
+            lexeme="kuä'cc", pos="V", homoId=0, language=self.language
+        )
+        self.assertEqual(self.counts(), {self.a.id: 1, self.b.id: 2, c.id: 2})
+        c.delete()
+        self.assertEqual(self.counts(), {self.a.id: 1, self.b.id: 1})
+
+        lexeme = Lexeme.objects.get(pk=self.a.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(lexeme.homonyms_count, 1)
+
+    def test_refresh_homonyms(self):
+        Lexeme.objects.update(homonyms=1)
+        self.assertEqual(Lexeme.objects.refresh_homonyms(), 2)
+        self.assertEqual(self.counts(), {self.a.id: 2, self.b.id: 2})
+        self.assertEqual(Lexeme.objects.refresh_homonyms(), 0)
+
+
+class RelationBulkUpsertTest(TestCase):
+    def setUp(self):
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        self.a, self.b, self.c = [
+            Lexeme.objects.create(lexeme=l, pos="N", language=self.language)
+            for l in ("kuä'cc", "sâǥǥ", "vuõ'ss")
+        ]
+
+    def test_bulk_upsert(self):
+        existing = Relation.objects.create(
+            lexeme_from=self.a, lexeme_to=self.b, type=SYNONYM
+        )
+        self.assertEqual(Relation.objects.count(), 2)  # with the reverse relation
+
+        relations = Relation.objects.bulk_upsert(
+            [(self.a, self.b), (self.a, self.c), (self.b.id, self.c.id)],
+            type=SYNONYM,
+            checked=True,
+            update_checked=True,
+            history=True,
+        )
+        self.assertEqual(Relation.objects.count(), 6)
+        self.assertEqual(relations[(self.a.id, self.b.id)].pk, existing.pk)
+        self.assertTrue(
+            Relation.objects.filter(
+                lexeme_from=self.c, lexeme_to=self.a, type=SYNONYM
+            ).exists()
+        )
+        existing.refresh_from_db()
+        self.assertTrue(existing.checked)
+        self.assertEqual(Relation.history.filter(history_type="+").count(), 6)
+        self.assertEqual(Relation.history.filter(history_type="~").count(), 1)
+
+        with self.assertNumQueries(1):
+            Relation.objects.bulk_upsert(
+                [(self.a, self.b), (self.a, self.c)], type=SYNONYM
+            )
+        self.assertEqual(Relation.objects.count(), 6)
+
+    def test_import_falls_back_to_meaning_groups(self):
+        from .management.commands.import_giella_xml import upsert_relations
+
+        bulk_upsert = Relation.all_objects.bulk_upsert
+
+        def failing(pairs, **kwargs):
+            if (
+                len(pairs) > 1 or pairs[0][1] == self.c
+            ):  # the whole file, a broken group
+                raise IntegrityError("broken")
+            return bulk_upsert(pairs, **kwargs)
+
+        groups = [(self.a, None, [("sms", self.b)]), (self.b, None, [("sms", self.c)])]
+        with mock.patch.object(
+            Relation.all_objects, "bulk_upsert", side_effect=failing
+        ), mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            relations = upsert_relations(groups)
+        self.assertEqual(list(relations), [(self.a.id, self.b.id)])
+        self.assertIn("Error @ sâǥǥ: broken", stderr.getvalue())
+
+    def test_import_finds_deleted_rows(self):
+        from .management.commands._private import create_lexeme, create_relation
+        from .management.commands.import_giella_xml import upsert_relations
+
+        relation = Relation.objects.create(lexeme_from=self.a, lexeme_to=self.b)
+        relation.deleted = True
+        relation.save()
+        self.c.deleted = True
+        self.c.save()
+
+        lexeme = create_lexeme(lexeme="vuõ'ss", pos="N", language=self.language)
+        self.assertEqual(lexeme.pk, self.c.pk)
+        self.assertEqual(create_relation(self.a, self.b, "", "book").pk, relation.pk)
+        relations = upsert_relations([(self.a, None, [("sms", self.b)])])
+        self.assertEqual(relations[(self.a.id, self.b.id)].pk, relation.pk)
+
+
+class RelationLanguagesTest(TestCase):
+    def setUp(self):
+        self.sms = Language.objects.create(id="sms", name="Skolt Sami")
+        self.fin = Language.objects.create(id="fin", name="Finnish")
+        self.a = Lexeme.objects.create(lexeme="kuä'cc", pos="N", language=self.sms)
+        self.b = Lexeme.objects.create(lexeme="kuusi", pos="N", language=self.fin)
+        self.c = Lexeme.objects.create(lexeme="puu", pos="N", language=self.fin)
+
+    def pairs(self):
+        return set(Relation.objects.values_list("lang_from", "lang_to"))
+
+    def test_languages_are_maintained(self):
+        Relation.objects.create(lexeme_from=self.a, lexeme_to=self.b)
+        Relation.objects.bulk_upsert([(self.a.id, self.c.id)])
+        self.assertEqual(self.pairs(), {("sms", "fin")})
+
+        self.b.language = self.sms
+        self.b.save()
+        self.assertEqual(self.pairs(), {("sms", "fin"), ("sms", "sms")})
+
+    def test_languages_are_set_once(self):
+        relation = Relation.objects.create(lexeme_from=self.a, lexeme_to=self.b)
+        relation = Relation.objects.get(pk=relation.pk)
+        relation.notes = "changed"
+        with self.assertNumQueries(2):  # the update and its history, no lexemes
+            relation.save()
+
+        relation.lexeme_to_id = self.a.id
+        with self.assertNumQueries(3):  # and the language of the new lexeme
+            relation.save()
+        self.assertEqual(self.pairs(), {("sms", "sms")})
+
+    def test_language_pair_uses_index(self):
+        plan = str(
+            Relation.objects.filter(
+                lang_from="sms", lang_to="fin", type=TRANSLATION, checked=True
+            ).explain()
+        )
+        self.assertRegex(plan, "lang_(from_to_covering|to_from)_idx")
+
+
+class SourceFilterTest(TestCase):
+    def setUp(self):
+        sms = Language.objects.create(id="sms", name="Skolt Sami")
+        fin = Language.objects.create(id="fin", name="Finnish")
+        a = Lexeme.objects.create(lexeme="kuä'cc", pos="N", language=sms)
+        b = Lexeme.objects.create(lexeme="kuusi", pos="N", language=fin)
+        c = Lexeme.objects.create(lexeme="puu", pos="N", language=fin)
+        self.ab = Relation.objects.create(lexeme_from=a, lexeme_to=b)
+        self.ac = Relation.objects.create(lexeme_from=a, lexeme_to=c)
+        Source.objects.create(relation=self.ab, name="Sanakirja 1988", type="book")
+        Source.objects.create(relation=self.ac, name="Sanakirja 1988", type="book")
+        self.source = Source.objects.create(
+            relation=self.ac, name="Kenttä", type="book"
+        )
+
+    def test_names_are_interned(self):
+        self.assertEqual(SourceName.objects.count(), 2)
+        self.source.name = "Kenttätyö 2019"
+        self.source.save()
+        self.assertEqual(self.source.source_name.name, "Kenttätyö 2019")
+        self.assertEqual(
+            list(Relation.objects.with_source("työ").values_list("pk", flat=True)),
+            [self.ac.pk],
+        )
+
+    def test_source_filters(self):
+        response = self.client.get(reverse("lexeme-filter"), {"source": "kenttä"})
+        self.assertEqual(
+            sorted(l.lexeme for l in response.context["object_list"]),
+            ["kuä'cc", "puu"],
+        )
+        response = self.client.get(reverse("relation-search"), {"source": "sanakirja"})
+        self.assertEqual(
+            sorted(r.pk for r in response.context["object_list"]),
+            [self.ab.pk, self.ac.pk],
+        )
+
+        response = self.client.get(reverse("source-search"), {"q": "KIRJA"})
+        self.assertEqual([n["name"] for n in response.json()], ["Sanakirja 1988"])
+
+
+class LexemeTrigramTest(TestCase):
+    def setUp(self):
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        for l in ("vuõʹjj", "kuõʹjj", "Kaala", "taala", "ala"):
+            Lexeme.objects.create(lexeme=l, pos="N", language=self.language)
+
+    def search(self, query, lookup_expr="icontains"):
+        return sorted(
+            Lexeme.objects.filter(trigram_q("lexeme", query, lookup_expr)).values_list(
+                "lexeme", flat=True
+            )
+        )
+
+    def test_trigram_search(self):
+        for query, lookup_expr in (
+            ("aal", "icontains"),
+            ("KAAL", "icontains"),
+            ("Kaal", "contains"),
+            ("uõʹjj", "icontains"),
+            ("al", "icontains"),
+            ("ala", "exact"),
+            ("xyz", "icontains"),
+        ):
+            self.assertEqual(
+                self.search(query, lookup_expr),
+                sorted(
+                    Lexeme.objects.filter(
+                        **{"lexeme__" + lookup_expr: query}
+                    ).values_list("lexeme", flat=True)
+                ),
+                query,
+            )
+        self.assertEqual(self.search("aala"), ["Kaala", "taala"])
+
+    def test_index_maintained(self):
+        lexeme = Lexeme.objects.get(lexeme="taala")
+        lexeme.lexeme = "saalla"
+        lexeme.save()
+        self.assertEqual(self.search("taa"), [])
+        self.assertEqual(self.search("aall"), ["saalla"])
+
+        LexemeTrigram.objects.all().delete()
+        self.assertEqual(self.search("aal"), [])
+        call_command("rebuild_trigram_index", stdout=io.StringIO())
+        self.assertEqual(self.search("aal"), ["Kaala", "saalla"])
+
+        lexeme.delete()
+        self.assertFalse(LexemeTrigram.objects.filter(lexeme_id=lexeme.id).exists())
+
+
+class RegexFilterTest(TestCase):
+    def setUp(self):
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        for l, contlex in (
+            ("vuõʹjj", "N_VUOJJ"),
+            ("kuõʹjj", "N_VUOJJ"),
+            ("Kaala", "N_KAALA"),
+            ("taala", "N_KAALA"),
+            ("ala", "ADV_"),
+        ):
+            lexeme = Lexeme.objects.create(lexeme=l, pos="N", language=self.language)
+            Stem.objects.create(lexeme=lexeme, text=l, contlex=contlex)
+
+    def test_regex_literals(self):
+        self.assertEqual(regex_literals("^(ka)a.*la$"), ("kaa", "la", ["kaa", "la"]))
+        self.assertEqual(regex_literals("(ab|cd)ef$"), ("", "ef", ["ef"]))
+        self.assertEqual(regex_literals(r"a[bc]\^d+"), ("", "", ["a", "^"]))
+        self.assertIsNone(regex_literals("(?i)aala$"))
+        self.assertIsNone(regex_literals("aa("))
+        for pattern in ("[[:alpha:]]ab$", "^[[.a.]]b", "[[=a=]]b", "[[a]b]$"):
+            self.assertIsNone(regex_literals(pattern), pattern)
+        self.assertEqual(
+            regex_q("lexeme", "[[:alpha:]]ab$", "regex"),
+            Q(lexeme__regex="[[:alpha:]]ab$"),
+        )
+
+    def test_regex_search(self):
+        for query, lookup_expr in (
+            ("aala$", "regex"),
+            ("^Kaa", "regex"),
+            ("^kaa", "iregex"),
+            ("(a|u)l?a$", "regex"),
+            ("õʹjj$", "iregex"),
+            ("^ala$", "regex"),
+            (".*", "regex"),
+        ):
+            self.assertEqual(
+                sorted(
+                    Lexeme.objects.filter(
+                        trigram_q("lexeme", query, lookup_expr)
+                    ).values_list("lexeme", flat=True)
+                ),
+                sorted(
+                    Lexeme.objects.filter(
+                        **{"lexeme__" + lookup_expr: query}
+                    ).values_list("lexeme", flat=True)
+                ),
+                query,
+            )
+
+        response = self.client.get(reverse("index"), {"contlex": "^n_k"})
+        self.assertEqual(
+            sorted(l.lexeme for l in response.context["object_list"]),
+            ["Kaala", "taala"],
+        )
+
+    def test_iregex_prefix(self):
+        self.assertNotIn("startswith", str(regex_q("stem__contlex", "^N_K", "iregex")))
+        # MySQL matches the prefix with the collation of the column, like the regex
+        with mock.patch("manageXML.managers.connection") as mysql:
+            mysql.vendor = "mysql"
+            q = regex_q("stem__contlex", "^N_K", "iregex")
+        self.assertIn("stem__contlex__istartswith", str(q))
+        self.assertEqual(
+            sorted(Lexeme.objects.filter(q).values_list("lexeme", flat=True)),
+            ["Kaala", "taala"],
+        )
+
+
+class KeysetPaginatorTest(TestCase):
+    def setUp(self):
+        language = Language.objects.create(id="sms", name="Skolt Sami")
+        lexemes = [
+            Lexeme.objects.create(lexeme=word, pos=pos, language=language)
+            for word in ("kuä'cc", "sâǥǥ", "vuõ'ss", "ä'ǩǩ")
+            for pos in ("N", "V", "A")
+        ]
+        for i, lexeme in enumerate(lexemes):
+            Relation.objects.create(
+                lexeme_from=lexeme, lexeme_to=lexemes[i // 2] if i % 3 else None
+            )
+
+    def walk(self, queryset, per_page=5):
+        from .views import KeysetPaginator  # the views query the languages on import
+
+        paginator = KeysetPaginator(queryset, per_page)
+        page, pages = paginator.page(1), []
+        while True:
+            pages.append([o.id for o in page])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_page_number())
+
+        backwards = []
+        while True:
+            backwards.insert(0, [o.id for o in page])
+            if not page.has_previous():
+                break
+            page = paginator.page(page.previous_page_number())
+        self.assertEqual(backwards, pages)
+        self.assertEqual(
+            [o.id for o in paginator.page("last")], pages[-1] if pages else []
+        )
+        return pages
+
+    def test_pages(self):
+        for queryset in (
+            Lexeme.objects.order_by("lexeme_lang"),
+            Lexeme.objects.order_by("-consonance", "lexeme_lang"),
+            Relation.objects.order_by("-lexeme_to"),
+            Relation.objects.order_by("lexeme_to"),
+            Lexeme.objects.filter(pos="Pr").order_by("lexeme_lang"),
+        ):
+            order_by = queryset.query.order_by
+            # the primary key breaks the ties in the direction of the first column
+            pk = "-id" if order_by and order_by[0].startswith("-") else "id"
+            expected = list(
+                queryset.order_by(*order_by, pk).values_list("id", flat=True)
+            )
+            pages = self.walk(queryset)
+            self.assertEqual([id for page in pages for id in page], expected)
+
+    @mock.patch("manageXML.views.LexemeDictionaryView.paginate_by", 5)
+    def test_view(self):
+        response = self.client.get(reverse("index"), {"order_by": "lexeme_lang"})
+        first = response.context["page_obj"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("index"),
+                {"order_by": "lexeme_lang", "page": first.next_page_number()},
+            )
+        second = response.context["page_obj"]
+        self.assertEqual(second.number, 2)
+        self.assertFalse(any("OFFSET" in q["sql"] for q in queries))
+        self.assertLess(
+            (first[4].lexeme_lang, first[4].id), (second[0].lexeme_lang, second[0].id)
+        )
+
+        response = self.client.get(reverse("index"), {"page": "bm90IGEgY3Vyc29y"})
+        self.assertEqual(response.status_code, 404)
+
+
+class CountCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        for word in ("kuä'cc", "sâǥǥ", "vuõ'ss"):
+            Lexeme.objects.create(lexeme=word, pos="N", language=self.language)
+
+    def paginator(self, queryset, **kwargs):
+        from .views import CachedPaginator  # the views query the languages on import
+
+        return CachedPaginator(queryset.order_by("id"), 50, **kwargs)
+
+    def test_invalidation(self):
+        lexemes = Lexeme.objects.filter(language=self.language)
+        self.assertEqual(self.paginator(lexemes).count, 3)
+        self.assertEqual(self.paginator(Relation.objects.all()).count, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lexeme = Lexeme.objects.create(
+                lexeme="ä'ǩǩ", pos="N", language=self.language
+            )
+        with self.assertNumQueries(0):  # still cached, the relations did not change
+            self.assertEqual(self.paginator(Relation.objects.all()).count, 0)
+        self.assertEqual(self.paginator(lexemes).count, 4)
+
+        with self.captureOnCommitCallbacks(execute=True):  # a bulk path
+            Relation.objects.bulk_upsert([(lexeme, l) for l in lexemes])
+        self.assertEqual(self.paginator(Relation.objects.all()).count, 4)
+
+    def test_estimated_count(self):
+        with mock.patch("manageXML.views.estimated_count", return_value=300000):
+            for name in ("lexeme-filter", "relation-search"):
+                with self.subTest(name):
+                    paginator = self.client.get(reverse(name)).context["paginator"]
+                    self.assertEqual(paginator.count, 300000)
+                    self.assertTrue(paginator.estimated)
+
+            response = self.client.get(reverse("lexeme-filter"), {"pos": "N"})
+            self.assertEqual(response.context["paginator"].count, 3)
+            self.assertFalse(response.context["paginator"].estimated)
+
+            paginator = self.paginator(Lexeme.objects.all(), estimate_count=True)
+            self.assertEqual(paginator.count, 3)  # no base queryset to compare with
+
+
+class LexemeNavigationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        self.lexemes = [
+            Lexeme.objects.create(lexeme=l, pos=pos, language=self.language)
+            for l, pos in (
+                ("kuä'cc", "N"),
+                ("sâǥǥ", "N"),
+                ("sâǥǥ", "V"),  # the same sort key, ordered by ID
+                ("vuõ'ss", "N"),
+                ("äʹrbb", "N"),
+            )
+        ]
+
+    def around(self, lexeme, order_by="lexeme_lang"):
+        response = self.client.get(
+            reverse("lexeme-detail", kwargs={"pk": lexeme.pk}),
+            {"language": "sms", "order_by": order_by, "lastlexeme": lexeme.pk},
+        )
+        return (
+            [l.pk for l in response.context["prev_objects"]],
+            [l.pk for l in response.context["next_objects"]],
+        )
+
+    def window_queries(self, queries):
+        return [
+            q
+            for q in queries
+            if 'ORDER BY "manageXML_lexeme"."lexeme_lang"' in q["sql"]
+        ]
+
+    def test_neighbours(self):
+        ids = [l.pk for l in self.lexemes]
+        self.assertEqual(self.around(self.lexemes[2]), (ids[:2], ids[3:]))
+
+        # the next lexeme is answered from the cached window
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.around(self.lexemes[3]), (ids[:3], ids[4:]))
+        self.assertEqual(self.window_queries(queries.captured_queries), [])
+
+        # a change of the lexemes drops the window
+        with self.captureOnCommitCallbacks(execute=True):
+            Lexeme.objects.create(lexeme="aa", pos="N", language=self.language)
+        with CaptureQueriesContext(connection) as queries:
+            prev_objects, next_objects = self.around(self.lexemes[3])
+        self.assertEqual(prev_objects[1:], ids[:3])
+        self.assertEqual(len(self.window_queries(queries.captured_queries)), 2)
+
+        self.assertEqual(
+            self.around(self.lexemes[1], order_by="-lexeme_lang"),
+            ([ids[4], ids[3], ids[2]], [ids[0], prev_objects[0]]),
+        )
+
+
+class QueryPlanTest(TestCase):
+    """
+    Checks that the hot queries of the views and the exporters are answered from indexes.
+    """
+
+    def setUp(self):
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+        self.lexeme = Lexeme.objects.create(
+            lexeme="kuä'cc", pos="N", language=self.language
+        )
+
+    def full_scans(self, queryset):
+        """
+        Returns the tables the database reads in full to answer the queryset.
+        """
+        if connection.vendor == "mysql":
+            plan = json.loads(queryset.explain(format="json"))
+            tables = []
+
+            def visit(node):
+                if isinstance(node, dict):
+                    if node.get("access_type") == "ALL":
+                        tables.append(node.get("table_name"))
+                    for value in node.values():
+                        visit(value)
+                elif isinstance(node, list):
+                    for value in node:
+                        visit(value)
+
+            visit(plan)
+            return tables
+        # SQLite: "SCAN <table>" without an index is a full table scan
+        return re.findall(r"SCAN (\w+)$", queryset.explain(), flags=re.MULTILINE)
+
+    def view_queryset(self, view_class, **params):
+        """
+        Returns the queryset of a page of a list view, as filtered and ordered by the view.
+        """
+        from .views import KeysetPaginator
+
+        view = view_class()
+        view.setup(RequestFactory().get("/", params))
+        return KeysetPaginator(view.get_queryset(), view.paginate_by).object_list
+
+    def queries(self):
+        from .views import LexemeView, RelationView
+
+        return {
+            "lexemes of a language": self.view_queryset(
+                LexemeView, language="sms", order_by="lexeme_lang"
+            ),
+            "lexemes of a language and POS": self.view_queryset(
+                LexemeView, language="sms", pos="N", order_by="lexeme_lang"
+            ),
+            "lexemes of a language by status": self.view_queryset(
+                LexemeView, language="sms", checked="True", order_by="lexeme_lang"
+            ),
+            "rhymes": Lexeme.objects.filter(language=self.language).rhymes(
+                "cc", "assonance"
+            ),
+            "translations of a lexeme": Relation.objects.filter(
+                type=TRANSLATION, checked=True, lexeme_from=self.lexeme
+            ),
+            "relations by status": self.view_queryset(
+                RelationView, type=TRANSLATION, checked="False"
+            ),
+            "relations of a language pair": Relation.objects.filter(
+                lang_from="sms", lang_to="fin", type=TRANSLATION, checked=True
+            ).values_list("id", "lexeme_from", "lexeme_to"),
+        }
+
+    def test_no_full_scans(self):
+        if connection.vendor not in ("sqlite", "mysql"):
+            self.skipTest("No plan parser for %s." % connection.vendor)
+        for name, queryset in self.queries().items():
+            with self.subTest(name):
+                self.assertEqual(self.full_scans(queryset), [])
+
+    def test_lexeme_lists_are_read_in_order(self):
+        # MySQL compares the boolean columns (deleted, checked) to constants, so the lexeme lists are
+        # index range scans in sort order; SQLite tests them with NOT and sorts the rows
+        if connection.vendor != "mysql":
+            self.skipTest("The plan is only checked on MySQL.")
+        for name, queryset in self.queries().items():
+            if name.startswith("lexemes of"):
+                with self.subTest(name):
+                    plan = queryset.explain(format="json")
+                    self.assertNotIn('"using_filesort": true', plan)
+
+    def test_live_rows(self):
+        self.lexeme.deleted = True
+        self.lexeme.save()
+        self.assertFalse(Lexeme.objects.exists())
+        self.assertTrue(Lexeme.all_objects.exists())
+        self.assertIs(Lexeme._default_manager, Lexeme.all_objects)
+
+        from .views import LexemeView
+
+        self.assertFalse(self.view_queryset(LexemeView, language="sms").exists())
+
+
+class BulkHistoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="importer")
+        self.language = Language.objects.create(id="sms", name="Skolt Sami")
+
+    def create(self, *lexemes):
+        return [
+            Lexeme.objects.create(lexeme=l, pos="N", language=self.language)
+            for l in lexemes
+        ]
+
+    def test_bulk_history(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with bulk_history("import:test", user=self.user) as batch:
+                a, b = self.create("kuä'cc", "sâǥǥ")
+                a.notes = "changed"
+                a.save()
+                self.assertFalse(Lexeme.history.exists())
+        self.assertEqual(batch.written, 3)
+        entries = Lexeme.history.all()
+        self.assertEqual(
+            sorted(entries.values_list("id", "history_type")),
+            sorted([(a.id, "+"), (a.id, "~"), (b.id, "+")]),
+        )
+        self.assertEqual(
+            set(entries.values_list("history_change_reason", "history_user")),
+            {("import:test", self.user.id)},
+        )
+
+    def test_rolled_back_entries_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with bulk_history() as batch:
+                self.create("kuä'cc")
+                try:
+                    with transaction.atomic():
+                        self.create("sâǥǥ")
+                        raise IntegrityError
+                except IntegrityError:
+                    pass
+        self.assertEqual(batch.written, 1)
+
+    def test_no_history(self):
+        with no_history():
+            (lexeme,) = self.create("kuä'cc")
+            Relation.objects.bulk_upsert([(lexeme, None)], history=True)
+        self.assertFalse(Lexeme.history.exists())
+        self.assertFalse(Relation.history.exists())
+
+
+class ArchiveHistoryTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        language = Language.objects.create(id="sms", name="Skolt Sami")
+        self.lexeme = Lexeme.objects.create(lexeme="kuä'cc", pos="N", language=language)
+        self.lexeme.notes = "changed"
+        self.lexeme.save()
+        self.old_date = timezone.now() - timedelta(days=400)
+        Lexeme.history.update(history_date=self.old_date)
+        self.lexeme.notes = "recent"
+        self.lexeme.save()
+
+    def test_archive_and_restore(self):
+        History = Lexeme.history.model
+        call_command("archive_history", "--dir", self.directory, stdout=io.StringIO())
+        self.assertEqual(
+            list(History.objects.values_list("notes", flat=True)), ["recent"]
+        )
+        self.assertEqual(
+            partitions(History, self.directory), [self.old_date.strftime("%Y-%m")]
+        )
+
+        archived = list(
+            read_archive(
+                History,
+                self.old_date - timedelta(days=1),
+                self.old_date + timedelta(days=1),
+                self.directory,
+            )
+        )
+        self.assertEqual(
+            sorted((h.history_type, h.notes) for h in archived),
+            [("+", ""), ("~", "changed")],
+        )
+
+        call_command(
+            "restore_history",
+            "--model",
+            "lexeme",
+            "--partition",
+            self.old_date.strftime("%Y"),
+            "--dir",
+            self.directory,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(History.objects.count(), 3)
+        self.assertEqual(partitions(History, self.directory), [])
+
+    def test_search_includes_archive(self):
+        History = Lexeme.history.model
+        call_command("archive_history", "--dir", self.directory, stdout=io.StringIO())
+
+        start_date, end_date = date_range(
+            (self.old_date - timedelta(days=1)).date(), timezone.now().date()
+        )
+        history = ArchivedHistory(
+            History.objects.all(), start_date, end_date, directory=self.directory
+        )
+        self.assertEqual(history.count(), 3)
+        self.assertEqual([h.notes for h in history[1:3]], ["changed", ""])
+
+        params = {
+            "start_date": start_date.strftime("%d/%m/%Y"),
+            "end_date": end_date.strftime("%d/%m/%Y"),
+            "model_class": "lexeme",
+            "include_archive": "on",
+        }
+        with override_settings(HISTORY_ARCHIVE_DIR=self.directory):
+            response = self.client.get(reverse("history-search"), params)
+        records = response.context["object_list"]
+        self.assertEqual([r.notes for r in records], ["recent", "changed", ""])
+        self.assertEqual(
+            [[(c.field, c.old, c.new) for c in r.changes] for r in records],
+            [[("notes", "changed", "recent")], [("notes", "", "changed")], []],
+        )
+
+
+class HistoryDiffsTest(TestCase):
+    def setUp(self):
+        language = Language.objects.create(id="sms", name="Skolt Sami")
+        for word in ("kuä'cc", "sâǥǥ", "vuõ'ss"):
+            lexeme = Lexeme.objects.create(lexeme=word, pos="N", language=language)
+            Relation.objects.create(lexeme_from=lexeme)
+            for notes in ("a", "b"):
+                lexeme.notes = notes
+                lexeme.save()
+
+    def test_prefetch_history_diffs(self):
+        records = list(Lexeme.history.all()) + list(Relation.history.all())
+        expected = [diff_history(r, r.prev_record) for r in records]
+
+        with self.assertNumQueries(6):  # 2 per model + 1 per foreign key in use
+            records = prefetch_history_diffs(records)
+            [str(r.recorded_instance) for r in records]
+
+        self.assertEqual(
+            [[(c.field, c.old, c.new) for c in r.changes] for r in records],
+            [[(c.field, c.old, c.new) for c in changes] for changes in expected],
+        )
+        self.assertEqual(sum(len(r.changes) for r in records), 6)
+
+
+class HistoryExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="auditor", password="12345", is_staff=True
+        )
+        language = Language.objects.create(id="sms", name="Skolt Sami")
+        for word in ("kuä'cc", "sâǥǥ", "vuõ'ss"):
+            lexeme = Lexeme.objects.create(lexeme=word, pos="N", language=language)
+            lexeme.notes = "a"
+            lexeme.save()
+        # entries sharing a date are paginated by their id
+        Lexeme.history.filter(history_type="~").update(
+            history_date=timezone.now() - timedelta(days=1)
+        )
+        self.range = date_range(
+            timezone.now().date() - timedelta(days=2), timezone.now().date()
+        )
+
+    def test_iter_history(self):
+        History = Lexeme.history.model
+        expected = list(
+            History.objects.order_by("history_date", "history_id").values_list(
+                "history_id", flat=True
+            )
+        )
+        records = iter_history(History, *self.range, chunk_size=2)
+        self.assertEqual([r.history_id for r in records], expected)
+
+        records = iter_history(History, *self.range, history_type="~", chunk_size=2)
+        self.assertEqual(len(list(records)), 3)
+
+    def test_export_view(self):
+        self.client.force_login(self.user)
+        params = {
+            "start_date": self.range[0].strftime("%d/%m/%Y"),
+            "end_date": self.range[1].strftime("%d/%m/%Y"),
+            "model_class": "lexeme",
+            "history_type": "+",
+        }
+        response = self.client.get(reverse("history-export"), params)
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            sorted(r["lexeme"] for r in rows), ["kuä'cc", "sâǥǥ", "vuõ'ss"]
+        )
+
+        response = self.client.get(
+            reverse("history-export"), {**params, "format": "csv"}
+        )
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 4)
+
+        with mock.patch.object(process_file_request, "delay") as delay:
+            response = self.client.post(
+                reverse("history-export") + "?" + urlencode(params), {"format": "csv"}
+            )
+        self.assertRedirects(response, reverse("file-request"))
+
+        process_file_request(**delay.call_args.kwargs)
+        file_request = FileRequest.objects.get(type=DOWNLOAD_TYPE_HISTORY)
+        self.assertTrue(file_request.is_completed(), file_request.output)
+        with zipfile.ZipFile(file_request.file.path) as zip_file:
+            (name,) = zip_file.namelist()
+            self.assertTrue(name.endswith(".csv"))
+            self.assertEqual(len(zip_file.read(name).splitlines()), 4)
+        file_request.file.delete()
+
+
+class TransducersStatusTest(TestCase):
+    def tearDown(self):
+        generator_engine._transducers.pop("sms", None)
+
+    @override_settings(PRELOAD_TRANSDUCERS=["sms"])
+    def test_transducers_status(self):
+        url = reverse("transducers-status")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)  # to the login page
+
+        user = User.objects.create_user(username="user", password="password")
+        self.client.force_login(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+
+        generator_engine._transducers["sms"] = [SlowTransducer()]
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["languages"]["sms"]["loaded"])
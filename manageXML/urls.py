@@ -150,10 +150,25 @@ urlpatterns = [
     ),
     # searching
     re_path(r"^lexeme/search$", views.LexemeSearchView.as_view(), name="lexeme-search"),
+    path("rhymes", views.RhymeSearchView.as_view(), name="rhyme-search"),
+    path("rhymes.json", views.RhymeSearchAPIView.as_view(), name="rhyme-search-api"),
+    path("source/search", views.SourceNameSearchView.as_view(), name="source-search"),
+    # generated mini paradigms
+    re_path(
+        r"^lexeme/(?P<pk>\d+)/generated-paradigms$",
+        views.GeneratedParadigmsView.as_view(),
+        name="lexeme-generated-paradigms",
+    ),
+    path(
+        "lexeme/generated-paradigms",
+        views.GeneratedParadigmsView.as_view(),
+        name="generated-paradigms",
+    ),
     # history search
     re_path(
         r"^history/search$", views.HistorySearchView.as_view(), name="history-search"
     ),
+    path("history/export", views.HistoryExportView.as_view(), name="history-export"),
     # approving lexemes
     re_path(
         r"^lexeme/approval", views.LexemeApprovalView.as_view(), name="lexeme-approval"
@@ -229,6 +244,12 @@ urlpatterns = [
         views.download_file,
         name="file-download",
     ),
+    # readiness of the transducers
+    path(
+        "status/transducers",
+        views.TransducersStatusView.as_view(),
+        name="transducers-status",
+    ),
     # paradigms
     path(
         "paradigms/",
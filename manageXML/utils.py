@@ -1,6 +1,8 @@
 import os
 import csv
 import re
+import multiprocessing
+from itertools import islice
 from django.db.models import Model, Count, Max, Value
 import django.db.models.functions as model_functions
 from django.db.models.functions import *
@@ -8,42 +10,21 @@ from typing import Dict, Tuple, List, Sequence, Type
 from django.db.models.constants import LOOKUP_SEP
 from collections import OrderedDict
 from manageXML.constants import LEXEME_TYPE
+from django.db import connections, transaction
+from simple_history.utils import bulk_update_with_history
+from manageXML.collation import initial_rank
 from manageXML.models import Lexeme
-from django.core.cache import cache
+from manageXML.history import current_batch, history_disabled
+from manageXML.registry import language_registry
+from manageXML import versions
 
 
 def get_all_used_languages():
-    cache_key = "languages_sorted"
-    result = cache.get(cache_key)
-
-    if not result:
-        result = (
-            Lexeme.objects.values_list("language", flat=True)
-            .distinct()
-            .order_by(
-                "language",
-            )
-        )
-        cache.set(cache_key, result, timeout=3600 * 24)  # Cache for a day
-
-    return result
+    return language_registry.used_languages()
 
 
 def get_all_used_pos():
-    cache_key = "pos_sorted"
-    result = cache.get(cache_key)
-
-    if not result:
-        result = (
-            Lexeme.objects.values_list("pos", flat=True)
-            .distinct()
-            .order_by(
-                "pos",
-            )
-        )
-        cache.set(cache_key, result, timeout=3600 * 24)  # Cache for a day
-
-    return result
+    return language_registry.used_pos()
 
 
 def read_first_ids_from(
@@ -216,3 +197,141 @@ def contlex_to_pos(contlex: str):
                 pos, metadata = METADATA_MAP[pos]
             break
     return pos, metadata
+
+
+# the columns recompute_lexeme_keys() reads: the inputs of the derived fields, then the derived fields
+_LEXEME_KEY_COLUMNS = ("id", "lexeme", "language_id", "contlex") + Lexeme.DERIVED_FIELDS
+
+
+def derive_lexeme_keys(rows, collations=None):
+    """
+    Computes the derived fields of lexemes without touching the database.
+
+    :param rows: A list of tuples with the values of _LEXEME_KEY_COLUMNS.
+    :param collations: Language ID -> Collation, as returned by language_registry.collations().
+    :return tuple: The number of rows and, for the lexemes whose derived fields changed, a list of
+            (ID, {derived field: value}, [changed fields]).
+    """
+    collations = language_registry.collations() if collations is None else collations
+    rows = [dict(zip(_LEXEME_KEY_COLUMNS, row)) for row in rows]
+
+    # the sort keys of each language at once
+    sort_keys, initial_ranks = {}, {}
+    for language_id in set(r["language_id"] for r in rows):
+        _rows = [r for r in rows if r["language_id"] == language_id]
+        collation = collations.get(language_id)
+        keys = (
+            collation.keys(r["lexeme"] for r in _rows)
+            if collation
+            else [r["lexeme"] for r in _rows]
+        )
+        for r, key in zip(_rows, keys):
+            sort_keys[r["id"]] = key
+            initial_ranks[r["id"]] = initial_rank(key, collation)
+
+    changed = []
+    for values in rows:
+        lexeme = Lexeme(**values)
+        lexeme.set_derived_fields(
+            lexeme_lang=sort_keys[values["id"]],
+            initial_rank=initial_ranks[values["id"]],
+        )
+
+        derived = {f: getattr(lexeme, f) for f in Lexeme.DERIVED_FIELDS}
+        fields = [f for f in Lexeme.DERIVED_FIELDS if derived[f] != values[f]]
+        if fields:
+            changed.append((values["id"], derived, fields))
+    return len(rows), changed
+
+
+def _write_lexeme_keys(changed, history=False, history_user=None, batch_size=None):
+    fields = sorted(set(f for _, _, _fields in changed for f in _fields))
+    if not fields:
+        return
+
+    if not history or history_disabled():
+        objs = [Lexeme(id=id, **derived) for id, derived, _ in changed]
+        Lexeme.all_objects.bulk_update(objs, fields, batch_size=batch_size)
+        versions.bump(Lexeme)
+        return
+
+    # the history entries copy all the fields, load the complete lexemes
+    lexemes = Lexeme.all_objects.in_bulk([id for id, _, _ in changed])
+    objs = []
+    for id, derived, _ in changed:
+        lexeme = lexemes[id]
+        for f, value in derived.items():
+            setattr(lexeme, f, value)
+        if history_user:
+            lexeme._history_user = history_user
+        objs.append(lexeme)
+    batch = current_batch()
+    with transaction.atomic():
+        bulk_update_with_history(
+            objs,
+            Lexeme,
+            fields,
+            batch_size=batch_size,
+            default_user=history_user or (batch and batch.user),
+            default_change_reason=batch.name if batch else "recompute_lexeme_keys",
+        )
+        versions.bump(Lexeme)
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def recompute_lexeme_keys(
+    queryset=None, workers=1, chunk_size=2000, history=False, history_user=None
+):
+    """
+    Recomputes the derived fields (Lexeme.DERIVED_FIELDS) of lexemes and writes back only the changed rows.
+
+    The lexemes are streamed from the database in chunks, the fields of each chunk are computed in a pool
+    of ``workers`` processes and the changed rows are written with bulk_update(). Unlike Lexeme.save(),
+    no other field is touched and no history is recorded unless asked for.
+
+    :param queryset: The lexemes to recompute (default: all).
+    :param workers: The number of processes computing the fields.
+    :param chunk_size: The number of lexemes read, computed and written at once.
+    :param history: Whether to record a history entry for every changed lexeme.
+    :param history_user: The user of the history entries.
+    :return generator: (number of lexemes processed, number of lexemes changed) for each chunk.
+    """
+    queryset = Lexeme.all_objects.all() if queryset is None else queryset
+    rows = (
+        queryset.order_by("id")
+        .values_list(*_LEXEME_KEY_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+    chunks = _chunked(rows, chunk_size)
+    collations = language_registry.collations()  # loaded here, the workers do not query
+
+    if workers <= 1:
+        for chunk in chunks:
+            n, changed = derive_lexeme_keys(chunk, collations)
+            _write_lexeme_keys(changed, history, history_user, chunk_size)
+            yield n, len(changed)
+        return
+
+    # read and write in this process, keep a few chunks in flight to bound the memory use
+    connections.close_all()  # do not share DB connections with the workers
+    pool = multiprocessing.get_context("fork").Pool(workers)
+    pending = []
+    try:
+        for chunk in chunks:
+            pending.append(pool.apply_async(derive_lexeme_keys, (chunk, collations)))
+            while len(pending) > workers * 2 or (pending and pending[0].ready()):
+                n, changed = pending.pop(0).get()
+                _write_lexeme_keys(changed, history, history_user, chunk_size)
+                yield n, len(changed)
+        for result in pending:
+            n, changed = result.get()
+            _write_lexeme_keys(changed, history, history_user, chunk_size)
+            yield n, len(changed)
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,108 @@
+import re
+import logging
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+logger = logging.getLogger("verdd.manageXML")
+
+VERSION_KEY = "data_version:%s"
+
+
+def _tables(models):
+    return {m if isinstance(m, str) else m._meta.db_table for m in models}
+
+
+def data_versions(tables):
+    """
+    Returns the data versions of database tables, the number of times they were changed (see bump()).
+
+    :param tables: Table names.
+    :return dict: The version of each table.
+    """
+    keys = {VERSION_KEY % t: t for t in tables}
+    versions = cache.get_many(keys)
+    return {t: versions.get(k, 0) for k, t in keys.items()}
+
+
+def bump(*models):
+    """
+    Increments the data versions of the tables of models (or table names) once the running transaction
+    commits, invalidating the counts cached for them in all processes sharing the cache.
+    """
+    tables = _tables(models)
+
+    def _bump():
+        for table in tables:
+            key = VERSION_KEY % table
+            try:
+                cache.incr(key)
+            except ValueError:  # not in the cache (yet)
+                if not cache.add(key, 1, timeout=None):
+                    cache.incr(key)
+
+    transaction.on_commit(_bump)
+
+
+def query_tables(sql):
+    """
+    Returns the tables of the app used by an SQL query, including those of its subqueries.
+    """
+    tables = {
+        m._meta.db_table
+        for m in apps.get_app_config("manageXML").get_models(include_auto_created=True)
+    }
+    return sorted(tables.intersection(re.findall(r"\w+", sql)))
+
+
+def estimated_count(model, using="default"):
+    """
+    Returns the number of rows of the table of a model according to the table statistics of the database,
+    or None if the database keeps none (e.g. SQLite). Far cheaper than COUNT(*) on large tables, but only
+    approximate.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:  # never analyzed
+        return None
+    return int(row[0])
+
+
+def _changed(sender, **kwargs):
+    bump(sender)
+
+
+def _m2m_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        bump(sender)
+
+
+def connect_signals():
+    """
+    Bumps the data version of a table whenever an object of the app is saved or deleted. The bulk paths
+    (QuerySet.update(), bulk_create(), ...) send no signals and call bump() themselves.
+
+    Models setting ``track_data_version = False`` are skipped, so that their deletes stay fast.
+    """
+    for model in apps.get_app_config("manageXML").get_models():
+        if hasattr(model, "instance_type"):
+            continue  # the history tables are not listed with cached counts
+        if not getattr(model, "track_data_version", True):
+            continue
+        post_save.connect(_changed, sender=model, dispatch_uid="data_version")
+        post_delete.connect(_changed, sender=model, dispatch_uid="data_version")
+    m2m_changed.connect(_m2m_changed, dispatch_uid="data_version")
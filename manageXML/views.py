@@ -3,10 +3,17 @@ import os
 
 from django.shortcuts import render
 from django.urls import reverse_lazy
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.template.loader import render_to_string
 from django.template.loader import get_template
 import datetime
+from django.utils import timezone
 from django_filters import (
     DateFromToRangeFilter,
     DateFilter,
@@ -20,7 +27,7 @@ from django_filters import (
 )
 from django_filters.widgets import RangeWidget
 import django_filters
-from django.views.generic import TemplateView
+from django.views.generic import TemplateView, View
 from django.views.generic.list import ListView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import (
@@ -35,26 +42,56 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db.models.functions import Substr, Upper
 from django.db.models import Prefetch
-from django.core.paginator import Paginator
+from django.core import exceptions
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+import base64
+import binascii
 import hashlib
+from urllib.parse import urlencode
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django.http import Http404
+from django.db import DatabaseError
 from django.db.models import Q
 from rest_framework import generics, response
+from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_cache_control
 from .serializers import *
-import string
 from .forms import *
 from django.shortcuts import get_object_or_404
 from collections import defaultdict
 import csv
 import re
 from .constants import INFLEX_TYPE_OPTIONS
-from .inflector import generate_inflections
+from .inflector import (
+    generate_inflections,
+    generate_inflections_coalesced,
+    generated_paradigms_versions,
+    generator_engine,
+    process_rss,
+)
 from .utils import get_all_used_languages, get_all_used_pos
 import logging
 from django.conf import settings
 from .tasks import process_file_request
+from .archive import ArchivedHistory
+from .collation import DEFAULT_INITIALS, initials
+from .keyset import Keyset
+from .managers import regex_q, trigram_q, REGEX_LOOKUPS, TRIGRAM_LOOKUPS
+from .registry import language_registry
+from .versions import data_versions, estimated_count, query_tables
+from .history import (
+    date_range,
+    export_history,
+    iter_history,
+    prefetch_history_diffs,
+    EXPORT_CSV,
+    EXPORT_NDJSON,
+)
 
 logger = logging.getLogger("verdd.manageXML")  # Get an instance of a logger
 
@@ -80,6 +117,9 @@ class CachedPaginator(Paginator):
     """
     A Paginator that caches the total count of objects to avoid expensive queries.
     Built on top of Django's Paginator.
+
+    The cached counts are tagged with the data versions of the tables of the query (see versions.py), so
+    they are recounted as soon as one of the tables changes.
     """
 
     def __init__(
@@ -90,25 +130,65 @@ class CachedPaginator(Paginator):
         allow_empty_first_page=True,
         cache_timeout=3600,
         cache_key_prefix=None,
+        estimate_count=False,
+        estimate_threshold=10000,
+        base_queryset=None,
     ):
         """
         Initializes the CachedPaginator with additional parameters for caching.
 
         :param cache_timeout: Time in seconds for which the count will be cached.
         :param cache_key_prefix: Optional prefix for the cache key to avoid collisions.
+        :param estimate_count: Estimate the count of unfiltered listings from the table statistics of the
+            database instead of counting the rows.
+        :param estimate_threshold: Smaller tables are counted exactly.
+        :param base_queryset: The queryset the objects were filtered from, e.g. the live rows of the model.
+            The count is only estimated when the objects are all of its rows.
         """
         super().__init__(object_list, per_page, orphans, allow_empty_first_page)
         self.cache_timeout = cache_timeout
         self.cache_key_prefix = cache_key_prefix or "cached_paginator"
+        self.estimate_count = estimate_count
+        self.estimate_threshold = estimate_threshold
+        self.base_queryset = base_queryset
+        self.estimated = False
+
+    def _query_sql(self, queryset):
+        try:
+            return str(queryset.query)
+        except EmptyResultSet:
+            return ""
 
     def _generate_cache_key(self):
         """
-        Generates a cache key based on the query and model, using a hash for uniqueness.
+        Generates a cache key based on the query and model, using a hash for uniqueness, and the data
+        versions of the tables it reads.
         """
-        query_hash = hashlib.md5(
-            str(self.object_list.query).encode("utf-8")
-        ).hexdigest()
-        return f"{self.cache_key_prefix}:{query_hash}"
+        sql = self._query_sql(self.object_list)
+        query_hash = hashlib.md5(sql.encode("utf-8")).hexdigest()
+        versions = data_versions(query_tables(sql))
+        version = ".".join(str(versions[t]) for t in sorted(versions))
+        return f"{self.cache_key_prefix}:{query_hash}:{version}"
+
+    def _is_unfiltered(self):
+        """
+        Returns whether the objects are all the rows of the base queryset.
+        """
+        if self.base_queryset is None:
+            return False
+        queryset = self.object_list.order_by()
+        queryset.query.distinct = False  # the rows of a single table are distinct
+        return self._query_sql(queryset) == self._query_sql(
+            self.base_queryset.order_by()
+        )
+
+    def _estimate(self):
+        if not self.estimate_count or not self._is_unfiltered():
+            return None
+        count = estimated_count(self.object_list.model, self.object_list.db)
+        if count is None or count < self.estimate_threshold:
+            return None
+        return count
 
     @cached_property
     def count(self):
@@ -119,22 +199,136 @@ class CachedPaginator(Paginator):
         cached_count = cache.get(cache_key)
 
         if cached_count is not None:
+            self.estimated, cached_count = cached_count
             return cached_count
 
-        # If count isn't cached, get the actual count and cache it
-        total_count = super().count
-        cache.set(cache_key, total_count, self.cache_timeout)
+        # If count isn't cached, estimate or get the actual count and cache it
+        total_count = self._estimate()
+        self.estimated = total_count is not None
+        if total_count is None:
+            total_count = super().count
+        cache.set(cache_key, (self.estimated, total_count), self.cache_timeout)
 
         return total_count
 
 
+class KeysetPage(Page):
+    """
+    A page of a KeysetPaginator. The next and previous page "numbers" are cursors, so that the page links
+    of the templates work unchanged.
+    """
+
+    def next_page_number(self):
+        if not self.has_next():
+            raise EmptyPage(_("That page contains no results"))
+        if self.number + 1 == self.paginator.num_pages:
+            return self.number + 1
+        rows = list(self.object_list)
+        return self.paginator.cursor(KeysetPaginator.NEXT, self.number + 1, rows[-1])
+
+    def previous_page_number(self):
+        if not self.has_previous():
+            raise EmptyPage(_("That page number is less than 1"))
+        if self.number - 1 == 1:
+            return 1
+        rows = list(self.object_list)
+        return self.paginator.cursor(KeysetPaginator.PREVIOUS, self.number - 1, rows[0])
+
+
+class KeysetPaginator(CachedPaginator):
+    """
+    A CachedPaginator that seeks the pages by the values of the ordering columns (and the primary key, see
+    Keyset) instead of skipping rows with OFFSET, so that every page is an index range scan as fast as the
+    first.
+
+    The pages are addressed by opaque cursors, passed as the page parameter like page numbers: 1 and
+    num_pages are the first and the last page, page_obj.next_page_number and previous_page_number return
+    cursors. Other page numbers (and orderings by expressions) fall back to OFFSET pagination.
+    """
+
+    NEXT = "n"
+    PREVIOUS = "p"
+
+    def __init__(self, object_list, per_page, **kwargs):
+        self.keyset = Keyset.of(object_list)
+        if self.keyset is not None:
+            object_list = object_list.order_by(*self.keyset.order_by())
+        super().__init__(object_list, per_page, **kwargs)
+
+    def cursor(self, direction, number, obj):
+        """
+        Returns the cursor of the page ``number`` following (or preceding) the row ``obj``.
+        """
+        data = json.dumps(
+            [direction, number, self.keyset.values(obj)], cls=DjangoJSONEncoder
+        )
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    def _decode(self, cursor):
+        try:
+            direction, number, values = json.loads(base64.urlsafe_b64decode(cursor))
+            if direction not in (self.NEXT, self.PREVIOUS) or len(values) != len(
+                self.keyset
+            ):
+                raise ValueError(cursor)
+            return direction, int(number), self.keyset.to_python(values)
+        except (ValueError, TypeError, binascii.Error, exceptions.ValidationError):
+            raise InvalidPage(_("Invalid page."))
+
+    def _page_from(self, values, size, number):
+        # the page starting at the row with the given key values
+        object_list = self.object_list.filter(self.keyset.seek(values, inclusive=True))
+        return KeysetPage(object_list[:size], number, self)
+
+    def page(self, number):
+        if self.keyset is None:
+            return super().page(number)
+        if str(number) == "1" or not self.count:
+            return KeysetPage(self.object_list[: self.per_page], 1, self)
+        if str(number) in (str(self.num_pages), "last"):
+            size = self.count - (self.num_pages - 1) * self.per_page
+            start = self._last_row(
+                self.object_list.order_by(*self.keyset.order_by(reverse=True)), size
+            )
+            if start is None:  # the cached count is stale
+                return self.page(1)
+            return self._page_from(start, size, self.num_pages)
+        if str(number).isdigit():
+            return super().page(number)
+
+        direction, number, values = self._decode(number)
+        number = min(max(number, 1), self.num_pages)
+        if direction == self.NEXT:
+            object_list = self.object_list.filter(self.keyset.seek(values))
+            return KeysetPage(object_list[: self.per_page], number, self)
+
+        previous = self.object_list.order_by(
+            *self.keyset.order_by(reverse=True)
+        ).filter(self.keyset.seek(values, reverse=True))
+        start = self._last_row(previous, self.per_page)
+        if start is None:
+            return self.page(1)
+        return self._page_from(start, self.per_page, number)
+
+    def _last_row(self, queryset, size):
+        # the key values of the last of the first ``size`` rows
+        rows = list(queryset.values_list(*self.keyset.attnames)[:size])
+        return list(rows[-1]) if rows else None
+
+    def _get_page(self, *args, **kwargs):
+        return KeysetPage(*args, **kwargs)
+
+
 class FilteredListView(TitleMixin, ListView):
     filterset_class = None
     paginator_class = CachedPaginator
+    estimate_count = (
+        False  # estimate the total of unfiltered listings, see CachedPaginator
+    )
 
     def get_queryset(self):
         # Get the queryset however you usually would.  For example:
-        queryset = super().get_queryset()
+        queryset = self.base_queryset = super().get_queryset()
         # Then use the query parameters and the queryset to
         # instantiate a filterset and save it as an attribute
         # on the view instance for later.
@@ -148,6 +342,50 @@ class FilteredListView(TitleMixin, ListView):
         context["filterset"] = self.filterset
         return context
 
+    def get_paginator(self, queryset, per_page, **kwargs):
+        if issubclass(self.paginator_class, CachedPaginator):
+            kwargs["estimate_count"] = self.estimate_count
+            kwargs["base_queryset"] = getattr(self, "base_queryset", None)
+        return super().get_paginator(queryset, per_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not issubclass(self.paginator_class, KeysetPaginator):
+            return super().paginate_queryset(queryset, page_size)
+
+        # the page parameter is a cursor, not necessarily a number
+        paginator = self.get_paginator(queryset, page_size)
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(
+            self.page_kwarg, 1
+        )
+        try:
+            page = paginator.page(page)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class TrigramLookupChoiceFilter(LookupChoiceFilter):
+    """
+    A LookupChoiceFilter of the lexeme text answering the contains and icontains lookups with the trigram
+    index and narrowing down the regex lookups by their literals (see trigram_q()).
+    """
+
+    def filter(self, qs, lookup):
+        if (
+            lookup
+            and lookup.value
+            and lookup.lookup_expr in TRIGRAM_LOOKUPS + REGEX_LOOKUPS
+        ):
+            qs = qs.filter(trigram_q(self.field_name, lookup.value, lookup.lookup_expr))
+            return qs.distinct() if self.distinct else qs
+        return super().filter(qs, lookup)
+
+
+# the source filters complete the names from the source-search view (see source_autocomplete.html)
+SOURCE_AUTOCOMPLETE_INPUT = forms.TextInput(
+    attrs={"list": "source-names", "autocomplete": "off", "data-autocomplete": "source"}
+)
+
 
 class LexemeOrderingFilter(OrderingFilter):
     def filter(self, qs, value):
@@ -164,7 +402,7 @@ class LexemeFilter(django_filters.FilterSet):
         (False, _("No")),
     )
 
-    ALPHABETS_CHOICES = list(enumerate(string.ascii_uppercase + "ÄÅÖ"))
+    ALPHABETS_CHOICES = list(enumerate(DEFAULT_INITIALS))
     ORDER_BY_FIELDS = {
         "pos": "pos",
         "lexeme_lang": "lexeme_lang",
@@ -187,7 +425,7 @@ class LexemeFilter(django_filters.FilterSet):
         ("iregex", _("iRegex")),
     ]
 
-    lexeme = LookupChoiceFilter(
+    lexeme = TrigramLookupChoiceFilter(
         field_class=forms.CharField,
         label=_("Lexeme"),
         empty_label=None,
@@ -204,7 +442,9 @@ class LexemeFilter(django_filters.FilterSet):
         choices=ALPHABETS_CHOICES, label=_("Range to"), method="filter_range"
     )
     checked = ChoiceFilter(choices=STATUS_CHOICES, label=_("Processed"))
-    source = CharFilter(label=_("Source"), method="source_filter")
+    source = CharFilter(
+        label=_("Source"), method="source_filter", widget=SOURCE_AUTOCOMPLETE_INPUT
+    )
 
     order_by = LexemeOrderingFilter(fields=ORDER_BY_FIELDS, label=_("Order by"))
 
@@ -230,6 +470,17 @@ class LexemeFilter(django_filters.FilterSet):
         pos = get_all_used_pos()
         self.form.fields["language"].choices = zip(languages, languages)
         self.form.fields["pos"].choices = zip(pos, pos)
+
+        # the range of initials comes from the alphabet of the selected language
+        collation = language_registry.collation(self.data.get("language") or "")
+        self.initials = (
+            [l for l, _ in initials(collation)]
+            if collation
+            else [l for _, l in LexemeFilter.ALPHABETS_CHOICES]
+        )
+        self.form.fields["range_from"].choices = list(enumerate(self.initials))
+        self.form.fields["range_to"].choices = list(enumerate(self.initials))
+
         self.form.fields["order_by"].choices = (
             ("lexeme_lang", _("Lexeme")),
             ("-lexeme_lang", "%s (%s)" % (_("Lexeme"), _("descending"))),
@@ -250,47 +501,36 @@ class LexemeFilter(django_filters.FilterSet):
         )
 
     def filter_range(self, queryset, name, value):
-        # transform datetime into timestamp
-        range_from = (
-            self.data["range_from"] if "range_from" in self.data else None
-        )  # get key
-        range_to = self.data["range_to"] if "range_to" in self.data else None  # get key
-
-        range_from = int(range_from) if range_from else 0
-        range_to = (
-            int(range_to) if range_to else len(LexemeFilter.ALPHABETS_CHOICES) - 1
-        )
+        if name == "range_to" and self.data.get("range_from"):
+            return queryset  # filtered once, by range_from
+
+        letters = self.initials
+        range_from = int(self.data.get("range_from") or 0)
+        range_to = int(self.data.get("range_to") or len(letters) - 1)
 
         if range_from > range_to:
             return queryset.none()
 
-        filters = models.Q()
-        for i in range(range_from, range_to + 1):
-            filters |= models.Q(
-                lexeme__istartswith=LexemeFilter.ALPHABETS_CHOICES[i][1],
-            )
-
-        return queryset.filter(filters)
+        return queryset.initials_between(
+            letters[range_from], letters[range_to], self.data.get("language") or None
+        )
 
     def source_filter(self, queryset, name, value):
         source = self.data["source"] if "source" in self.data else None  # get key
 
-        filters = models.Q()
         if source:
-            relations_with_source = Relation.objects.filter(
-                source__name__icontains=source
-            )
-            filters = Q(lexeme_from_lexeme_set__in=relations_with_source) | Q(
-                lexeme_to_lexeme_set__in=relations_with_source
-            )
-        return queryset.filter(filters)
+            return queryset.with_source(source)
+        return queryset
 
 
 class LexemeView(FilteredListView):
     filterset_class = LexemeFilter
     model = Lexeme
+    queryset = Lexeme.objects.all()  # the live rows
     template_name = "lexeme_list.html"
     paginate_by = 50
+    paginator_class = KeysetPaginator
+    estimate_count = True
     title = _("Homepage")
 
     def get_context_data(self, **kwargs):
@@ -332,7 +572,7 @@ class LexemeDictionaryFilter(django_filters.FilterSet):
         ("iregex", _("iRegex")),
     ]
 
-    lexeme = LookupChoiceFilter(
+    lexeme = TrigramLookupChoiceFilter(
         field_class=forms.CharField,
         label=_("Lexeme"),
         empty_label=None,
@@ -373,14 +613,17 @@ class LexemeDictionaryFilter(django_filters.FilterSet):
         """
         Custom filter method to filter Lexemes based on contlex of the Lexeme or related Stem objects.
         """
-        return queryset.filter(Q(stem__contlex__iregex=value))
+        return queryset.filter(regex_q("stem__contlex", value, "iregex"))
 
 
 class LexemeDictionaryView(FilteredListView):
     filterset_class = LexemeDictionaryFilter
     model = Lexeme
+    queryset = Lexeme.objects.all()  # the live rows
     template_name = "dictionary/dictionary.html"
     paginate_by = 50
+    paginator_class = KeysetPaginator
+    estimate_count = True
     title = _("Dictionary")
 
     def get_context_data(self, **kwargs):
@@ -435,9 +678,79 @@ class LexemeExportView(LexemeView):
         return response
 
 
-class HistoryExportView:
-    def nothing(self):
-        Lexeme.history.all()
+class HistoryExportView(AdminStaffRequiredMixin, View):
+    """
+    Exports the history entries matching the filters of the history search: streamed as NDJSON or CSV
+    (GET), or generated in the background as a file request (POST).
+
+    Only the entries of the table are exported, the archived ones (see archive_history) are not, even if
+    the search includes them; restore their partitions with restore_history to export them.
+    """
+
+    form_class = HistoryExportForm
+    content_types = {EXPORT_NDJSON: "application/x-ndjson", EXPORT_CSV: "text/csv"}
+
+    def get_form(self):
+        data = self.request.GET.copy()
+        data.update(self.request.POST)
+        return self.form_class(data)
+
+    def get(self, request, *args, **kwargs):
+        form = self.get_form()
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+        clean = form.cleaned_data
+
+        model = HistorySearchView.query_model_options[
+            clean["model_class"]
+        ].history.model
+        start_date, end_date = date_range(clean["start_date"], clean["end_date"])
+        format = clean["format"] or EXPORT_NDJSON
+
+        records = iter_history(
+            model,
+            start_date,
+            end_date,
+            user=clean["history_user"],
+            history_type=clean["history_type"],
+        )
+        response = StreamingHttpResponse(
+            export_history(model, records, format),
+            content_type=self.content_types[format],
+        )
+        response["Content-Disposition"] = (
+            'attachment; filename="history_%s_%s_%s.%s"'
+            % (clean["model_class"], clean["start_date"], clean["end_date"], format)
+        )
+        return response
+
+    def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+        clean = form.cleaned_data
+
+        job_options = {
+            "model": clean["model_class"],
+            "start_date": clean["start_date"].isoformat(),
+            "end_date": clean["end_date"].isoformat(),
+            "user": clean["history_user"].id if clean["history_user"] else None,
+            "history_type": clean["history_type"] or None,
+            "format": clean["format"] or EXPORT_NDJSON,
+        }
+
+        file_request = FileRequest.objects.create(
+            user=request.user,
+            type=DOWNLOAD_TYPE_HISTORY,
+            options=json.dumps(job_options),
+        )
+        process_file_request.delay(
+            file_request_id=file_request.id,
+            download_type=DOWNLOAD_TYPE_HISTORY,
+            lang_source=None,
+            options=job_options,
+        )
+        return HttpResponseRedirect(reverse("file-request"))
 
 
 class MiniParadigmMixin:
@@ -450,9 +763,11 @@ class MiniParadigmMixin:
         return existing_MP_forms
 
     def short_generate_forms(self, lexeme):
-
         MP_forms = generate_inflections(lexeme)
+        return MiniParadigmMixin.remove_existing_forms(lexeme, MP_forms)
 
+    @staticmethod
+    def remove_existing_forms(lexeme, MP_forms):
         existing_MP_forms = MiniParadigmMixin.existing_forms(lexeme)
 
         generated_forms = defaultdict(list)
@@ -499,49 +814,129 @@ class LexemeDetailView(TitleMixin, MiniParadigmMixin, DetailView):
     model = Lexeme
     template_name = "lexeme_detail.html"
 
-    def get_around_objects(self, request, object, n=5):
-        _filter = LexemeFilter(request.GET)
-        ordered = _filter.qs.ordered
-        order_by = _filter.qs.query.order_by[0] if ordered else "id"
-        desc = order_by.startswith("-")
-        order_by = order_by[1:] if order_by[0] in ["-", "+"] else order_by
-        value = getattr(object, order_by)
+    # the lexemes cached on each side of the current one for the previous/next links
+    navigation_window = 100
+    navigation_timeout = 3600
+    # the tables read by the lexeme filters, the cached windows are dropped when one of them changes
+    navigation_tables = (Lexeme, Relation, Source)
+
+    def _navigation_key(self, request):
+        """
+        Returns the cache key of the navigation window of the lexeme list filtered by the request.
+        """
+        params = sorted(
+            (k, v)
+            for k, values in request.GET.lists()
+            if k != "lastlexeme"
+            for v in values
+        )
+        signature = hashlib.md5(urlencode(params).encode("utf-8")).hexdigest()
+        versions = data_versions([m._meta.db_table for m in self.navigation_tables])
+        version = ".".join(str(versions[t]) for t in sorted(versions))
+        return "lexeme_navigation:%s:%s" % (signature, version)
 
-        next_objects, prev_objects = [], []
+    def _navigation_window(self, request, pk):
+        """
+        Returns the lexemes around a lexeme in the filtered lexeme list, navigation_window on each side, as
+        a dict of the rows (ID, lexeme, checked) and whether they reach the beginning (first) and the end
+        (last) of the list; None if the lexeme does not exist.
+        """
+        anchor = (
+            self.object
+            if pk == self.object.pk
+            else Lexeme.objects.filter(pk=pk).first()
+        )
+        if anchor is None:
+            return None
+
+        # the keyset of the list order, with the ID breaking the ties
+        lexemes = LexemeFilter(request.GET, queryset=Lexeme.objects.all()).qs
+        keyset = Keyset.of(lexemes)
+        if keyset is None:
+            lexemes = lexemes.order_by("id")
+            keyset = Keyset.of(lexemes)
+        values = keyset.values(anchor)
+        fields, n = ("id", "lexeme", "checked"), self.navigation_window
 
         try:
-            prev_qs = _filter.qs.filter(**{order_by + "__lt": value}).order_by(
-                "-" + order_by if not desc else order_by
+            prev_rows = list(
+                lexemes.filter(keyset.seek(values, reverse=True))
+                .order_by(*keyset.order_by(reverse=True))
+                .values_list(*fields)[:n]
+            )[::-1]
+            # the first row is the anchor if it is in the list
+            next_rows = list(
+                lexemes.filter(keyset.seek(values, inclusive=True))
+                .order_by(*keyset.order_by())
+                .values_list(*fields)[: n + 1]
             )
-            next_qs = _filter.qs.filter(**{order_by + "__gt": value})
-            prev_objects = prev_qs[:n][::-1]
-            next_objects = next_qs[:n]
-        except Exception as e:
-            pass
+        except DatabaseError as e:  # e.g. an invalid regex in the filters
+            logger.warning("Could not read the lexemes around %s: %s" % (pk, e))
+            prev_rows, next_rows = [], []
+        in_list = bool(next_rows) and next_rows[0][0] == anchor.pk
+        if in_list:
+            next_rows = next_rows[1:]
+        else:
+            next_rows = next_rows[:n]
+        return {
+            "rows": prev_rows
+            + [(anchor.pk, anchor.lexeme, anchor.checked)]
+            + next_rows,
+            "first": len(prev_rows) < n,
+            "last": len(next_rows) < n,
+            "in_list": in_list,
+        }
+
+    def get_around_objects(self, request, pk, n=5):
+        """
+        Returns the n lexemes before and after a lexeme in the lexeme list filtered by the request.
 
-        return (
-            (
-                prev_objects,
-                next_objects,
-            )
-            if not desc
-            else (
-                next_objects,
-                prev_objects,
-            )
-        )
+        The lexemes are taken from a window of the list cached per filter, so that following the
+        previous/next links is answered from the cache; the window is read again around the lexeme when
+        fewer than n lexemes are left on one side or the data changes.
+
+        :param pk: The ID of the lexeme.
+        :return tuple: The previous and the next lexemes, as unsaved Lexeme objects.
+        """
+        key = self._navigation_key(request)
+        window = cache.get(key)
+        ids = [row[0] for row in window["rows"]] if window else []
+        i = ids.index(pk) if pk in ids else None
+
+        if (
+            i is None
+            or (i < n and not window["first"])
+            or (len(ids) - i - 1 < n and not window["last"])
+        ):
+            window = self._navigation_window(request, pk)
+            if window is None:
+                return [], []
+            i = [row[0] for row in window["rows"]].index(pk)
+            # the windows of lexemes outside of the list are not kept
+            if window["in_list"]:
+                cache.set(key, window, self.navigation_timeout)
+
+        rows = window["rows"]
+        lexemes = [
+            Lexeme(id=id, lexeme=lexeme, checked=checked)
+            for id, lexeme, checked in rows[max(i - n, 0) : i + n + 1]
+        ]
+        i = min(i, n)
+        return lexemes[:i], lexemes[i + 1 :]
 
     def get_context_data(self, **kwargs):
         context = super(LexemeDetailView, self).get_context_data(**kwargs)
-        context["generated_miniparadigms"] = self.short_generate_forms(self.object)
+        # generated forms are fetched by the page from GeneratedParadigmsView
+        context["generated_miniparadigms_url"] = reverse(
+            "lexeme-generated-paradigms", kwargs={"pk": self.object.pk}
+        )
 
-        last_lexeme = self.request.GET.get("lastlexeme", None)  # is last lexeme passed?
-        last_lexeme = (
-            Lexeme.objects.get(pk=last_lexeme) if last_lexeme else self.object
-        )  # if not, use the current object
+        # the lexeme whose link was followed, if passed, otherwise the current one
+        last_lexeme = self.request.GET.get("lastlexeme", "")
+        pk = int(last_lexeme) if last_lexeme.isdigit() else self.object.pk
 
         context["prev_objects"], context["next_objects"] = self.get_around_objects(
-            request=self.request, object=last_lexeme, n=25
+            request=self.request, pk=pk, n=25
         )
         context["stems"] = self.object.stem_set.order_by("order").all()
         return context
@@ -1177,12 +1572,155 @@ class LexemeSearchView(AdminStaffRequiredMixin, generics.ListAPIView):
                 filter_Q |= Q(id=query)
 
             if not query.isdigit() and len(query) >= 3:
-                filter_Q |= Q(lexeme__icontains=query)
+                filter_Q |= trigram_q("lexeme", query)
 
             return Lexeme.objects.filter(filter_Q).order_by("lexeme_lang")
         return Lexeme.objects.none()
 
 
+class SourceNameSearchView(generics.ListAPIView):
+    """
+    Returns the source names containing ?q= (at most 20), for the autocompletion of the source filters.
+    """
+
+    serializer_class = SourceNameSerializer
+
+    def get_queryset(self):
+        query = self.request.query_params.get("q", "").strip()
+        if not query:
+            return SourceName.objects.none()
+        return SourceName.objects.filter(name__icontains=query).order_by("name")[:20]
+
+
+class RhymeSearchMixin:
+    form_class = RhymeSearchForm
+
+    def get_form(self):
+        return self.form_class(self.request.GET or None)
+
+    def get_rhymes(self, form):
+        lexemes = Lexeme.objects.rhymes(
+            form.cleaned_data["key"], form.cleaned_data["kind"]
+        )
+        if form.cleaned_data.get("language"):
+            lexemes = lexemes.filter(language=form.cleaned_data["language"])
+        if form.cleaned_data.get("word"):
+            lexemes = lexemes.exclude(lexeme=form.cleaned_data["word"])
+        return lexemes
+
+
+class RhymeSearchView(RhymeSearchMixin, TitleMixin, ListView):
+    """
+    Searches the lexemes that rhyme with a word (or a pattern) by assonance or consonance.
+    """
+
+    template_name = "rhyme_search.html"
+    title = _("Rhyme Search")
+    paginate_by = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["form"] = self.form
+        return context
+
+    def get_queryset(self):
+        self.form = self.get_form()
+        if not self.form.is_valid():
+            return Lexeme.objects.none()
+        return self.get_rhymes(self.form)
+
+
+class RhymeSearchAPIView(RhymeSearchMixin, generics.ListAPIView):
+    """
+    Same as RhymeSearchView, as JSON. Returns at most ?limit= (default: 50, max: 500) lexemes.
+    """
+
+    serializer_class = RhymeSerializer
+    default_limit = 50
+    max_limit = 500
+
+    def get_queryset(self):
+        form = self.get_form()
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+
+        limit = self.request.query_params.get("limit", "")
+        limit = int(limit) if limit.isdigit() else self.default_limit
+        return self.get_rhymes(form)[: min(limit, self.max_limit)]
+
+
+class GeneratedParadigmsView(MiniParadigmMixin, APIView):
+    """
+    Returns the generated mini paradigms of a lexeme, or of a batch of lexemes (?ids=1,2,3), as JSON:
+    {lexeme ID: {MSD: [word forms]}}. Forms overridden by the users' mini paradigms are left out.
+    """
+
+    max_lexemes = 100
+
+    @staticmethod
+    def get_etag(lexemes):
+        """
+        Returns the ETag of the generated mini paradigms of the lexemes, derived from the versions of their
+        stored forms and from the users' mini paradigms, or None if the forms of some lexemes are not
+        stored (yet).
+        """
+        versions = generated_paradigms_versions(lexemes)
+        if any(lexeme.id not in versions for lexeme in lexemes if lexeme.language_id):
+            return None
+
+        state = [
+            (
+                lexeme.id,
+                versions.get(lexeme.id),
+                sorted(
+                    (mp.id, mp.msd, mp.wordform) for mp in lexeme.miniparadigm_set.all()
+                ),
+            )
+            for lexeme in lexemes
+        ]
+        return (
+            '"%s"'
+            % hashlib.md5(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+        )
+
+    def get(self, request, pk=None):
+        if pk is not None:
+            ids = [pk]
+        else:
+            ids = [
+                _id
+                for _id in request.query_params.get("ids", "").split(",")
+                if _id.strip().isdigit()
+            ][: self.max_lexemes]
+
+        lexemes = Lexeme.objects.filter(id__in=ids).prefetch_related("miniparadigm_set")
+        if pk is not None and not lexemes:
+            raise Http404(_("Lexeme not found."))
+
+        # answer revalidations from the versions of the stored forms, before generating anything
+        etag = self.get_etag(lexemes)
+        if etag is not None:
+            conditional_response = get_conditional_response(request, etag=etag)
+            if conditional_response is not None:
+                return conditional_response
+
+        generated = generate_inflections_coalesced(lexemes)
+        data = {
+            str(lexeme.id): self.remove_existing_forms(
+                lexeme, generated.get(lexeme.id, {})
+            )
+            for lexeme in lexemes
+        }
+
+        _response = response.Response(data)
+        if etag is None:  # the forms were generated (and stored, unless they timed out)
+            etag = self.get_etag(lexemes)
+        if etag is not None:
+            _response["ETag"] = etag
+        patch_cache_control(_response, private=True, max_age=0, must_revalidate=True)
+        return _response
+
+
 class HistorySearchView(TitleMixin, ListView, AdminStaffRequiredMixin):
     template_name = "history_list.html"
     form_class = HistoryForm
@@ -1201,6 +1739,10 @@ class HistorySearchView(TitleMixin, ListView, AdminStaffRequiredMixin):
         # Just include the form
         context = super(HistorySearchView, self).get_context_data(*args, **kwargs)
         context["form"] = self.form_class(self.request.GET)
+        context["object_list"] = prefetch_history_diffs(
+            context["object_list"],
+            include_archive=isinstance(self.object_list, ArchivedHistory),
+        )
         return context
 
     def get_queryset(self):
@@ -1212,12 +1754,26 @@ class HistorySearchView(TitleMixin, ListView, AdminStaffRequiredMixin):
                     form.cleaned_data["model_class"]
                 ]
 
-                start_date = form.cleaned_data["start_date"]
-                end_date = form.cleaned_data["end_date"]
+                start_date, end_date = date_range(
+                    form.cleaned_data["start_date"], form.cleaned_data["end_date"]
+                )
+                filters = {}
+                if form.cleaned_data["history_user"]:
+                    filters["history_user_id"] = form.cleaned_data["history_user"].id
+                if form.cleaned_data["history_type"]:
+                    filters["history_type"] = form.cleaned_data["history_type"]
 
+                # the table only has the recent entries, see archive_history
                 object_list = self.query_model.history.filter(
-                    Q(history_date__gte=start_date) & Q(history_date__lte=end_date)
+                    Q(history_date__gte=start_date) & Q(history_date__lte=end_date),
+                    **filters,
                 ).order_by("-history_date")
+
+                if form.cleaned_data["include_archive"]:
+                    # merged page by page with the archived entries
+                    object_list = ArchivedHistory(
+                        object_list, start_date, end_date, filters
+                    )
         return object_list
 
 
@@ -1293,8 +1849,10 @@ class ApprovalViewMixin(AdminStaffRequiredMixin, FormMixin, FilteredListView):
 class LexemeApprovalView(ApprovalViewMixin):
     filterset_class = LexemeFilter
     model = Lexeme
+    queryset = Lexeme.objects.all()  # the live rows
     template_name = "lexeme_approval.html"
     paginate_by = 50
+    paginator_class = KeysetPaginator
     title = _("Approving Lexemes")
     form_class = ApprovalMultipleChoiceForm
 
@@ -1333,16 +1891,23 @@ class RelationFilter(django_filters.FilterSet):
     lexeme_side = ChoiceFilter(
         label="", method="filter_pos", choices=[("from", _("From")), ("to", _("To"))]
     )
-    source = CharFilter(label=_("Source"), method="filter_source")
+    source = CharFilter(
+        label=_("Source"), method="filter_source", widget=SOURCE_AUTOCOMPLETE_INPUT
+    )
     checked = ChoiceFilter(choices=STATUS_CHOICES, label=_("Processed"))
     type = ChoiceFilter(choices=RELATION_TYPE_OPTIONS, label=_("Type"))
+    lang_from = ChoiceFilter(label=_("From"))
+    lang_to = ChoiceFilter(label=_("To"))
 
     def __init__(self, data, *args, **kwargs):
         data = data.copy()
         super().__init__(data, *args, **kwargs)
 
+        languages = get_all_used_languages()
         pos = get_all_used_pos()
         self.form.fields["pos"].choices = zip(pos, pos)
+        self.form.fields["lang_from"].choices = zip(languages, languages)
+        self.form.fields["lang_to"].choices = zip(languages, languages)
 
     def filter_lexeme(self, queryset, name, value):
         lexeme_str, lookup_expr = (
@@ -1363,28 +1928,26 @@ class RelationFilter(django_filters.FilterSet):
         filters = models.Q()
         if value:
             if not side or side == "from":
-                filters |= models.Q(
-                    **{"lexeme_from__{}__{}".format(name, lookup_expr): value}
-                )
+                filters |= trigram_q("lexeme_from__{}".format(name), value, lookup_expr)
             if not side or side == "to":
-                filters |= models.Q(
-                    **{"lexeme_to__{}__{}".format(name, lookup_expr): value}
-                )
+                filters |= trigram_q("lexeme_to__{}".format(name), value, lookup_expr)
         return queryset.filter(filters)
 
     def filter_source(self, queryset, name, value):
         source = self.data["source"] if "source" in self.data else None
-        filters = models.Q()
         if source:
-            filters |= models.Q(source__name__icontains=source)
-        return queryset.filter(filters)
+            return queryset.with_source(source)
+        return queryset
 
 
 class RelationView(FilteredListView):
     filterset_class = RelationFilter
     model = Relation
+    queryset = Relation.objects.all()  # the live rows
     template_name = "relation_list.html"
     paginate_by = 50
+    paginator_class = KeysetPaginator
+    estimate_count = True
     title = _("Relation Search")
     ordering = ["-lexeme_to"]
 
@@ -1463,6 +2026,7 @@ class RelationApprovalView(ApprovalViewMixin):
     model = Relation
     template_name = "relation_approval.html"
     paginate_by = 50
+    paginator_class = KeysetPaginator
     title = _("Approving Relations")
     form_class = ApprovalMultipleChoiceForm
 
@@ -1825,3 +2389,23 @@ class LanguageParadigmDeleteView(AdminStaffRequiredMixin, TitleMixin, DeleteView
 
     def get_title(self):
         return _("Delete Language Paradigm")
+
+
+class TransducersStatusView(AdminStaffRequiredMixin, View):
+    """
+    Readiness check for the staff: reports the transducers loaded in this process and the memory they
+    take. Responds with 503 until all languages in settings.PRELOAD_TRANSDUCERS are loaded.
+    """
+
+    def get(self, request):
+        languages = generator_engine.status(settings.PRELOAD_TRANSDUCERS)
+        ready = all(languages[l]["loaded"] for l in settings.PRELOAD_TRANSDUCERS)
+        return JsonResponse(
+            {
+                "ready": ready,
+                "pid": os.getpid(),
+                "rss": process_rss(),
+                "languages": languages,
+            },
+            status=200 if ready else 503,
+        )
@@ -1,6 +1,7 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 # Get the environment setting from an environment variable
 env = os.getenv("DEPLOYMENT_SETTINGS", "development")
@@ -25,3 +26,19 @@ app.autodiscover_tasks()
 @app.task(bind=True)
 def debug_task(self):
     print(f"Request: {self.request!r}")
+
+
+@worker_init.connect
+def preload_transducers_before_fork(**kwargs):
+    # loaded in the main process, the pool processes share them copy-on-write
+    from manageXML.inflector import preload_transducers
+
+    preload_transducers()
+
+
+@worker_process_init.connect
+def preload_transducers_in_process(**kwargs):
+    # no-op for forked processes, loads them for pools that do not fork
+    from manageXML.inflector import preload_transducers
+
+    preload_transducers()
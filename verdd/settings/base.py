@@ -208,6 +208,24 @@ else:
     if not os.path.isdir(TRANSDUCERS_PATH):
         raise Exception("Cannot access the transducer models.")
 
+# Languages whose generator transducers are loaded before forking the uWSGI and Celery workers
+PRELOAD_TRANSDUCERS = config("PRELOAD_TRANSDUCERS", default="", cast=Csv())
+
+# Deadline (in seconds) for generating the forms of one batch of paradigm queries
+PARADIGM_GENERATION_TIMEOUT = config(
+    "PARADIGM_GENERATION_TIMEOUT", default=5.0, cast=float
+)
+
+# How often (in seconds) each process checks whether its language registry is outdated (see CACHES)
+LANGUAGE_REGISTRY_CHECK_INTERVAL = config(
+    "LANGUAGE_REGISTRY_CHECK_INTERVAL", default=1.0, cast=float
+)
+
+# Where archive_history moves the old history entries to (a gzipped JSONL file per model and month)
+HISTORY_ARCHIVE_DIR = config(
+    "HISTORY_ARCHIVE_DIR", default=os.path.join(BASE_DIR, "../history_archive")
+)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -274,6 +292,15 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
 
+# The cache is shared by the uWSGI workers, the Celery workers and the management commands: the data
+# versions, the language registry version and the cached counts and windows are invalidated through it.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("CACHE_URL", default=f"redis://{REDIS_HOST}:6379/1"),
+    }
+}
+
 
 MEDIA_ROOT = "media"
 MEDIA_URL = "%s/media/" % FORCE_SCRIPT_NAME
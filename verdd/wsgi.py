@@ -22,3 +22,8 @@ else:
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "verdd.settings.development")
 
 application = get_wsgi_application()
+
+# Load the transducers in the uWSGI master, the forked workers share them copy-on-write
+from manageXML.inflector import preload_transducers
+
+preload_transducers()